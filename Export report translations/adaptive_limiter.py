@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from config import (EXPORT_SERVICE_LIMITS, EXPORT_DEFAULT_SERVICE_LIMIT, ADAPTIVE_INITIAL_LIMIT,
+                    ADAPTIVE_MIN_LIMIT, ADAPTIVE_LATENCY_TOLERANCE)
+
+# 视为服务端过载的状态码
+OVERLOAD_STATUS = (429, 500, 502, 503, 504)
+
+# 每个限流器最多保留延迟基线的接口数，超出后淘汰最早记录的接口（如每个文件路径不同的下载地址）
+_MAX_LATENCY_KEYS = 256
+
+
+class AIMDLimiter:
+    """
+    加性增、乘性减(AIMD)的并发上限控制器：延迟平稳时逐步增加允许的并发数，
+    遇到429/5xx、超时或首字节耗时明显上升时成倍减少，并遵守Retry-After
+
+    同一服务的登录、任务列表、导出等接口耗时相差很大，延迟基线按接口分别统计，
+    只有同一接口的近期延迟明显高于它自己的基线才视为过载
+
+    Args:
+        max_limit (int): 并发上限的最大值
+        initial (int): 初始并发上限
+        min_limit (int): 并发上限的最小值
+        decrease (float): 过载时的乘性缩减系数
+        latency_tolerance (float): 近期延迟超过基线延迟的倍数时视为过载
+    """
+
+    def __init__(self, max_limit, initial=ADAPTIVE_INITIAL_LIMIT, min_limit=ADAPTIVE_MIN_LIMIT,
+                 decrease=0.5, latency_tolerance=ADAPTIVE_LATENCY_TOLERANCE):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.latency = {}          # 接口 -> [长期延迟基线（慢速EWMA）, 近期延迟（快速EWMA）]
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters = deque()   # 等待额度的协程：(事件循环, Future)
+
+    def blocked_for(self):
+        """距离Retry-After解除还剩的秒数"""
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def try_acquire(self):
+        """有空闲并发额度时占用一个并返回True，否则返回False"""
+        with self._cond:
+            if self.in_flight < int(self.limit) and self.blocked_for() == 0:
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """阻塞直到获得一个并发额度"""
+        with self._cond:
+            while self.in_flight >= int(self.limit) or self.blocked_for() > 0:
+                self._cond.wait(self.blocked_for() or None)
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """
+        acquire的asyncio版本：在事件循环中等待额度，不占用线程也不轮询；
+        归还额度或上限增加时唤醒一个等待的协程，Retry-After期间等到解除后再重试
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit) and self.blocked_for() == 0:
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+                delay = self.blocked_for()
+            try:
+                await asyncio.wait_for(waiter, delay or None)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # 已被唤醒但不再需要额度，转交给下一个等待者
+                    with self._cond:
+                        self._wake_async()
+                raise
+
+    def _wake_async(self):
+        # 调用方持有self._cond；Future只能在所属事件循环中完成
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            if waiter.done():
+                continue
+            try:
+                loop.call_soon_threadsafe(self._resolve_waiter, waiter)
+            except RuntimeError:
+                # 事件循环已关闭
+                continue
+            return
+
+    def _resolve_waiter(self, waiter):
+        if waiter.done():
+            # 唤醒前已超时或取消，转交给下一个等待者
+            with self._cond:
+                self._wake_async()
+        else:
+            waiter.set_result(None)
+
+    def release(self):
+        """归还一个并发额度"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+            self._wake_async()
+
+    def on_response(self, latency=None, status=None, timeout=False, retry_after=None, endpoint=''):
+        """
+        根据一次请求的结果调整并发上限
+
+        Args:
+            latency (float): 首字节耗时（秒）
+            status (int): HTTP状态码
+            timeout (bool): 请求是否超时
+            retry_after (float): 服务端要求的等待时间（秒）
+            endpoint (str): 接口名，延迟按接口与各自的基线比较
+        """
+        with self._cond:
+            now = time.monotonic()
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+            overloaded = timeout or status in OVERLOAD_STATUS
+            stats = self.latency.get(endpoint)
+            if latency is not None and not overloaded:
+                if stats is None:
+                    if len(self.latency) >= _MAX_LATENCY_KEYS:
+                        del self.latency[next(iter(self.latency))]
+                    stats = self.latency[endpoint] = [latency, latency]
+                else:
+                    stats[0] = 0.95 * stats[0] + 0.05 * latency
+                    stats[1] = 0.7 * stats[1] + 0.3 * latency
+                overloaded = stats[1] > stats[0] * self.latency_tolerance
+
+            if overloaded:
+                # 同一批并发请求的过载信号只缩减一次
+                if now - self._last_decrease > (stats[1] if stats else 1.0):
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                # 每完成约一个窗口的请求，上限加1
+                limit = int(self.limit)
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self._cond.notify_all()
+                if int(self.limit) > limit:
+                    self._wake_async()
+
+
+def parse_retry_after(value):
+    """
+    解析Retry-After响应头（秒数或HTTP日期）
+
+    Returns:
+        float: 等待秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def get_limiter(service):
+    """
+    获取服务前缀对应的限流器，每个服务一个，上限取EXPORT_SERVICE_LIMITS
+
+    Args:
+        service (str): 服务前缀，如location-service
+
+    Returns:
+        AIMDLimiter: 该服务的限流器
+    """
+    limiter = _limiters.get(service)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(service)
+            if limiter is None:
+                limiter = _limiters[service] = AIMDLimiter(
+                    EXPORT_SERVICE_LIMITS.get(service, EXPORT_DEFAULT_SERVICE_LIMIT))
+    return limiter
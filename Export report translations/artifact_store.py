@@ -0,0 +1,129 @@
+import argparse
+import os
+import shutil
+import stat
+import threading
+from config import ARTIFACT_STORE_DIR
+
+
+class ArtifactStore:
+    """
+    按内容哈希(sha256)存储下载文件的仓库。导出端-<lang>、web-<lang>目录中的文件
+    是指向仓库文件的硬链接，内容相同的文件只在磁盘上存一份，
+    仓库中已有的内容不会再次写入。
+
+    同一内容的所有硬链接共享一个文件，原地修改任何一份都会改变所有语言目录中的副本；
+    本项目的写入都是写临时文件后原子替换，不会原地修改，因此仓库文件保持可写，
+    语言目录中的文件可以被下一次导出直接替换（Windows上不能替换只读文件）。
+    不再被引用的仓库文件通过prune()或`python artifact_store.py --prune`清理
+
+    Args:
+        root (str): 仓库目录，需与各语言目录位于同一文件系统
+    """
+
+    def __init__(self, root=ARTIFACT_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest, ext=''):
+        """返回内容哈希对应的仓库文件路径"""
+        return os.path.join(self.root, digest[:2], f"{digest}{ext}")
+
+    def has(self, digest, ext=''):
+        """仓库中是否已有该内容"""
+        return os.path.exists(self.blob_path(digest, ext))
+
+    def commit(self, tmp_name, file_name, digest):
+        """
+        将已写完并fsync的临时文件提交到仓库，并在目标路径上建立硬链接。
+        仓库中已有相同内容时直接丢弃临时文件
+
+        Args:
+            tmp_name (str): 临时文件路径
+            file_name (str): 目标文件路径
+            digest (str): 临时文件内容的sha256
+        """
+        blob = self.blob_path(digest, os.path.splitext(file_name)[1])
+        try:
+            with self._lock:
+                if os.path.exists(blob):
+                    os.remove(tmp_name)
+                else:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.replace(tmp_name, blob)
+            self._link(blob, file_name)
+        except OSError:
+            # 文件系统不支持硬链接时退化为普通文件
+            if os.path.exists(tmp_name):
+                os.replace(tmp_name, file_name)
+            else:
+                self._copy(blob, file_name)
+
+    def _copy(self, blob, file_name):
+        # 复制到目标目录下的临时文件后原子替换，复制出的文件可写、与仓库文件互不影响
+        from artifact_writer import open_temp, commit_temp, discard_temp  # artifact_writer导入了本模块
+        f, tmp_name = open_temp(file_name)
+        try:
+            with open(blob, "rb") as source:
+                shutil.copyfileobj(source, f)
+            commit_temp(f, tmp_name, file_name)
+        except BaseException:
+            discard_temp(f, tmp_name)
+            raise
+
+    def _link(self, blob, file_name):
+        if os.path.exists(file_name) and os.path.samefile(blob, file_name):
+            return
+        # 先链接到临时名称再原子替换，目标路径始终是完整文件
+        link_name = f"{file_name}.{os.getpid()}.{threading.get_ident()}.link"
+        os.link(blob, link_name)
+        try:
+            try:
+                os.replace(link_name, file_name)
+            except PermissionError:
+                # 旧版本设为只读的仓库文件在Windows上不能被替换，去掉只读属性后重试
+                _make_writable(file_name)
+                os.replace(link_name, file_name)
+        except OSError:
+            os.remove(link_name)
+            raise
+
+    def prune(self):
+        """
+        删除不再被任何语言目录引用（硬链接数为1）的仓库文件；
+        需在没有其他导出进程运行时调用，否则可能删除刚提交、尚未建立链接的文件
+
+        Returns:
+            int: 删除的文件数
+        """
+        removed = 0
+        with self._lock:
+            for directory, _, files in os.walk(self.root):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    if os.stat(path).st_nlink <= 1:
+                        # 旧版本设为只读的文件在Windows上不能直接删除
+                        _make_writable(path)
+                        os.remove(path)
+                        removed += 1
+        return removed
+
+
+def _make_writable(path):
+    if os.path.exists(path):
+        os.chmod(path, stat.S_IMODE(os.stat(path).st_mode) | stat.S_IWUSR)
+
+
+# 进程内共享的默认实例
+artifact_store = ArtifactStore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="内容哈希仓库维护")
+    parser.add_argument("--prune", action="store_true", help="删除不再被任何语言目录引用的仓库文件")
+    args = parser.parse_args()
+
+    if args.prune:
+        print(f"已删除{artifact_store.prune()}个未被引用的仓库文件: {artifact_store.root}")
+    else:
+        parser.print_help()
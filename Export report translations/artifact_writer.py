@@ -0,0 +1,186 @@
+import hashlib
+import os
+import tempfile
+import time
+import metrics
+from artifact_store import artifact_store
+from http_client import endpoint_of, service_of
+from config import DOWNLOAD_CHUNK_SIZE, REJECTED_CONTENT_TYPES, ARTIFACT_DEDUP
+
+
+def _umask():
+    # umask只能通过设置新值读取，导入时读取一次并立即恢复
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# 新文件的权限：与open()创建的文件相同（0666去掉umask），而不是mkstemp的0600
+FILE_MODE = 0o666 & ~_umask()
+
+
+class InvalidContentError(IOError):
+    """响应的Content-Type表明返回的不是文件内容（如JSON错误信息、HTML错误页）"""
+
+
+def check_response(response, rejected_content_types=REJECTED_CONTENT_TYPES):
+    """
+    落盘前校验响应状态码和Content-Type
+
+    Args:
+        response: requests的响应对象
+        rejected_content_types (tuple): 不允许落盘的Content-Type前缀
+
+    Raises:
+        requests.exceptions.HTTPError: 状态码不是2xx
+        InvalidContentError: Content-Type属于拒绝列表
+    """
+    if not response.ok:
+        # 错误响应体很小，先读入内存，调用方关闭连接后仍可打印错误详情
+        response.content
+    response.raise_for_status()
+    content_type = rejected_content_type(response.headers, rejected_content_types)
+    if content_type:
+        raise InvalidContentError(f"响应不是文件内容 ({content_type}): {response.text[:500]}")
+
+
+def rejected_content_type(headers, rejected_content_types=REJECTED_CONTENT_TYPES):
+    """
+    按响应头判断响应是否不是文件内容，阻塞版本和asyncio版本共用
+
+    Args:
+        headers: 响应头（不区分大小写的映射）
+        rejected_content_types (tuple): 不允许落盘的Content-Type
+
+    Returns:
+        str: Content-Type属于拒绝列表时返回该类型，否则返回None
+    """
+    content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type if content_type in rejected_content_types else None
+
+
+def open_temp(file_name):
+    """
+    在目标文件所在目录下创建临时文件，之后由commit_temp提交或discard_temp删除；
+    临时文件按FILE_MODE设置权限，替换到目标路径后其他用户与普通文件一样可读
+
+    Args:
+        file_name (str): 目标文件路径
+
+    Returns:
+        tuple: (以二进制写方式打开的文件对象, 临时文件路径)
+    """
+    directory = os.path.dirname(file_name) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_name)}.", suffix=".part")
+    try:
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, FILE_MODE)
+        else:
+            os.chmod(tmp_name, FILE_MODE)
+    except OSError:
+        os.close(fd)
+        os.remove(tmp_name)
+        raise
+    return os.fdopen(fd, "wb"), tmp_name
+
+
+def commit_temp(f, tmp_name, file_name, digest=None, store=None):
+    """
+    关闭写完的临时文件，fsync后原子重命名到目标路径；指定store时按内容哈希提交到仓库，
+    仓库中已有相同内容时临时文件会被直接丢弃，跳过fsync
+
+    Args:
+        f: open_temp返回的文件对象
+        tmp_name (str): 临时文件路径
+        file_name (str): 目标文件路径
+        digest (str): 内容的sha256，指定store时必需
+        store (ArtifactStore): 内容哈希仓库
+    """
+    with f:
+        f.flush()
+        if store is None or not store.has(digest, os.path.splitext(file_name)[1]):
+            os.fsync(f.fileno())
+    if store is not None:
+        store.commit(tmp_name, file_name, digest)
+    else:
+        os.replace(tmp_name, file_name)
+
+
+def discard_temp(f, tmp_name):
+    """关闭并删除未提交的临时文件"""
+    f.close()
+    if os.path.exists(tmp_name):
+        os.remove(tmp_name)
+
+
+def atomic_write(file_name, chunks, store=None):
+    """
+    将分块数据写入目标目录下的临时文件，fsync后原子重命名到目标路径，
+    失败时删除临时文件，目标路径上不会出现写了一半的文件。
+    内容哈希只有读完响应体后才能确定，提交到仓库时若已有相同内容则跳过fsync
+
+    Args:
+        file_name (str): 目标文件路径
+        chunks (iterable): bytes分块序列
+        store (ArtifactStore): 指定时按内容哈希提交到仓库，目标路径为指向仓库文件的硬链接
+
+    Returns:
+        int: 写入的字节数
+    """
+    f, tmp_name = open_temp(file_name)
+    digest = hashlib.sha256() if store is not None else None
+    size = 0
+    # 分别统计等待网络数据(transfer)和写盘(write)的耗时，关闭统计时不计时
+    timed = metrics.ENABLED
+    transfer_time = write_time = 0.0
+    try:
+        mark = time.perf_counter() if timed else 0.0
+        for chunk in chunks:
+            if timed:
+                received = time.perf_counter()
+                transfer_time += received - mark
+            if chunk:
+                f.write(chunk)
+                size += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+            if timed:
+                mark = time.perf_counter()
+                write_time += mark - received
+        commit_temp(f, tmp_name, file_name, digest.hexdigest() if digest is not None else None, store)
+        if timed:
+            write_time += time.perf_counter() - mark
+            metrics.observe('transfer', transfer_time)
+            metrics.observe('write', write_time)
+    except BaseException:
+        discard_temp(f, tmp_name)
+        raise
+    return size
+
+
+def save_response(response, file_name, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                  rejected_content_types=REJECTED_CONTENT_TYPES,
+                  dedup=ARTIFACT_DEDUP):
+    """
+    校验响应后将响应体流式写入文件，内存占用与文件大小无关。
+    请求需以stream=True发送，否则响应体已被整体读入内存
+
+    Args:
+        response: requests的响应对象
+        file_name (str): 目标文件路径
+        chunk_size (int): 分块大小（字节）
+        rejected_content_types (tuple): 不允许落盘的Content-Type
+        dedup (bool): 是否通过内容哈希仓库去重存储
+
+    Returns:
+        int: 写入的字节数
+    """
+    try:
+        check_response(response, rejected_content_types)
+        store = artifact_store if dedup else None
+        with metrics.tags(endpoint=endpoint_of(response.url), service=service_of(response.url),
+                          method=response.request.method if response.request else ''):
+            return atomic_write(file_name, response.iter_content(chunk_size=chunk_size), store)
+    finally:
+        response.close()
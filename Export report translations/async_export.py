@@ -0,0 +1,459 @@
+import asyncio
+import hashlib
+import os
+import time
+import aiohttp
+import metrics
+from artifact_store import artifact_store
+from artifact_writer import InvalidContentError, open_temp, commit_temp, discard_temp, rejected_content_type
+from encoding_cache import (encoding_cache, encoding_request, encodings_to_try, needs_next_encoding,
+                            is_json_response, is_rejected_encoding)
+from token_manager import is_auth_failure_code, needs_auth_body
+from retry import CircuitOpenError, get_breaker, default_policy, is_failure, retryable_failure, retry_delay
+from adaptive_limiter import get_limiter, parse_retry_after
+from http_client import service_of, endpoint_of
+from task_watcher import TaskTimeoutError
+from get_sta_overview_export import export_path
+from download_report import task_id_of, get_task_watcher
+from config import (BASE_URL, LOGIN_CONFIG, LANGUAGE_LIST, TRANSLATION_DIR, DEFAULT_HEADERS,
+                    TOKEN_TTL, TOKEN_REFRESH_MARGIN, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+                    ASYNC_MAX_IN_FLIGHT, DOWNLOAD_CHUNK_SIZE, ARTIFACT_DEDUP,
+                    TASK_TIMEOUT)
+
+def create_session(limit=ASYNC_MAX_IN_FLIGHT):
+    """
+    创建共享的aiohttp会话，所有协程复用同一个连接池
+
+    Args:
+        limit (int): 连接池总连接数上限
+
+    Returns:
+        aiohttp.ClientSession: 会话对象，需在事件循环内使用并在结束时关闭
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit)
+    timeout = aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+    headers = dict(DEFAULT_HEADERS)
+    headers['Accept-Encoding'] = 'gzip, deflate'
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers)
+
+
+async def async_login(session, username=LOGIN_CONFIG['username'],
+                      password=LOGIN_CONFIG['password'],
+                      timezone_second=LOGIN_CONFIG['timezone_second'],
+                      accept_language='cn',
+                      base_url=BASE_URL):
+    """
+    login.login的asyncio版本
+
+    Args:
+        session (aiohttp.ClientSession): 共享会话
+        其余参数同login.login
+
+    Returns:
+        str: token字符串，登录失败返回None
+    """
+    url = f'{base_url}/user-service/user/login'
+    headers = {'accept-language': accept_language}
+    data = {
+        'name': username,
+        'password': password,
+        'timeZoneSecond': timezone_second,
+        'lang': accept_language
+    }
+    try:
+        with metrics.timer('login', endpoint='login', service='user-service', method='POST', language=accept_language):
+            response = await session.post(url, headers=headers, data=data)
+        async with response:
+            response.raise_for_status()
+            result = await response.json(content_type=None)
+            return (result.get('data') or {}).get('token')
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        print(f"请求发生错误: {str(e)}")
+        return None
+
+
+class AsyncTokenManager:
+    """
+    token_manager.TokenManager的asyncio版本，按(用户名, BASE_URL)缓存token
+
+    Args:
+        session (aiohttp.ClientSession): 用于登录的会话
+        ttl (int): token有效期（秒）
+        refresh_margin (int): 到期前提前刷新的时间余量（秒）
+    """
+
+    def __init__(self, session, ttl=TOKEN_TTL, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.session = session
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._tokens = {}
+        self._locks = {}
+
+    async def get_token(self, username=LOGIN_CONFIG['username'],
+                        password=LOGIN_CONFIG['password'],
+                        accept_language='cn',
+                        base_url=BASE_URL,
+                        force=False):
+        """获取token，参数同TokenManager.get_token"""
+        key = (username, base_url)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._tokens.get(key)
+            if not force and entry and time.monotonic() < entry[1] - self.refresh_margin:
+                return entry[0]
+            token = await async_login(self.session, username, password,
+                                      accept_language=accept_language, base_url=base_url)
+            if token:
+                self._tokens[key] = (token, time.monotonic() + self.ttl)
+            else:
+                self._tokens.pop(key, None)
+            return token
+
+    def invalidate(self, username=LOGIN_CONFIG['username'], base_url=BASE_URL, token=None):
+        """作废缓存的token，参数同TokenManager.invalidate"""
+        key = (username, base_url)
+        entry = self._tokens.get(key)
+        if entry and (token is None or entry[0] == token):
+            del self._tokens[key]
+
+
+async def _request(session, method, url, language='', **kwargs):
+    """
+    http_client.request的aiohttp版本：记录首字节耗时，并将延迟、状态码和Retry-After
+    反馈给该服务的自适应限流器
+
+    Args:
+        session (aiohttp.ClientSession): 共享会话
+        method (str): 请求方法
+        url (str): 请求地址
+        language (str): 统计标签中的语言
+        **kwargs: 透传给session.request的参数
+
+    Returns:
+        aiohttp.ClientResponse: 已读取响应头的响应对象
+    """
+    service, endpoint = service_of(url), endpoint_of(url)
+    limiter = get_limiter(service)
+    start = time.perf_counter()
+    try:
+        response = await session.request(method, url, **kwargs)
+    except asyncio.TimeoutError:
+        limiter.on_response(timeout=True)
+        raise
+    latency = time.perf_counter() - start
+    metrics.observe('ttfb', latency, endpoint=endpoint, service=service, method=method, language=language)
+    limiter.on_response(latency, response.status, retry_after=parse_retry_after(response.headers.get('Retry-After')),
+                        endpoint=endpoint)
+    return response
+
+
+async def _send_encoded(session, encoding, url, headers, params, language=''):
+    # 编码对应的请求方法由encoding_cache.encoding_request决定，表单值按requests的方式序列化
+    method, field = encoding_request(encoding)
+    return await _request(session, method, url, language, headers=headers,
+                          **{field: params if field == 'json' else _form_data(params)})
+
+
+async def _send_negotiated(session, url, headers, params, candidates, needs_fallback, language=''):
+    # 编码选择和换编码的判断与encoding_cache.send_negotiated共用；这里不写缓存，由调用方校验内容后再写入
+    encodings = encodings_to_try(url, candidates)
+    for encoding in encodings[:-1]:
+        response = await _send_encoded(session, encoding, url, headers, params, language)
+        if not needs_next_encoding(response.status, response.headers, needs_fallback):
+            return response, encoding
+        response.release()
+    return await _send_encoded(session, encodings[-1], url, headers, params, language), encodings[-1]
+
+
+def _form_data(params):
+    # aiohttp不接受None和bool作为表单值，按requests的方式序列化
+    if not params:
+        return {}
+    return {k: str(v) for k, v in params.items() if v is not None}
+
+
+async def _is_auth_failure(response):
+    # 判断规则与token_manager.is_auth_failure共用，只有needs_auth_body时才读取响应体
+    if not needs_auth_body(response.status, response.headers):
+        return is_auth_failure_code(response.status)
+    try:
+        result = await response.json(content_type=None)
+    except (ValueError, aiohttp.ClientError):
+        return is_auth_failure_code(response.status)
+    return is_auth_failure_code(response.status, result)
+
+
+async def _call_with_token(tokens, send, accept_language='cn'):
+    # 携带token发送请求，认证失败时重新登录并重试一次
+    token = await tokens.get_token(accept_language=accept_language)
+    response = await send(token or '')
+    if await _is_auth_failure(response):
+        response.release()
+        tokens.invalidate(token=token)
+        token = await tokens.get_token(accept_language=accept_language)
+        response = await send(token or '')
+    return response
+
+
+def _retryable_error(error, idempotent):
+    # aiohttp的异常类型映射到retry.retryable_failure：ClientConnectorError表示连接未建立，请求一定未发出
+    return retryable_failure(not isinstance(error, aiohttp.ClientConnectorError), idempotent)
+
+
+async def _call_with_retry(send, url, idempotent=True, policy=None):
+    """
+    retry.call_with_retry的asyncio版本，与阻塞版本共用服务熔断器、重试策略和退避决策（retry_delay）
+
+    Args:
+        send (callable): 无参协程函数，发送一次请求并返回aiohttp.ClientResponse
+        url (str): 请求地址，用于确定服务前缀
+        idempotent (bool): 请求是否可安全重复发送
+        policy (RetryPolicy): 重试策略，默认default_policy
+
+    Returns:
+        aiohttp.ClientResponse: 最后一次请求的响应（可能仍为错误状态码）
+
+    Raises:
+        CircuitOpenError: 服务熔断中
+        aiohttp.ClientError: 不可重试或重试次数用尽的请求异常
+    """
+    policy = policy or default_policy
+    service = service_of(url)
+    breaker = get_breaker(service)
+    deadline = time.monotonic() + policy.max_elapsed
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{service}熔断中，跳过请求: {url}")
+        attempt += 1
+        try:
+            response = await send()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            delay = retry_delay(policy, attempt, deadline, _retryable_error(e, idempotent))
+            if delay is None:
+                raise
+            reason = str(e) or type(e).__name__
+        else:
+            if not is_failure(response.status):
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            delay = retry_delay(policy, attempt, deadline, policy.retryable_status(response.status, idempotent),
+                                parse_retry_after(response.headers.get('Retry-After')))
+            if delay is None:
+                return response
+            reason = f"状态码{response.status}"
+            response.release()
+
+        print(f"请求失败({reason})，{delay:.1f}秒后第{attempt}次重试: {url}")
+        await asyncio.sleep(delay)
+
+
+async def _stream_to_file(response, file_name, chunk_size=DOWNLOAD_CHUNK_SIZE, **tags):
+    # 校验状态码和Content-Type（与artifact_writer.check_response共用rejected_content_type）后写临时文件，
+    # 提交时复用commit_temp（fsync后原子重命名或提交到内容仓库）；文件操作放到线程池执行，避免阻塞事件循环
+    if not response.ok:
+        print(f"完整URL: {response.url}")
+        print(f"状态码: {response.status}")
+        print(f"响应内容: {await response.text()}")
+    response.raise_for_status()
+    content_type = rejected_content_type(response.headers)
+    if content_type:
+        raise InvalidContentError(f"响应不是文件内容 ({content_type}): {(await response.text())[:500]}")
+    store = artifact_store if ARTIFACT_DEDUP else None
+    f, tmp_name = await asyncio.to_thread(open_temp, file_name)
+    digest = hashlib.sha256() if store is not None else None
+    transfer_time = write_time = 0.0
+    try:
+        mark = time.perf_counter()
+        async for chunk in response.content.iter_chunked(chunk_size):
+            received = time.perf_counter()
+            transfer_time += received - mark
+            await asyncio.to_thread(f.write, chunk)
+            if digest is not None:
+                digest.update(chunk)
+            mark = time.perf_counter()
+            write_time += mark - received
+        await asyncio.to_thread(commit_temp, f, tmp_name, file_name,
+                                digest.hexdigest() if digest is not None else None, store)
+        write_time += time.perf_counter() - mark
+    except BaseException:
+        discard_temp(f, tmp_name)
+        raise
+    metrics.observe('transfer', transfer_time, **tags)
+    metrics.observe('write', write_time, **tags)
+
+
+def _tags(url, method, language):
+    return {'endpoint': endpoint_of(url), 'service': service_of(url), 'method': method.upper(), 'language': language}
+
+
+async def async_get_sta_overview_export(session, tokens, accept_language='', url='', params=None, method="post",
+                                        save_path=None):
+    """
+    get_sta_overview_export的asyncio版本，与阻塞版本共用编码缓存、认证判断、熔断重试、
+    服务限流器反馈和耗时统计，响应体分块流式写入磁盘
+
+    Args:
+        session (aiohttp.ClientSession): 共享会话
+        tokens (AsyncTokenManager): token缓存
+        accept_language (str): 接受的语言代码，如'en'、'zh-CN'等
+        url (str): API的完整URL地址
+        params (dict): 请求参数字典
+        method (str): 请求方法，默认为"post"，支持"get"和"post"
+        save_path (str): 保存路径，默认为export_path(accept_language, url)
+
+    Returns:
+        str: 保存的文件路径，如果发生错误则返回None
+    """
+    headers = {'Accept-Language': accept_language}
+    # 本次请求使用的编码，文件校验并保存成功后才写入编码缓存
+    negotiated = {}
+
+    async def send(token):
+        headers['Token'] = token
+        if "post" == method.lower():
+            response, negotiated['encoding'] = await _send_negotiated(session, url, headers, params, ('json', 'form'),
+                                                                      is_json_response, accept_language)
+            return response
+        return await _send_encoded(session, 'query', url, headers, params, accept_language)
+
+    try:
+        # 统计导出接口只读，GET和POST都可按幂等请求退避重试
+        response = await _call_with_retry(lambda: _call_with_token(tokens, send, accept_language), url)
+        file_name = save_path or export_path(accept_language, url)
+        async with response:
+            await _stream_to_file(response, file_name, **_tags(url, method, accept_language))
+        if 'encoding' in negotiated:
+            encoding_cache.set(url, negotiated['encoding'])
+
+        print(f"文件已成功保存到: {file_name}")
+        return file_name
+
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+        print(f"请求发生错误: {str(e)}")
+        return None
+    except IOError as e:
+        print(f"文件操作错误: {str(e)}")
+        return None
+
+
+async def async_download_report(session, tokens, accept_language='', base_url='', params=None, timeout=TASK_TIMEOUT):
+    """
+    download_report的asyncio版本：按task/save返回的任务ID登记到与阻塞版本共享的任务观察者，
+    任务完成后流式下载报表文件
+
+    限制：任务状态仍由TaskWatcher的后台线程通过requests会话轮询（所有等待中的任务共用一次轮询），
+    这里只在事件循环中等待其Future，因此异步下载仍依赖该轮询线程和requests
+
+    Args:
+        session (aiohttp.ClientSession): 共享会话
+        tokens (AsyncTokenManager): token缓存
+        accept_language (str): 接受的语言代码
+        base_url (str): 创建导出任务的接口地址
+        params (dict): 请求参数
+        timeout (float): 等待任务完成的最长时间（秒）
+
+    Returns:
+        str: 保存的文件路径，如果失败则返回None
+    """
+    headers = {'Accept-Language': accept_language}
+    # 本次请求使用的编码，解析出任务ID后才写入编码缓存
+    negotiated = {}
+
+    async def send(token):
+        headers['Token'] = token
+        # 先尝试GET，接口拒绝该方法时改用JSON格式POST；5xx不换方法重试，避免重复创建任务
+        response, negotiated['encoding'] = await _send_negotiated(session, base_url, headers, params,
+                                                                  ('query', 'json'), is_rejected_encoding,
+                                                                  accept_language)
+        return response
+
+    limiter = get_limiter(service_of(base_url))
+    try:
+        # 创建任务占用所属服务的一个并发额度；创建任务不是幂等操作，只在请求确定未被处理时重试
+        await limiter.acquire_async()
+        try:
+            response = await _call_with_retry(lambda: _call_with_token(tokens, send, accept_language), base_url,
+                                              idempotent=False)
+        finally:
+            limiter.release()
+        async with response:
+            response.raise_for_status()
+            try:
+                result = await response.json(content_type=None)
+            except ValueError:
+                result = None
+            task_id = task_id_of(result)
+            if task_id is None:
+                print(f"未能从响应中解析任务ID: {await response.text()}")
+                return None
+        encoding_cache.set(base_url, negotiated['encoding'])
+        # 任务列表由观察者的后台线程轮询，事件循环中只等待结果，不阻塞其他协程
+        url = await asyncio.wrap_future(get_task_watcher().watch(task_id, timeout))
+
+        lang_dir = os.path.join(TRANSLATION_DIR, f"导出端-{accept_language}")
+        file_name = os.path.join(lang_dir, rf"{url.split('/')[-1]}").replace(" ", "_").replace(":", "_").replace("C_", "C:")
+        response = await _call_with_retry(lambda: _request(session, 'GET', url, accept_language), url)
+        async with response:
+            await _stream_to_file(response, file_name, **_tags(url, 'GET', accept_language))
+
+        print(f"文件已成功保存到: {file_name}")
+        return file_name
+
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+        print(f"请求发生错误: {str(e)}")
+        return None
+    except TaskTimeoutError as e:
+        print(f"导出任务超时: {str(e)}")
+        return None
+    except IOError as e:
+        print(f"文件操作错误: {str(e)}")
+        return None
+
+
+async def async_run_exports(jobs, max_in_flight=ASYNC_MAX_IN_FLIGHT):
+    """
+    在单个事件循环上并发执行导出任务，每个导出占用所属服务自适应限流器的一个并发额度，
+    与ExportEngine共用各服务的并发上限
+
+    同时进行的导出数只由各服务的限流器决定，最多为EXPORT_SERVICE_LIMITS各服务上限之和
+    （未单独配置的服务各EXPORT_DEFAULT_SERVICE_LIMIT），排队的任务在限流器上等待，不占用连接
+
+    Args:
+        jobs (iterable): (语言, URL, 参数, 方法)元组序列，如export_engine.ExportJob
+        max_in_flight (int): 连接池的连接数上限
+
+    Returns:
+        list: 与jobs一一对应的文件路径列表，失败的任务为None
+    """
+    async with create_session(max_in_flight) as session:
+        tokens = AsyncTokenManager(session)
+
+        async def run_one(job):
+            limiter = get_limiter(service_of(job.url))
+            await limiter.acquire_async()
+            try:
+                return await async_get_sta_overview_export(session, tokens, *job)
+            finally:
+                limiter.release()
+
+        return await asyncio.gather(*(run_one(job) for job in jobs))
+
+
+def run_exports(jobs, max_in_flight=ASYNC_MAX_IN_FLIGHT):
+    """async_run_exports的阻塞入口，供普通脚本调用"""
+    return asyncio.run(async_run_exports(jobs, max_in_flight))
+
+
+if __name__ == "__main__":
+    from export_engine import build_jobs
+    from get_sta_overview_export import url_list
+
+    jobs = build_jobs(LANGUAGE_LIST, url_list)
+    print(f"开始异步导出，共{len(jobs)}个任务...")
+    start = time.perf_counter()
+    results = run_exports(jobs)
+    print(f"全部完成，耗时{time.perf_counter() - start:.1f}s，"
+          f"失败{sum(1 for path in results if not path)}个")
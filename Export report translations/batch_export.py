@@ -0,0 +1,258 @@
+import argparse
+import os
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from get_sta_overview_export import get_sta_overview_export, url_list
+from export_engine import ExportEngine, ExportJob
+from run_journal import RunJournal, job_key, params_hash
+from shard_export import export_sharded, merge_workbooks
+from xlsx_reader import InvalidWorkbookError
+from config import LANGUAGE_LIST, TRANSLATION_DIR, BATCH_JOURNAL_PATH, EXPORT_MAX_WORKERS, SHARD_HEADER_ROWS
+
+# 可批量替换的实体参数，按优先级
+ENTITY_KEYS = ("carId", "entId")
+
+
+def entity_key(params):
+    """
+    返回接口参数中代表实体的键：有carId时按车辆批量，否则按企业(entId)批量
+
+    Raises:
+        ValueError: 参数中既没有carId也没有entId，需要通过key显式指定
+    """
+    for key in ENTITY_KEYS:
+        if key in params:
+            return key
+    raise ValueError(f"参数中没有{'或'.join(ENTITY_KEYS)}，需要显式指定替换的参数名")
+
+
+def endpoint_name(url):
+    return url.split('/')[-1]
+
+
+def find_reports(names, requests_list=url_list):
+    """
+    按接口名查找url_list中的条目
+
+    Args:
+        names (list): 接口名，如["getStaOilExport"]
+        requests_list (list): 接口列表，格式同url_list
+
+    Returns:
+        list: 匹配的(URL, 请求参数[, 请求方法])
+
+    Raises:
+        ValueError: 有接口名在列表中不存在
+    """
+    by_name = {endpoint_name(request_data[0]): request_data for request_data in requests_list}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"未知的接口: {', '.join(unknown)}")
+    return [by_name[name] for name in names]
+
+
+def entity_path(language, url, entity_id):
+    """单个实体的导出文件路径：批量导出-{语言}/{接口名}/{实体id}.xlsx"""
+    return os.path.join(TRANSLATION_DIR, f"批量导出-{language}", endpoint_name(url), f"{entity_id}.xlsx")
+
+
+def merged_path(language, url):
+    """合并后的导出文件路径：批量导出-{语言}/{接口名}_merged.xlsx"""
+    return os.path.join(TRANSLATION_DIR, f"批量导出-{language}", f"{endpoint_name(url)}_merged.xlsx")
+
+
+def build_batch_jobs(entity_ids, languages=LANGUAGE_LIST, requests_list=url_list, key=None):
+    """
+    将实体id列表展开为导出任务，请求参数完全相同的任务只保留一个
+
+    Args:
+        entity_ids (list): 实体id列表（carId或entId）
+        languages (list): 语言代码列表
+        requests_list (list): 要批量导出的接口，格式同url_list
+        key (str): 替换的参数名，None时按entity_key自动选择
+
+    Returns:
+        tuple: (ExportJob列表, 去掉的重复任务数)
+
+    Raises:
+        ValueError: 未指定key且有接口的参数中既没有carId也没有entId
+    """
+    jobs, seen, duplicates = [], set(), 0
+    for language in languages:
+        for request_data in requests_list:
+            url, params = request_data[0], request_data[1]
+            method = request_data[2] if len(request_data) > 2 else "post"
+            try:
+                param_key = key or entity_key(params)
+            except ValueError as e:
+                raise ValueError(f"{endpoint_name(url)}: {str(e)}") from None
+            for entity_id in entity_ids:
+                job = ExportJob(language, url, dict(params, **{param_key: str(entity_id)}), method)
+                job_id = job_key(job.language, job.url, job.params)
+                if job_id in seen:
+                    duplicates += 1
+                    continue
+                seen.add(job_id)
+                jobs.append(job)
+    return jobs, duplicates
+
+
+def _group_key(language, url, jobs):
+    # 一组(语言, 接口)合并结果的日志键，由组内各任务的参数决定
+    return job_key(language, url, {'batch': [params_hash(job.params) for job in jobs]})
+
+
+def _merge_group(language, url, jobs, key, header_rows):
+    paths = [entity_path(language, url, job.params[key]) for job in jobs]
+    file_name = merged_path(language, url)
+    try:
+        rows = merge_workbooks(paths, file_name, header_rows)
+    except (InvalidWorkbookError, IOError) as e:
+        print(f"合并失败: {language} {endpoint_name(url)} {str(e)}")
+        return None
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    try:
+        os.rmdir(os.path.dirname(paths[0]))
+    except OSError:
+        pass
+    print(f"已合并{len(paths)}个实体（{rows}行）到: {file_name}")
+    return file_name
+
+
+def run_batch(entity_ids, languages=LANGUAGE_LIST, requests_list=url_list, key=None, merge=False, shard=None,
+              journal=None, header_rows=SHARD_HEADER_ROWS, export_func=get_sta_overview_export, **engine_kwargs):
+    """
+    批量导出多个实体的同一组报表，在ExportEngine上并发执行
+
+    逐实体模式下每个实体保存为一个文件；合并模式下同一(语言, 接口)的所有实体导出完成后，
+    按entity_ids的顺序流式合并为一个工作簿（表头只保留一次），合并在单独的线程中进行，不阻塞派发
+
+    Args:
+        entity_ids (list): 实体id列表
+        languages (list): 语言代码列表
+        requests_list (list): 要批量导出的接口，格式同url_list
+        key (str): 替换的参数名，None时按entity_key自动选择
+        merge (bool): 是否合并为一个工作簿
+        shard (str): day或week时时间范围较长的导出再按时间分片，None表示不分片
+        journal (RunJournal): 运行日志，续跑时跳过已完成的实体和已合并的组
+        header_rows (int): 合并时每个工作表的表头行数
+        export_func (callable): 导出单个文件的函数，签名同get_sta_overview_export
+        **engine_kwargs: 透传给ExportEngine的参数
+
+    Returns:
+        tuple: (ExportResult列表, 合并后的文件路径列表)
+    """
+    jobs, duplicates = build_batch_jobs(entity_ids, languages, requests_list, key)
+    if duplicates:
+        print(f"去掉{duplicates}个参数相同的重复任务")
+    if shard:
+        export_func = partial(export_sharded, unit=shard, export_func=export_func)
+
+    # 每个接口替换的参数名
+    keys = {request_data[0]: key or entity_key(request_data[1]) for request_data in requests_list}
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job.language, job.url), []).append(job)
+    if journal is not None:
+        if merge:
+            # 已合并的组整体跳过
+            groups = {group: group_jobs for group, group_jobs in groups.items()
+                      if not journal.is_done(_group_key(*group, group_jobs))}
+            jobs = [job for job in jobs if (job.language, job.url) in groups]
+        jobs = [job for job in jobs if not journal.is_done(job_key(job.language, job.url, job.params))]
+
+    def export_entity(accept_language, url, params, method):
+        # 按实体id决定保存路径
+        return export_func(accept_language, url, params, method,
+                           save_path=entity_path(accept_language, url, params[keys[url]]))
+
+    remaining = {group: 0 for group in groups}
+    for job in jobs:
+        remaining[(job.language, job.url)] += 1
+    failed_groups = set()
+    results, merged, merge_futures = [], [], []
+    with ThreadPoolExecutor(max_workers=1) as merger:
+        def submit_merge(group):
+            merge_futures.append((group, merger.submit(_merge_group, *group, groups[group], keys[group[1]],
+                                                       header_rows)))
+
+        if merge:
+            # 续跑时各实体都已导出但尚未合并的组
+            for group, count in remaining.items():
+                if count == 0:
+                    submit_merge(group)
+        engine = ExportEngine(export_func=export_entity, **engine_kwargs)
+        for done_count, result in enumerate(engine.run(jobs, journal), 1):
+            results.append(result)
+            group = (result.job.language, result.job.url)
+            print(f"[{done_count}/{len(jobs)}] {result.job.language} {endpoint_name(result.job.url)} "
+                  f"{result.job.params[keys[result.job.url]]} {'成功' if result.path else '失败'} "
+                  f"({result.elapsed:.1f}s)")
+            if not result.path:
+                failed_groups.add(group)
+            remaining[group] -= 1
+            if merge and remaining[group] == 0 and group not in failed_groups:
+                # 组内最后一个实体完成后立即合并，与其余任务的导出并行
+                submit_merge(group)
+        for group, future in merge_futures:
+            path = future.result()
+            if path:
+                merged.append(path)
+                if journal is not None:
+                    journal.finish(_group_key(*group, groups[group]), path)
+    return results, merged
+
+
+def _read_ids(values, ids_file):
+    ids = []
+    for value in values:
+        ids.extend(part.strip() for part in value.split(',') if part.strip())
+    if ids_file:
+        with open(ids_file, encoding="utf-8") as f:
+            ids.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    return ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对多个车辆(carId)或企业(entId)批量导出同一组报表")
+    parser.add_argument("--report", action="append", required=True, help="接口名，如getStaOilExport，可重复指定")
+    parser.add_argument("--ids", action="append", default=[], help="实体id，逗号分隔，可重复指定")
+    parser.add_argument("--ids-file", help="实体id文件，每行一个")
+    parser.add_argument("--key", choices=ENTITY_KEYS,
+                        help="替换的参数名，默认有carId时用carId，有entId时用entId，都没有时必须指定")
+    parser.add_argument("--language", action="append", help="导出语言，可重复指定，默认全部")
+    parser.add_argument("--merge", action="store_true", help="同一语言和接口的所有实体合并为一个工作簿")
+    parser.add_argument("--shard", choices=("day", "week"), help="时间范围较长的导出再按天或按周分片")
+    parser.add_argument("--workers", type=int, default=EXPORT_MAX_WORKERS, help="同时进行的导出总数上限")
+    parser.add_argument("--resume", action="store_true", help="跳过运行日志中已完成的任务")
+    parser.add_argument("--journal", default=BATCH_JOURNAL_PATH, help="运行日志路径")
+    args = parser.parse_args()
+
+    entity_ids = _read_ids(args.ids, args.ids_file)
+    if not entity_ids:
+        parser.error("需要通过--ids或--ids-file指定实体id")
+    try:
+        reports = find_reports(args.report)
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.key:
+        # 参数中没有carId/entId的接口必须显式指定--key
+        for request_data in reports:
+            try:
+                entity_key(request_data[1])
+            except ValueError as e:
+                parser.error(f"{endpoint_name(request_data[0])}: {str(e)}，请使用--key")
+
+    start = time.perf_counter()
+    with RunJournal(args.journal, resume=args.resume) as journal:
+        results, merged = run_batch(entity_ids, args.language or LANGUAGE_LIST, reports, key=args.key,
+                                    merge=args.merge, shard=args.shard, journal=journal, max_workers=args.workers)
+    failed = [result for result in results if not result.path]
+    print(f"\n全部完成，耗时{time.perf_counter() - start:.1f}s，共{len(results)}个任务，失败{len(failed)}个")
+    for result in failed:
+        print(f"  {result.job.language} {endpoint_name(result.job.url)} {result.job.params} {result.error or ''}")
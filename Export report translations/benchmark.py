@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import percentile
+
+SCENARIOS = ('export', 'download_report', 'screenshot')
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def summarize(scenario, latencies, errors, wall):
+    """汇总一个场景的吞吐量、延迟分位数和峰值内存"""
+    latencies = sorted(latencies)
+    return {
+        'scenario': scenario,
+        'jobs': len(latencies),
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'throughput_per_s': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_s': round(percentile(latencies, 50), 4),
+        'p95_s': round(percentile(latencies, 95), 4),
+        'p99_s': round(percentile(latencies, 99), 4),
+        'peak_rss_mb': round(peak_rss_mb() or 0, 1),
+    }
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    try:
+        ok = bool(func(*args))
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_export(languages, workers):
+    from config import LANGUAGE_LIST
+    from export_engine import ExportEngine, build_jobs
+    from get_sta_overview_export import url_list
+
+    jobs = build_jobs(LANGUAGE_LIST[:languages], url_list)
+    start = time.perf_counter()
+    results = list(ExportEngine(max_workers=workers).run(jobs))
+    wall = time.perf_counter() - start
+    return summarize('export', [r.elapsed for r in results], sum(1 for r in results if not r.path), wall)
+
+
+def run_download_report(languages, workers):
+    from config import BASE_URL, LANGUAGE_LIST
+    from download_report import download_report
+
+    base_url = f"{BASE_URL}/device-service/task/save"
+    jobs = [(language, base_url, {"exportDataType": str(data_type)})
+            for language in LANGUAGE_LIST[:languages] for data_type in range(3)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda job: _timed(download_report, *job), jobs))
+    wall = time.perf_counter() - start
+    return summarize('download_report', [r[0] for r in results], sum(1 for r in results if not r[1]), wall)
+
+
+def run_screenshot(languages, workers):
+    from config import LANGUAGE_LIST
+    from screenshot_pipeline import ScreenshotPipeline
+
+    start = time.perf_counter()
+    progress = ScreenshotPipeline(download_workers=workers, on_progress=None).run(LANGUAGE_LIST[:languages])
+    wall = time.perf_counter() - start
+    # 每个语言的延迟为从开始到该语言图片全部下载完成的耗时
+    latencies = [p.elapsed or wall for p in progress.values()]
+    errors = sum(1 for p in progress.values() if p.failed or not p.total)
+    return summarize('screenshot', latencies, errors, wall)
+
+
+RUNNERS = {
+    'export': run_export,
+    'download_report': run_download_report,
+    'screenshot': run_screenshot,
+}
+
+
+def run_scenario_subprocess(scenario, stub, args, output_dir):
+    # 每个场景在独立进程中运行，峰值内存互不影响
+    env = dict(os.environ,
+               EXPORT_BASE_URL=stub.base_url,
+               SCREENSHOT_SERVICE_URL=stub.url,
+               TRANSLATION_DIR=os.path.join(output_dir, scenario))
+    result_file = os.path.join(output_dir, f"{scenario}.json")
+    command = [sys.executable, os.path.abspath(__file__), '--scenario', scenario, '--result-file', result_file,
+               '--languages', str(args.languages), '--workers', str(args.workers)]
+    stdout = None if args.verbose else subprocess.DEVNULL
+    subprocess.run(command, env=env, stdout=stdout, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    with open(result_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_report(results):
+    header = f"{'场景':<16}{'任务数':>8}{'失败':>6}{'耗时(s)':>10}{'吞吐(/s)':>10}{'p50(s)':>9}{'p95(s)':>9}{'p99(s)':>9}{'峰值内存(MB)':>14}"
+    print(header)
+    for r in results:
+        print(f"{r['scenario']:<16}{r['jobs']:>8}{r['errors']:>6}{r['wall_s']:>10}{r['throughput_per_s']:>10}"
+              f"{r['p50_s']:>9}{r['p95_s']:>9}{r['p99_s']:>9}{r['peak_rss_mb']:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="基于本地桩服务的离线性能基准测试")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                        help="要运行的场景，可重复指定，默认全部")
+    parser.add_argument("--languages", type=int, default=5, help="参与测试的语言数量")
+    parser.add_argument("--workers", type=int, default=16, help="并发数")
+    parser.add_argument("--latency", type=float, default=0.005, help="桩服务基础延迟（秒）")
+    parser.add_argument("--export-latency", type=float, default=0.05, help="导出接口生成报表延迟（秒）")
+    parser.add_argument("--payload-size", type=int, default=256 * 1024, help="报表文件大小（字节）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="导出接口错误率")
+    parser.add_argument("--task-delay", type=float, default=1.0, help="导出任务完成耗时（秒）")
+    parser.add_argument("--screenshot-latency", type=float, default=0.5, help="每种语言截图耗时（秒）")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    parser.add_argument("--verbose", action="store_true", help="显示场景进程的输出")
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.result_file:
+        # 子进程：运行单个场景并写出结果
+        result = RUNNERS[args.scenario[0]](args.languages, args.workers)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    from stub_server import StubServer, StubConfig
+
+    stub_config = StubConfig(latency=args.latency, export_latency=args.export_latency,
+                             payload_size=args.payload_size, error_rate=args.error_rate,
+                             task_delay=args.task_delay, screenshot_latency=args.screenshot_latency)
+    results = []
+    with StubServer(stub_config) as stub, tempfile.TemporaryDirectory() as output_dir:
+        for scenario in args.scenario or SCENARIOS:
+            results.append(run_scenario_subprocess(scenario, stub, args, output_dir))
+        counts = stub.counts
+
+    print_report(results)
+    print(f"\n桩服务请求统计: {json.dumps(counts, ensure_ascii=False)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({'results': results, 'stub_requests': counts}, f, indent=2, ensure_ascii=False)
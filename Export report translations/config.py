@@ -1,5 +1,10 @@
-# API配置
-BASE_URL = "http://saas.gpsnow.net/saas-pre/web/api"
+import os
+
+# API配置（可通过环境变量覆盖，便于指向本地桩服务做基准测试）
+BASE_URL = os.environ.get("EXPORT_BASE_URL", "http://saas.gpsnow.net/saas-pre/web/api")
+
+# 网页截图服务地址
+SCREENSHOT_SERVICE_URL = os.environ.get("SCREENSHOT_SERVICE_URL", "http://192.168.100.190:8000")
 
 # 登录配置
 LOGIN_CONFIG = {
@@ -8,6 +13,11 @@ LOGIN_CONFIG = {
     "timezone_second": 28800
 }
 
+# Token缓存配置
+TOKEN_TTL = 1800             # token有效期（秒），到期前自动重新登录
+TOKEN_REFRESH_MARGIN = 60    # 提前刷新的时间余量（秒）
+AUTH_FAILURE_CODES = (401, 403)  # 视为认证失败的状态码/业务码
+
 # 支持的语言列表
 LANGUAGE_LIST = [
     'en',    # 英语
@@ -36,11 +46,113 @@ LANGUAGE_LIST = [
 ]
 
 # 文件保存路径配置
-import os
 DESKTOP_PATH = os.path.join(os.path.expanduser("~"), "Desktop")
-TRANSLATION_DIR = os.path.join(DESKTOP_PATH, "语言翻译")
+TRANSLATION_DIR = os.environ.get("TRANSLATION_DIR", os.path.join(DESKTOP_PATH, "语言翻译"))
+# 各导出接口请求编码（json/form/query）的协商结果缓存
+ENCODING_CACHE_PATH = os.path.join(TRANSLATION_DIR, ".encoding_cache.json")
+# 运行日志（断点续跑），每完成一个导出任务追加一行
+EXPORT_JOURNAL_PATH = os.path.join(TRANSLATION_DIR, ".export_journal.jsonl")
+DOWNLOAD_JOURNAL_PATH = os.path.join(TRANSLATION_DIR, ".download_journal.jsonl")
+BATCH_JOURNAL_PATH = os.path.join(TRANSLATION_DIR, ".batch_journal.jsonl")
+# 按内容哈希存储下载文件，各语言目录中的文件为指向此处的硬链接
+ARTIFACT_STORE_DIR = os.path.join(TRANSLATION_DIR, ".store")
+# 请求耗时统计（设置环境变量EXPORT_METRICS=1开启），运行结束时输出到该目录
+METRICS_ENABLED = os.environ.get("EXPORT_METRICS") == "1"
+METRICS_DIR = os.path.join(TRANSLATION_DIR, ".metrics")
+# 截图分块哈希缓存和未翻译检查报告
+SCREENSHOT_TILE_CACHE_PATH = os.path.join(TRANSLATION_DIR, ".screenshot_tiles.json")
+SCREENSHOT_REPORT_PATH = os.path.join(TRANSLATION_DIR, "screenshot_untranslated.json")
+# 导出工作簿解析结果缓存和未翻译检查报告
+WORKBOOK_CACHE_PATH = os.path.join(TRANSLATION_DIR, ".workbook_cache.json")
+WORKBOOK_REPORT_PATH = os.path.join(TRANSLATION_DIR, "workbook_untranslated.json")
+# 翻译索引（SQLite），记录各语言导出工作簿和截图中的文本
+TRANSLATION_INDEX_PATH = os.path.join(TRANSLATION_DIR, ".translation_index.sqlite")
 
 # 请求头配置
 DEFAULT_HEADERS = {
     'User-Agent': 'python-requests/2.31.0'
-} 
\ No newline at end of file
+}
+
+# HTTP连接池配置
+HTTP_POOL_SIZE = 32          # 每个host保持的keep-alive连接数
+HTTP_CONNECT_TIMEOUT = 5     # 建立连接超时（秒）
+HTTP_READ_TIMEOUT = 300      # 读取超时（秒），报表由服务端实时生成，需留足时间
+
+# 文件写入配置
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # 流式写盘的分块大小（字节）
+# 出现这些Content-Type说明服务端返回的是错误信息而不是报表/图片，不落盘
+REJECTED_CONTENT_TYPES = ('application/json', 'text/html', 'text/plain')
+ARTIFACT_DEDUP = True          # 相同内容只在ARTIFACT_STORE_DIR中存一份
+
+# 并发导出配置
+EXPORT_MAX_WORKERS = 16          # 同时进行的导出总数上限
+EXPORT_HOST_LIMIT = 12           # 每个host同时进行的导出数上限
+EXPORT_SERVICE_LIMITS = {        # 每个服务前缀同时进行的导出数上限，实际并发由AIMD在此范围内自适应
+    'location-service': 12,
+    'alarm-service': 12,
+    'device-service': 8,
+    'user-service': 8,
+}
+EXPORT_DEFAULT_SERVICE_LIMIT = 4  # 未单独配置的服务（及按host区分的截图、下载地址）使用的上限
+ADAPTIVE_INITIAL_LIMIT = 2        # 每个服务的初始并发数
+ADAPTIVE_MIN_LIMIT = 1            # 过载时最低保留的并发数
+ADAPTIVE_LATENCY_TOLERANCE = 2.0  # 近期首字节耗时超过基线的倍数时视为过载
+
+# asyncio导出与任务轮询配置
+ASYNC_MAX_IN_FLIGHT = 300        # 单个事件循环的连接池连接数上限；同时进行的导出数由各服务限流器决定，最多为EXPORT_SERVICE_LIMITS之和
+TASK_POLL_INTERVAL = 1           # 任务列表轮询间隔（秒）
+TASK_TIMEOUT = 600               # 等待导出任务完成的最长时间（秒）
+TASK_POLL_MAX_INTERVAL = 10      # 任务列表轮询退避的最大间隔（秒）
+TASK_EXPECTED_DURATION = 5       # 导出任务完成耗时的初始估计（秒），运行中按实际耗时自适应
+
+# 重试与熔断配置
+RETRY_MAX_ATTEMPTS = 4            # 每次调用最多尝试次数（含首次）
+RETRY_BASE_DELAY = 0.5            # 首次重试的退避上限（秒），之后每次翻倍
+RETRY_MAX_DELAY = 30              # 单次退避上限（秒）
+RETRY_MAX_ELAPSED = 120           # 单次调用含重试的总耗时上限（秒）
+RETRY_STATUS = (429, 500, 502, 503, 504)  # 幂等请求可重试的状态码
+BREAKER_FAILURE_THRESHOLD = 5     # 连续失败多少次后熔断该服务
+BREAKER_RESET_TIMEOUT = 30        # 熔断后多久放行一个探测请求（秒）
+EXPORT_RUN_DEADLINE = None        # 整轮导出的耗时上限（秒），None表示不限制
+
+# 截图采集配置
+SCREENSHOT_WINDOW = 4             # 同时进行的截图任务数（浏览器自动化较重，不宜过多）
+SCREENSHOT_DOWNLOAD_WORKERS = 8   # 图片下载线程数
+SCREENSHOT_BASELINES = ('zh-CN', 'en')  # 作为对比基准的源语言
+SCREENSHOT_TILE_SIZE = 32         # 分块边长（像素）
+SCREENSHOT_DOWNSAMPLE = 4         # 分块比较前的降采样倍数
+SCREENSHOT_TEXT_CONTRAST = 48     # 文字分块的最小灰度极差（另需横纵两向都有笔画边缘、且与相邻分块连成一行）
+SCREENSHOT_UNTRANSLATED_RATIO = 0.3  # 与基准相同的文字分块占比达到该值时标记为未翻译
+SCREENSHOT_COMPARE_WORKERS = None  # 分块计算进程数，None表示CPU核数
+
+# openAPITest测试数据配置
+FAKE_POOL_LOCALE = "zh_CN"        # Faker区域设置
+FAKE_POOL_BATCH = 256             # 每个字段每批预生成的数量
+
+# 导出工作簿翻译检查配置
+WORKBOOK_BASELINES = ('zh-CN', 'en')  # 作为对比基准的源语言
+WORKBOOK_HEADER_ROWS = 2          # 每个工作表前几行非空行视为表头（标题行+列名行）
+WORKBOOK_SCAN_ROWS = 500          # 每个工作表最多扫描的数据行数，用于提取枚举值
+WORKBOOK_ENUM_MAX = 30            # 不同取值不超过该数量且有重复的文本列视为枚举列
+WORKBOOK_DIFF_WORKERS = None      # 解析进程数，None表示CPU核数
+RTL_LANGUAGES = ('ar', 'fa', 'he')  # 从右到左书写的语言
+
+# 翻译索引配置
+TRANSLATION_INDEX_ROWS = WORKBOOK_HEADER_ROWS + WORKBOOK_SCAN_ROWS  # 每个工作表索引的行数
+TRANSLATION_INDEX_WORKERS = None  # 解析进程数，None表示CPU核数
+
+# 分片导出配置：时间范围较长的导出按天或按周拆分后并发导出，再合并为一个文件
+SHARD_UNIT = 'week'               # 分片粒度：day或week
+SHARD_MIN_SPAN_DAYS = 7           # 时间范围超过该天数的导出才分片
+SHARD_MAX_WORKERS = 4             # 一个导出同时进行的分片数上限，额外的分片还需取得服务限流器的名额
+SHARD_HEADER_ROWS = WORKBOOK_HEADER_ROWS  # 合并时只保留第一个分片的表头行
+SHARD_ENDPOINTS = (               # 允许分片的接口：只有逐行明细的详单可以按时间拼接，汇总/统计报表拼接后合计不正确
+    'getOverSpeedDetailExport',
+    'getStopDetailExport',
+    'getIdlingDetailExport',
+    'queryDetailExport',
+    'queryAlarmDetailExport',
+    'inOutFenceDetailExport',
+    'fenceAlarmDetailExport',
+    'punchDetailExport',
+)
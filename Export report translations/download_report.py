@@ -1,13 +1,22 @@
+import argparse
 import requests
+import http_client
 from datetime import datetime, timedelta
 import json
 import os
-import time
-from get_task_list import get_task_list
-from login import login
-from config import BASE_URL, LANGUAGE_LIST, TRANSLATION_DIR, DEFAULT_HEADERS, LOGIN_CONFIG
+import metrics
+import threading
+from get_task_list import TaskListReader
+from task_watcher import TaskWatcher, TaskTimeoutError
+from adaptive_limiter import get_limiter
+from token_manager import call_with_token
+from retry import call_with_retry
+from artifact_writer import save_response
+from encoding_cache import encoding_cache, send_negotiated, is_rejected_encoding
+from run_journal import RunJournal, job_key
+from config import BASE_URL, LANGUAGE_LIST, TRANSLATION_DIR, DEFAULT_HEADERS, LOGIN_CONFIG, TASK_TIMEOUT, DOWNLOAD_JOURNAL_PATH
 
-def download_report(accept_language='', base_url='', params=None):
+def download_report(accept_language='', base_url='', params=None, timeout=TASK_TIMEOUT):
     """
     调用获取统计概览导出接口，并下载生成的报表文件
     
@@ -15,58 +24,66 @@ def download_report(accept_language='', base_url='', params=None):
         accept_language (str): 接受的语言代码，如'zh-CN', 'en'等
         base_url (str): API的基础URL地址
         params (dict): 请求参数，包含导出配置信息
-        method (str): 请求方法，'get'或'post'，默认为'get'
+        timeout (float): 等待导出任务完成的最长时间（秒）
     
     Returns:
         str: 保存的文件路径，如果失败则返回None
     """
-    # 获取当前任务列表，用于后续对比找出新建的任务
-    old_task_list = get_task_list()
-
     # 设置请求头信息
     headers = {
-        'Token':login(accept_language=accept_language),
         'Accept-Language': accept_language,
         'User-Agent': 'python-requests/2.31.0'
     }
 
-    try:
+    # 本次请求使用的编码，解析出任务ID后才写入编码缓存
+    negotiated = {}
+
+    def send(token):
         # 根据指定的方法发送请求
-        response = requests.get(base_url, headers=headers, params=params)
-        if not response.ok:
-            response = requests.post(base_url, headers=headers, json=params)
-      
+        headers['Token'] = token
+        # 先尝试GET，接口拒绝该方法（400/404/405/415）时改用JSON格式POST；5xx不换方法重试，
+        # 避免第一次请求其实已创建任务时重复提交。协商出的编码按接口缓存
+        response, negotiated['encoding'] = send_negotiated(base_url, headers, params, ('query', 'json'),
+                                                           is_rejected_encoding)
+        return response
 
-        # 循环检查任务状态，直到获取到下载URL
-        new_task_list = get_task_list()
-        latest_task = new_task_list - old_task_list
-        while(1):
-            new_task_list = get_task_list()
-            # 找出新创建的任务
-            latest_task = new_task_list - old_task_list
-            # 当任务完成且有下载URL时退出循环
-            if latest_task and list(latest_task)[0][1] != "":
-                url = list(latest_task)[0][1]
-                break
-            time.sleep(1)  # 等待1秒后再次检查
+    limiter = get_limiter(http_client.service_of(base_url))
+    try:
+        # token按账号缓存，认证失败时重新登录一次
+        # 创建任务不是幂等操作，只在请求确定未被处理时重试，避免重复创建任务；
+        # 创建任务时占用所属服务限流器的一个并发额度，与导出和任务列表轮询共用服务的并发上限
+        limiter.acquire()
+        try:
+            with metrics.tags(language=accept_language):
+                response = call_with_retry(lambda: call_with_token(send, accept_language=accept_language),
+                                           base_url, idempotent=False)
+        finally:
+            limiter.release()
+        response.raise_for_status()
+
+        # 按task/save返回的任务ID登记到共享的任务观察者，等待任务完成
+        task_id = parse_task_id(response)
+        if task_id is None:
+            print(f"未能从响应中解析任务ID: {response.text}")
+            return None
+        encoding_cache.set(base_url, negotiated['encoding'])
+        url = get_task_watcher().wait(task_id, timeout)
 
-        # 下载文件
-        response = requests.get(url)
+        # 下载文件（流式读取，不把整个报表读入内存）
+        with metrics.tags(language=accept_language):
+            response = call_with_retry(lambda: http_client.get(url, stream=True), url)
         
         # 设置保存文件的路径结构
-        base_dir = os.path.join(os.path.expanduser("~"), "Desktop", "语言翻译")
+        base_dir = TRANSLATION_DIR
         lang_dir = os.path.join(base_dir, f"导出端-{accept_language}")
         os.makedirs(lang_dir, exist_ok=True)
         
         # 构建文件名并处理特殊字符
         file_name = os.path.join(lang_dir, rf"{url.split('/')[-1]}").replace(" ", "_").replace(":", "_").replace("C_", "C:")
         
-        # 保存文件
-        with open(file_name, "wb") as f:
-            f.write(response.content)
-        
-        # 检查下载是否成功
-        response.raise_for_status()
+        # 校验下载是否成功后流式写入临时文件，再原子替换到目标路径
+        with metrics.tags(language=accept_language):
+            save_response(response, file_name)
         
         print(f"文件已成功保存到: {file_name}")
         return file_name
@@ -79,36 +96,57 @@ def download_report(accept_language='', base_url='', params=None):
             print(f"错误响应头: {json.dumps(dict(e.response.headers), indent=2, ensure_ascii=False)}")
             print(f"错误详情: {e.response.text}")
         return None
+    except TaskTimeoutError as e:
+        # 处理任务等待超时
+        print(f"导出任务超时: {str(e)}")
+        return None
     except IOError as e:
         # 处理文件操作异常
         print(f"文件操作错误: {str(e)}")
         return None
 
-def get_task_list():
+def parse_task_id(response):
     """
-    获取当前任务列表
+    从/device-service/task/save的响应中解析任务ID
     
     Returns:
-        set: 包含任务ID和下载URL的元组集合
+        str: 任务ID，无法解析时返回None
     """
-    return_data = set()
-    headers = {
-        'Token':login(),
-        'User-Agent': 'python-requests/2.31.0'
-    }
     try:
-        response = requests.get(f"{BASE_URL}/device-service/task/list", headers=headers)
-        response.raise_for_status()
-        result = response.json()
-        if result.get('code') == 200:
-            for item in result.get('data', []):
-                task_id = item.get('id')
-                download_url = item.get('downloadUrl', '')
-                return_data.add((task_id, download_url))
-                print(f"任务ID: {task_id}, 下载URL: {download_url}")  # 添加打印语句
-    except Exception as e:
-        print(f"获取任务列表失败: {str(e)}")
-    return return_data
+        return task_id_of(response.json())
+    except ValueError:
+        return None
+
+def task_id_of(result):
+    """
+    从task/save已解析的JSON响应体中取任务ID
+    
+    Returns:
+        str: 任务ID，无法解析时返回None
+    """
+    try:
+        data = result.get('data')
+    except AttributeError:
+        return None
+    if isinstance(data, dict):
+        data = data.get('id', data.get('taskId'))
+    return None if data in (None, '') else str(data)
+
+def get_task_watcher():
+    """
+    获取进程内共享的任务观察者，所有download_report调用共用一次任务列表轮询
+    
+    Returns:
+        TaskWatcher: 任务观察者
+    """
+    global _task_watcher
+    with _task_watcher_lock:
+        if _task_watcher is None:
+            _task_watcher = TaskWatcher(TaskListReader().snapshot, limiter=get_limiter('device-service'))
+        return _task_watcher
+
+_task_watcher = None
+_task_watcher_lock = threading.Lock()
 
 if __name__ == "__main__":
     print("开始测试API调用...")
@@ -125,12 +163,24 @@ if __name__ == "__main__":
     
     base_url = f"{BASE_URL}/device-service/task/save"
 
-    # 遍历所有语言和导出类型进行测试
-    for language in LANGUAGE_LIST:
-        for request_data in para_list:
-            result = download_report(language, base_url, request_data)
-            if result:
-                print("\n接口调用成功，文件保存在:")
-                print(result)
-            else:
-                print("\n接口调用失败")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="多语言下载导出任务报表")
+    parser.add_argument("--resume", action="store_true", help="跳过运行日志中已完成的任务，重跑失败和中断的任务")
+    parser.add_argument("--journal", default=DOWNLOAD_JOURNAL_PATH, help="运行日志路径")
+    args = parser.parse_args()
+
+    # 遍历所有语言和导出类型进行测试，每个任务的结果记录到运行日志
+    with RunJournal(args.journal, resume=args.resume) as journal:
+        for language in LANGUAGE_LIST:
+            for request_data in para_list:
+                key = job_key(language, base_url, request_data)
+                if journal.is_done(key):
+                    print(f"\n跳过已完成的任务: {language} exportDataType={request_data['exportDataType']}")
+                    continue
+                journal.start(key)
+                result = download_report(language, base_url, request_data)
+                journal.finish(key, result)
+                if result:
+                    print("\n接口调用成功，文件保存在:")
+                    print(result)
+                else:
+                    print("\n接口调用失败")
@@ -0,0 +1,169 @@
+import json
+import threading
+from urllib.parse import urlsplit
+import http_client
+from artifact_writer import atomic_write
+from config import ENCODING_CACHE_PATH
+
+# 支持的请求编码：GET查询参数、JSON请求体、form表单
+ENCODINGS = ('query', 'json', 'form')
+
+# 编码 -> (请求方法, 参数在请求函数中的参数名)
+_ENCODING_REQUESTS = {'query': ('GET', 'params'), 'json': ('POST', 'json'), 'form': ('POST', 'data')}
+
+# 表示接口不接受该请求方法或编码的状态码；5xx等其他错误不代表编码不对，不换编码重试
+REJECTED_ENCODING_STATUS = (400, 404, 405, 415)
+
+
+# 以下判断只依赖状态码和响应头，阻塞版本（requests）和asyncio版本（aiohttp）共用
+
+def is_rejected_encoding(status, headers):
+    """响应状态码是否表明接口不接受该请求方法或编码"""
+    return status in REJECTED_ENCODING_STATUS
+
+
+def is_json_response(status, headers):
+    """
+    导出接口是否返回了JSON（参数错误信息）而不是文件，说明接口不接受该编码；
+    只看Content-Type，避免把报表内容整体读入内存
+    """
+    return 200 <= status < 400 and 'json' in headers.get('Content-Type', '')
+
+
+def needs_next_encoding(status, headers, needs_fallback):
+    """
+    是否换下一个编码重发：needs_fallback判定编码不被接受时换；
+    5xx响应不换编码，避免第一次请求其实已被处理时对非幂等接口重复提交
+    """
+    return status < 500 and needs_fallback(status, headers)
+
+
+def encoding_request(encoding):
+    """
+    返回编码对应的请求方法和参数名
+
+    Returns:
+        tuple: (请求方法, 参数名)，如('POST', 'json')
+
+    Raises:
+        ValueError: 未知的编码
+    """
+    try:
+        return _ENCODING_REQUESTS[encoding]
+    except KeyError:
+        raise ValueError(f"未知的请求编码: {encoding}") from None
+
+
+def _endpoint_key(url):
+    # 只按接口路径区分，忽略查询参数
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class EncodingCache:
+    """
+    按接口持久化缓存请求编码的协商结果，后续调用和后续运行直接复用，
+    每次导出只触发一次服务端报表生成
+
+    Args:
+        path (str): 缓存文件路径
+    """
+
+    def __init__(self, path=ENCODING_CACHE_PATH):
+        self.path = path
+        self._encodings = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._encodings is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._encodings = json.load(f)
+            except (IOError, ValueError):
+                self._encodings = {}
+        return self._encodings
+
+    def get(self, url):
+        """
+        获取接口已协商的编码
+
+        Returns:
+            str: 'query'、'json'或'form'，未协商过返回None
+        """
+        with self._lock:
+            return self._load().get(_endpoint_key(url))
+
+    def set(self, url, encoding):
+        """记录接口的编码并写入缓存文件"""
+        key = _endpoint_key(url)
+        with self._lock:
+            encodings = self._load()
+            if encodings.get(key) == encoding:
+                return
+            encodings[key] = encoding
+            data = json.dumps(encodings, indent=2, ensure_ascii=False).encode("utf-8")
+            try:
+                atomic_write(self.path, [data])
+            except IOError as e:
+                print(f"写入编码缓存失败: {str(e)}")
+
+
+# 进程内共享的默认实例
+encoding_cache = EncodingCache()
+
+
+def send_encoded(encoding, url, headers, params, **kwargs):
+    """
+    按指定编码发送请求
+
+    Args:
+        encoding (str): 'query'、'json'或'form'
+        url (str): 请求地址
+        headers (dict): 请求头
+        params (dict): 请求参数
+        **kwargs: 透传给http_client.request的参数
+
+    Returns:
+        requests.Response: 响应对象
+    """
+    method, field = encoding_request(encoding)
+    return http_client.request(method, url, headers=headers, **{field: params}, **kwargs)
+
+
+def encodings_to_try(url, candidates, cache=encoding_cache):
+    """
+    返回按顺序尝试的编码：接口已协商过且在候选中时只用缓存的编码，否则依次尝试全部候选
+
+    Returns:
+        tuple: 编码序列
+    """
+    encoding = cache.get(url)
+    return (encoding,) if encoding in candidates else tuple(candidates)
+
+
+def send_negotiated(url, headers, params, candidates, needs_fallback, cache=encoding_cache, **kwargs):
+    """
+    使用缓存的编码发送请求；未缓存时按候选顺序尝试，needs_fallback判定编码不被接受时换下一个
+
+    这里不写缓存：响应成功不代表内容正确（如返回200的错误页），调用方校验内容后
+    再调用cache.set(url, encoding)。5xx响应不换编码，避免对非幂等接口重复提交
+
+    Args:
+        url (str): 请求地址
+        headers (dict): 请求头
+        params (dict): 请求参数
+        candidates (tuple): 按顺序尝试的编码
+        needs_fallback (callable): 接收(状态码, 响应头)，返回True表示该编码不被接口接受，需尝试下一个
+        cache (EncodingCache): 编码缓存
+        **kwargs: 透传给http_client.request的参数
+
+    Returns:
+        tuple: (requests.Response响应对象, 使用的编码)
+    """
+    encodings = encodings_to_try(url, candidates, cache)
+    for encoding in encodings[:-1]:
+        response = send_encoded(encoding, url, headers, params, **kwargs)
+        if not needs_next_encoding(response.status_code, response.headers, needs_fallback):
+            return response, encoding
+        response.close()
+    return send_encoded(encodings[-1], url, headers, params, **kwargs), encodings[-1]
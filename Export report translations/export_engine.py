@@ -0,0 +1,225 @@
+import argparse
+import os
+import time
+from functools import partial
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from get_sta_overview_export import get_sta_overview_export, url_list
+from http_client import service_of
+from adaptive_limiter import get_limiter
+from retry import get_breaker
+from run_journal import RunJournal, job_key, file_checksum
+from artifact_store import artifact_store
+from config import LANGUAGE_LIST, EXPORT_MAX_WORKERS, EXPORT_HOST_LIMIT, EXPORT_JOURNAL_PATH, EXPORT_RUN_DEADLINE
+
+# 所有服务都处于Retry-After等待时，调度线程的最长休眠时间（秒）
+_BLOCKED_POLL_INTERVAL = 0.5
+
+# 一个导出任务：语言 × 接口
+ExportJob = namedtuple('ExportJob', ['language', 'url', 'params', 'method'])
+
+# 导出结果：path为保存的文件路径，失败时为None，error为异常信息，
+# checksum为文件的(sha256, 字节数)，只在记录运行日志时由工作线程计算
+ExportResult = namedtuple('ExportResult', ['job', 'path', 'error', 'elapsed', 'checksum'], defaults=(None,))
+
+
+def host_of(url):
+    """返回URL的host"""
+    return urlsplit(url).netloc
+
+
+def build_jobs(languages=LANGUAGE_LIST, requests_list=url_list):
+    """
+    将语言列表与接口列表展开为导出任务矩阵
+
+    Args:
+        languages (list): 语言代码列表
+        requests_list (list): (URL, 请求参数[, 请求方法])列表，格式同url_list
+
+    Returns:
+        list: ExportJob列表
+    """
+    jobs = []
+    for language in languages:
+        for request_data in requests_list:
+            url, params = request_data[0], request_data[1]
+            method = request_data[2] if len(request_data) > 2 else "post"
+            jobs.append(ExportJob(language, url, params, method))
+    return jobs
+
+
+class ExportEngine:
+    """
+    有界并发的导出引擎，同时限制总并发、每个host并发和每个服务前缀并发；
+    服务前缀的并发上限由自适应限流器根据服务端延迟和错误动态调整，熔断中的服务暂缓派发
+
+    Args:
+        max_workers (int): 同时进行的导出总数上限
+        host_limit (int): 每个host的并发上限
+        limiter_for (callable): 服务前缀 -> AIMDLimiter
+        breaker_for (callable): 服务前缀 -> CircuitBreaker
+        export_func (callable): 执行单个导出的函数，签名同get_sta_overview_export
+        deadline (float): 整轮导出的耗时上限（秒），超出后未派发的任务直接以失败返回
+    """
+
+    def __init__(self, max_workers=EXPORT_MAX_WORKERS,
+                 host_limit=EXPORT_HOST_LIMIT,
+                 limiter_for=get_limiter,
+                 breaker_for=get_breaker,
+                 export_func=get_sta_overview_export,
+                 deadline=EXPORT_RUN_DEADLINE):
+        self.max_workers = max_workers
+        self.host_limit = host_limit
+        self.limiter_for = limiter_for
+        self.breaker_for = breaker_for
+        self.export_func = export_func
+        self.deadline = deadline
+        self._host_running = {}
+        self._probing = {}           # 服务前缀 -> 正在执行的熔断探测任务
+
+    def _try_acquire(self, job):
+        host, service = host_of(job.url), service_of(job.url)
+        breaker = self.breaker_for(service)
+        if self._host_running.get(host, 0) >= self.host_limit or breaker.is_open():
+            return False
+        # 熔断恢复时间已到时熔断器只放行一个探测请求，该服务同时只派发一个任务，
+        # 其余任务留在队列中等探测结果，不会因CircuitOpenError直接失败
+        probe = not breaker.is_closed()
+        if probe and service in self._probing:
+            return False
+        if not self.limiter_for(service).try_acquire():
+            return False
+        self._host_running[host] = self._host_running.get(host, 0) + 1
+        if probe:
+            self._probing[service] = job
+        return True
+
+    def _release(self, job):
+        service = service_of(job.url)
+        self._host_running[host_of(job.url)] -= 1
+        if self._probing.get(service) is job:
+            del self._probing[service]
+        self.limiter_for(service).release()
+
+    def _job_key(self, job):
+        return job_key(job.language, job.url, job.params)
+
+    def _run_job(self, job, checksum=False):
+        start = time.perf_counter()
+        try:
+            path = self.export_func(job.language, job.url, job.params, job.method)
+            # 运行日志需要的校验和在工作线程中计算，不占用派发线程
+            digest = file_checksum(path) if checksum and path and os.path.exists(path) else None
+            return ExportResult(job, path, None, time.perf_counter() - start, digest)
+        except Exception as e:
+            return ExportResult(job, None, e, time.perf_counter() - start)
+
+    def _next_runnable(self, pending):
+        # 跳过已达上限或熔断中的服务，避免一个繁忙服务阻塞其他服务的任务
+        for _ in range(len(pending)):
+            job = pending.popleft()
+            if self._try_acquire(job):
+                return job
+            pending.append(job)
+        return None
+
+    def run(self, jobs, journal=None):
+        """
+        并发执行导出任务，按完成顺序逐个返回结果
+
+        Args:
+            jobs (iterable): ExportJob序列
+            journal (RunJournal): 运行日志，记录每个任务的状态；续跑时跳过日志中已完成的任务
+
+        Yields:
+            ExportResult: 每个任务的执行结果
+        """
+        if journal is not None:
+            jobs = [job for job in jobs if not journal.is_done(self._job_key(job))]
+        pending = deque(jobs)
+        running = {}
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if deadline is not None and time.monotonic() > deadline:
+                    # 超出整轮耗时上限，放弃尚未派发的任务，已派发的任务照常等待完成
+                    while pending:
+                        result = ExportResult(pending.popleft(), None, TimeoutError("超出整轮导出耗时上限"), 0.0)
+                        if journal is not None:
+                            journal.finish(self._job_key(result.job), None, result.error)
+                        yield result
+                    if not running:
+                        break
+                # 在并发上限内尽可能多地派发任务
+                while pending and len(running) < self.max_workers:
+                    job = self._next_runnable(pending)
+                    if job is None:
+                        break
+                    if journal is not None:
+                        journal.start(self._job_key(job))
+                    running[executor.submit(self._run_job, job, journal is not None)] = job
+
+                if not running:
+                    # 剩余任务所属服务都在Retry-After等待或熔断中
+                    time.sleep(_BLOCKED_POLL_INTERVAL)
+                    continue
+                # 限流器上限可能随其他任务的响应而提高，有待派发任务时定期重新检查
+                done, _ = wait(running, timeout=_BLOCKED_POLL_INTERVAL if pending else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._release(running.pop(future))
+                    result = future.result()
+                    if journal is not None:
+                        journal.finish(self._job_key(result.job), result.path, result.error, result.checksum)
+                    yield result
+
+
+def run_matrix(languages=LANGUAGE_LIST, requests_list=url_list, **engine_kwargs):
+    """
+    并发导出 语言 × 接口 矩阵
+
+    Args:
+        languages (list): 语言代码列表
+        requests_list (list): 接口列表，格式同url_list
+        **engine_kwargs: 透传给ExportEngine的参数
+
+    Returns:
+        list: ExportResult列表（按完成顺序）
+    """
+    return list(ExportEngine(**engine_kwargs).run(build_jobs(languages, requests_list)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发导出 语言 × 接口 矩阵")
+    parser.add_argument("--resume", action="store_true", help="跳过运行日志中已完成的任务，重跑失败和中断的任务")
+    parser.add_argument("--journal", default=EXPORT_JOURNAL_PATH, help="运行日志路径")
+    parser.add_argument("--deadline", type=float, default=EXPORT_RUN_DEADLINE, help="整轮导出的耗时上限（秒）")
+    parser.add_argument("--shard", choices=("day", "week"),
+                        help="时间范围较长的导出按天或按周分片并发导出后合并，默认不分片")
+    parser.add_argument("--prune-store", action="store_true",
+                        help="导出结束后删除内容哈希仓库中不再被引用的文件（不要与其他导出进程同时运行）")
+    args = parser.parse_args()
+
+    jobs = build_jobs(LANGUAGE_LIST, url_list)
+    with RunJournal(args.journal, resume=args.resume) as journal:
+        remaining = [job for job in jobs if not journal.is_done(job_key(job.language, job.url, job.params))]
+        print(f"开始并发导出，共{len(jobs)}个任务，待执行{len(remaining)}个...")
+
+        start = time.perf_counter()
+        failed = []
+        engine_kwargs = {'deadline': args.deadline}
+        if args.shard:
+            from shard_export import export_sharded
+            engine_kwargs['export_func'] = partial(export_sharded, unit=args.shard)
+        for done_count, result in enumerate(ExportEngine(**engine_kwargs).run(remaining, journal), 1):
+            if not result.path:
+                failed.append(result)
+            print(f"[{done_count}/{len(remaining)}] {result.job.language} {result.job.url.split('/')[-1]} "
+                  f"{'成功' if result.path else '失败'} ({result.elapsed:.1f}s)")
+
+    print(f"\n全部完成，耗时{time.perf_counter() - start:.1f}s，失败{len(failed)}个")
+    for result in failed:
+        print(f"  {result.job.language} {result.job.url} {result.error or ''}")
+    if args.prune_store:
+        print(f"已删除{artifact_store.prune()}个未被引用的仓库文件")
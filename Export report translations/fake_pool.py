@@ -0,0 +1,102 @@
+import threading
+from collections import deque
+from config import FAKE_POOL_LOCALE, FAKE_POOL_BATCH
+
+# 预生成的字段，对应Faker的同名方法
+FIELDS = ("name", "email", "address", "phone_number")
+
+
+class FakePool:
+    """
+    预生成测试数据的池：按字段批量调用Faker生成并缓存，取值为O(1)；
+    某个字段剩余不足一批的一半时在后台线程补充该字段。Faker在第一次生成时才导入和初始化
+
+    Args:
+        locale (str): Faker的区域设置
+        batch_size (int): 每个字段每批生成的数量
+        fields (tuple): 预生成的字段
+    """
+
+    def __init__(self, locale=FAKE_POOL_LOCALE, batch_size=FAKE_POOL_BATCH, fields=FIELDS):
+        self.locale = locale
+        self.batch_size = batch_size
+        self.fields = fields
+        self._faker = None
+        self._buffers = {field: deque() for field in fields}
+        self._lock = threading.Lock()
+        # 启动后台线程用单独的锁，取值时不会等待正在进行的批量生成
+        self._thread_lock = threading.Lock()
+        self._refilling = None
+
+    def _get_faker(self):
+        if self._faker is None:
+            from faker import Faker
+            self._faker = Faker(self.locale)
+        return self._faker
+
+    def _low_water(self):
+        return self.batch_size // 2
+
+    def _refill(self, field=None):
+        # 指定field时只在其已取空时补充该字段，否则补充所有低于水位的字段；
+        # 只补不足的字段，很少使用的字段不会随其他字段一起无限增长
+        # Faker实例不是线程安全的，生成时持锁
+        with self._lock:
+            if field is not None:
+                if self._buffers[field]:
+                    # 等锁期间后台线程已经补充过
+                    return
+                names = [field]
+            else:
+                names = [name for name in self.fields if len(self._buffers[name]) < self._low_water()]
+            if not names:
+                return
+            faker = self._get_faker()
+            for name in names:
+                generate = getattr(faker, name)
+                self._buffers[name].extend(generate() for _ in range(self.batch_size))
+
+    def _refill_in_background(self):
+        with self._thread_lock:
+            if self._refilling is not None and self._refilling.is_alive():
+                return
+            self._refilling = threading.Thread(target=self._refill, name="fake-pool", daemon=True)
+            self._refilling.start()
+
+    def prefill(self, background=True):
+        """
+        预先生成一批数据
+
+        Args:
+            background (bool): 在后台线程中生成，不阻塞调用方
+        """
+        if background:
+            self._refill_in_background()
+        else:
+            self._refill()
+
+    def get(self, field):
+        """
+        取出一个字段值
+
+        Args:
+            field (str): 字段名，见FIELDS
+
+        Returns:
+            str: 生成的值
+        """
+        buffer = self._buffers[field]
+        while True:
+            try:
+                value = buffer.popleft()
+                break
+            except IndexError:
+                # 池已取空时在当前线程同步生成一批
+                self._refill(field)
+        if len(buffer) < self._low_water():
+            self._refill_in_background()
+        return value
+
+
+# 进程内共享的默认实例
+fake_pool = FakePool()
@@ -1,7 +1,11 @@
 import requests
 import json
 import os
-from login import login
+import metrics
+from token_manager import call_with_token
+from retry import call_with_retry
+from artifact_writer import save_response
+from encoding_cache import encoding_cache, send_negotiated, send_encoded, is_json_response
 from config import BASE_URL, LANGUAGE_LIST, TRANSLATION_DIR, DEFAULT_HEADERS
 
 def get_sta_overview_export(accept_language='', url='', params=None, method="post"):
@@ -20,25 +24,31 @@ def get_sta_overview_export(accept_language='', url='', params=None, method="pos
 
     # 设置请求头信息
     headers = {
-        'Token': login("ping-jxs","a12345678.",accept_language=accept_language),  # 调用登录接口获取token
         'Accept-Language': accept_language,  # 设置接受的语言
         'User-Agent': DEFAULT_HEADERS['User-Agent']  # 设置User-Agent
     }
 
-    try:
+    # 本次请求使用的编码，文件校验并保存成功后才写入编码缓存
+    negotiated = {}
+
+    def send(token):
         # 根据指定的方法发送请求
+        headers['Token'] = token  # 认证Token，由token_manager按账号缓存
         if "post" == method.lower():
-            # 首先尝试使用json格式发送请求
-            response = requests.post(url, headers=headers, json=params)
-            try:
-                # 如果json格式请求成功，则尝试使用form-data格式重新发送
-                if response.ok and response.json():
-                    response = requests.post(url, headers=headers, data=params)
-            except Exception as e:
-                pass
+            # 先尝试JSON格式，返回JSON（参数错误）时改用form-data格式；
+            # 协商出的编码按接口缓存，之后的调用只发送一次请求
+            response, negotiated['encoding'] = send_negotiated(url, headers, params, ('json', 'form'),
+                                                               is_json_response, stream=True)
         elif "get" == method.lower():
             # 发送GET请求
-            response = requests.get(url, headers=headers, params=params)
+            response = send_encoded('query', url, headers, params, stream=True)
+        return response
+
+    try:
+        # 认证失败时自动重新登录并重试一次；服务暂时不可用时退避重试
+        with metrics.tags(language=accept_language):
+            response = call_with_retry(
+                lambda: call_with_token(send, "ping-jxs", "a12345678.", accept_language=accept_language), url)
 
         # 如果请求失败，打印详细的请求信息用于调试
         if not response.ok:
@@ -58,12 +68,11 @@ def get_sta_overview_export(accept_language='', url='', params=None, method="pos
         # 根据URL构建文件名
         file_name = os.path.join(lang_dir, f"{url.split('/')[-1]}_download.xlsx")
         
-        # 将响应内容保存为Excel文件
-        with open(file_name, "wb") as f:
-            f.write(response.content)
-        
-        # 检查响应状态码，如果不是2xx则抛出异常
-        response.raise_for_status()
+        # 校验状态码和Content-Type后流式写入临时文件，再原子替换为Excel文件
+        with metrics.tags(language=accept_language):
+            save_response(response, file_name)
+        if 'encoding' in negotiated:
+            encoding_cache.set(url, negotiated['encoding'])
         
         print(f"文件已成功保存到: {file_name}")
         return file_name
@@ -1,55 +1,52 @@
 import requests
+import http_client
 import json
-from login import login
-from config import BASE_URL, LANGUAGE_LIST, TRANSLATION_DIR, DEFAULT_HEADERS, LOGIN_CONFIG
+import time
+from token_manager import call_with_token
+from config import BASE_URL, LANGUAGE_LIST, TRANSLATION_DIR, DEFAULT_HEADERS, LOGIN_CONFIG, TASK_TIMEOUT
 
 
-def get_task_list(accept_language='',):
-    """获取导出任务列表
+def get_task_page(accept_language='', page_index=1, page_size=20):
+    """获取一页导出任务
     
     Args:
         accept_language (str): 接受的语言代码，如'zh-CN', 'en'等
+        page_index (int): 页码，从1开始
+        page_size (int): 每页显示的记录数
     
     Returns:
-        set: 包含(taskId, url)元组的集合，如果发生错误则返回None
+        list: 任务字典列表（按创建时间从新到旧），如果发生错误则返回None
     """
     # API端点URL
     url = f'{BASE_URL}/device-service/task/list'
     
     # 设置分页参数
     params = {
-        'pageIndex': 1,  # 页码，从1开始
-        'pageSize': 20   # 每页显示的记录数
+        'pageIndex': page_index,  # 页码，从1开始
+        'pageSize': page_size     # 每页显示的记录数
     }
     
     # 设置请求头信息
     headers = {
         'accept': 'application/json, text/plain, */*',
         'Accept-Language': accept_language,
-        'token':login(accept_language=accept_language),
         'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36'
     }
     
     try:
-        # 发送GET请求获取任务列表
-        response = requests.get(url, params=params, headers=headers)
+        # 发送GET请求获取任务列表，token按账号缓存，认证失败时重新登录一次
+        def send(token):
+            headers['token'] = token
+            return http_client.get(url, params=params, headers=headers)
+        response = call_with_token(send, accept_language=accept_language)
         
         # 解析JSON响应
-        json_response = response.json()
-        
-        # 初始化返回数据集合
-        return_data = set()
+        data = response.json().get('data')
         
-        # 从响应中提取任务信息
-        if 'data' in json_response:
-            data = json_response['data']
-            if isinstance(data, list):
-                # 遍历任务列表，提取taskId和下载URL
-                for idx, task in enumerate(data, 1):
-                    return_data.add(
-                        (task['taskId'], task['url'])
-                    )
-        return return_data
+        # 兼容直接返回列表和返回分页对象两种格式
+        if isinstance(data, dict):
+            data = data.get('list', data.get('records', []))
+        return data if isinstance(data, list) else []
     
     except requests.exceptions.RequestException as e:
         # 处理网络请求异常
@@ -60,6 +57,142 @@ def get_task_list(accept_language='',):
         print(f"JSON解析错误: {e}")
         return None
 
+
+def task_fields(task):
+    """从任务字典中提取(任务ID, 下载URL, 创建时间)，兼容taskId/id、url/downloadUrl两种字段名"""
+    task_id = task.get('taskId', task.get('id'))
+    url = task.get('url') or task.get('downloadUrl') or ''
+    return str(task_id), url, task.get('createTime', '')
+
+
+def get_task_list(accept_language='', page_index=1, page_size=20):
+    """获取导出任务列表
+    
+    Args:
+        accept_language (str): 接受的语言代码，如'zh-CN', 'en'等
+        page_index (int): 页码，从1开始
+        page_size (int): 每页显示的记录数
+    
+    Returns:
+        set: 包含(taskId, url)元组的集合，如果发生错误则返回None
+    """
+    tasks = get_task_page(accept_language, page_index, page_size)
+    if tasks is None:
+        return None
+    return {task_fields(task)[:2] for task in tasks}
+
+
+def _id_order(task_id):
+    # 任务ID为递增的数字ID，按数值比较新旧；非数字ID退化为字符串比较
+    return (0, int(task_id)) if task_id.isdigit() else (1, task_id)
+
+
+class TaskListReader:
+    """
+    增量任务列表读取器：记录已见过的最新任务ID和时间作为水位线，
+    每次只向后翻页直到遇到已知任务，并在内存中维护紧凑的 任务ID -> 下载URL 索引
+
+    未完成的任务单独记录首次出现的时间，翻页会覆盖到其中最旧的一个以发现状态变化；
+    超过pending_max_age仍未完成的任务不再跟踪，避免一个卡住的任务让每次刷新都翻到max_pages
+
+    Args:
+        accept_language (str): 接受的语言代码
+        page_size (int): 每页记录数
+        max_pages (int): 单次刷新最多翻页数
+        max_entries (int): 索引保留的最多任务数，超出后淘汰最旧的已完成任务
+        fetch_page (callable): 获取一页任务的函数，签名同get_task_page
+        pending_max_age (float): 未完成任务的最长跟踪时间（秒），默认与等待任务的超时时间相同
+    """
+
+    def __init__(self, accept_language='', page_size=20, max_pages=20, max_entries=5000,
+                 fetch_page=get_task_page, pending_max_age=TASK_TIMEOUT):
+        self.accept_language = accept_language
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.max_entries = max_entries
+        self.fetch_page = fetch_page
+        self.pending_max_age = pending_max_age
+        self.tasks = {}           # 任务ID -> 下载URL，未完成的任务为空字符串
+        self.pending = {}         # 未完成的任务ID -> 首次出现的时间
+        self.watermark = None     # (最新任务ID, 创建时间)
+
+    def _expire_pending(self, now):
+        # 超过跟踪时间仍未完成的任务从索引中移除，之后若在翻到的页中完成会重新加入
+        for task_id, seen_at in list(self.pending.items()):
+            if now - seen_at > self.pending_max_age:
+                del self.pending[task_id]
+                if not self.tasks.get(task_id):
+                    self.tasks.pop(task_id, None)
+
+    def _oldest_pending(self):
+        return min(self.pending, key=_id_order) if self.pending else None
+
+    def refresh(self):
+        """
+        拉取水位线之后的新任务以及未完成任务的状态变化
+
+        Returns:
+            dict: 本次新增或状态发生变化的 {任务ID: 下载URL}
+        """
+        changes = {}
+        now = time.monotonic()
+        self._expire_pending(now)
+        # 翻页需要覆盖到水位线和最旧的未完成任务，二者之前的任务不会再变化
+        stop_at = self.watermark[0] if self.watermark else None
+        oldest_pending = self._oldest_pending()
+        if oldest_pending is not None and (stop_at is None or _id_order(oldest_pending) < _id_order(stop_at)):
+            stop_at = oldest_pending
+
+        newest = None
+        # 是否已读到stop_at或列表末尾；请求失败或翻到max_pages时中间还有未读取的页
+        complete = False
+        for page_index in range(1, self.max_pages + 1):
+            page = self.fetch_page(self.accept_language, page_index, self.page_size)
+            if page is None:
+                break
+            if not page:
+                complete = True
+                break
+            reached_known = False
+            for task in page:
+                task_id, url, create_time = task_fields(task)
+                if newest is None:
+                    newest = (task_id, create_time)
+                if self.tasks.get(task_id) != url:
+                    self.tasks[task_id] = url
+                    changes[task_id] = url
+                if url:
+                    self.pending.pop(task_id, None)
+                else:
+                    self.pending.setdefault(task_id, now)
+                if stop_at is None or _id_order(task_id) <= _id_order(stop_at):
+                    reached_known = True
+            # 首次读取只取第一页建立水位线，之后读到已知任务即停止翻页
+            if reached_known or len(page) < self.page_size:
+                complete = True
+                break
+
+        # 水位线不能越过未读取的页，否则其中的任务之后再也不会被读到
+        if complete and newest is not None and (
+                self.watermark is None or _id_order(newest[0]) > _id_order(self.watermark[0])):
+            self.watermark = newest
+        self._compact()
+        return changes
+
+    def _compact(self):
+        # 超出上限时淘汰最旧的已完成任务，未完成任务始终保留
+        overflow = len(self.tasks) - self.max_entries
+        if overflow <= 0:
+            return
+        for task_id in sorted((t for t, url in self.tasks.items() if url), key=_id_order)[:overflow]:
+            del self.tasks[task_id]
+
+    def snapshot(self):
+        """刷新后返回完整的任务索引（供TaskWatcher按任务ID查找）"""
+        self.refresh()
+        return self.tasks
+
+
 if __name__ == "__main__":
     # 测试获取中文任务列表
     result = get_task_list(LANGUAGE_LIST[1])
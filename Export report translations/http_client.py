@@ -0,0 +1,157 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import metrics
+from adaptive_limiter import get_limiter, parse_retry_after
+from config import DEFAULT_HEADERS, HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+# 每个host一个Session，复用keep-alive连接，握手只在首次连接时发生
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def service_of(url):
+    """
+    从URL路径中解析服务前缀，如location-service、alarm-service
+
+    路径中没有服务前缀的地址（如截图服务、报表文件的下载地址）按host区分，
+    不同host不会共用同一个限流器和熔断器
+
+    Args:
+        url (str): 接口地址
+
+    Returns:
+        str: 服务前缀，未识别时返回host（含端口）
+    """
+    parts = urlsplit(url)
+    for segment in parts.path.split('/'):
+        if segment.endswith('-service'):
+            return segment
+    return parts.netloc or 'default'
+
+
+def endpoint_of(url):
+    """返回URL路径的最后一段，如getStaOverviewExport"""
+    return urlsplit(url).path.rstrip('/').split('/')[-1]
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        if not metrics.ENABLED:
+            return super().connect()
+        with metrics.timer('connect'):
+            return super().connect()
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        if not metrics.ENABLED:
+            return super().connect()
+        # HTTPS的connect包含TLS握手
+        with metrics.timer('connect'):
+            return super().connect()
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """新建连接时记录connect耗时的适配器"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+def _new_session(pool_size):
+    session = requests.Session()
+    adapter = _TimedAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    return session
+
+
+def get_session(url, pool_size=HTTP_POOL_SIZE):
+    """
+    获取url所属host的共享Session
+
+    Args:
+        url (str): 请求地址
+        pool_size (int): 该host连接池大小，仅在首次创建Session时生效
+
+    Returns:
+        requests.Session: 该host的共享Session
+    """
+    key = _host_key(url)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = _new_session(pool_size)
+    return session
+
+
+def request(method, url, **kwargs):
+    """
+    通过共享连接池发送请求，未指定timeout时使用配置的连接/读取超时
+
+    Args:
+        method (str): 请求方法
+        url (str): 请求地址
+        **kwargs: 透传给requests.Session.request的参数
+
+    Returns:
+        requests.Response: 响应对象
+    """
+    kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    service, endpoint = service_of(url), endpoint_of(url)
+    limiter = get_limiter(service)
+    try:
+        with metrics.tags(endpoint=endpoint, service=service, method=method.upper()):
+            response = get_session(url).request(method, url, **kwargs)
+            # elapsed为发出请求到解析完响应头的耗时，即服务端生成报表的等待时间
+            metrics.observe('ttfb', response.elapsed.total_seconds())
+    except requests.exceptions.Timeout:
+        limiter.on_response(timeout=True)
+        raise
+    # 将延迟、状态码和Retry-After反馈给该服务的自适应限流器，延迟按接口与各自的基线比较
+    limiter.on_response(response.elapsed.total_seconds(), response.status_code,
+                        retry_after=parse_retry_after(response.headers.get('Retry-After')), endpoint=endpoint)
+    return response
+
+
+def get(url, **kwargs):
+    """发送GET请求，参数同request"""
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    """发送POST请求，参数同request"""
+    return request('POST', url, **kwargs)
+
+
+def close_all():
+    """关闭所有host的连接池"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -1,10 +1,13 @@
 import requests
+import http_client
+import metrics
 from config import BASE_URL, LOGIN_CONFIG, DEFAULT_HEADERS
 
 def login(username=LOGIN_CONFIG['username'], 
           password=LOGIN_CONFIG['password'], 
           timezone_second=LOGIN_CONFIG['timezone_second'], 
-          accept_language='cn'):
+          accept_language='cn',
+          base_url=BASE_URL):
     """
     调用登录接口获取token
     
@@ -13,11 +16,12 @@ def login(username=LOGIN_CONFIG['username'],
         password (str): 密码，默认为配置文件中的密码
         timezone_second (int): 时区秒数，默认为配置文件中的时区设置
         accept_language (str): 接受的语言，默认为'cn'
+        base_url (str): API的基础URL地址，默认为配置文件中的BASE_URL
     
     Returns:
         str: token字符串，登录失败返回None
     """
-    url = f'{BASE_URL}/user-service/user/login'
+    url = f'{base_url}/user-service/user/login'
     
     # 设置请求头信息
     headers = {
@@ -35,7 +39,8 @@ def login(username=LOGIN_CONFIG['username'],
     
     try:
         # 发送POST请求
-        response = requests.post(url, headers=headers, data=data)
+        with metrics.timer('login', endpoint='login', service='user-service', method='POST', language=accept_language):
+            response = http_client.post(url, headers=headers, data=data)
         response.raise_for_status()  # 如果响应状态码不是200，将引发异常
         
         # 解析响应结果
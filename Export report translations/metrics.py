@@ -0,0 +1,246 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from config import METRICS_ENABLED, METRICS_DIR
+
+# 请求各阶段：登录、建立连接、首字节（含新建连接时的connect）、响应体传输、写盘
+PHASES = ('login', 'connect', 'ttfb', 'transfer', 'write')
+TAG_NAMES = ('endpoint', 'service', 'language', 'method')
+
+# 直方图桶上限（秒），与Prometheus默认桶风格一致，覆盖到报表生成的分钟级耗时
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# 关闭时所有埋点只做一次布尔判断
+ENABLED = False
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_atexit_registered = False
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+
+    __slots__ = ('counts', 'sum', 'count', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+
+def percentile(sorted_values, q):
+    """
+    计算已排序序列的分位数（线性插值）
+
+    Args:
+        sorted_values (list): 升序排列的数值
+        q (float): 分位数，0~100
+
+    Returns:
+        float: 分位数值，序列为空时返回0
+    """
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q / 100
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+class _TagScope:
+    __slots__ = ('tags', 'previous')
+
+    def __init__(self, tags):
+        self.tags = tags
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'tags', {})
+        _local.tags = {**self.previous, **self.tags}
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.tags = self.previous
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SCOPE = _NullScope()
+
+
+def enable(dump_at_exit=True):
+    """
+    开启耗时统计
+
+    Args:
+        dump_at_exit (bool): 进程退出时自动输出统计结果到METRICS_DIR
+    """
+    global ENABLED, _atexit_registered
+    ENABLED = True
+    if dump_at_exit and not _atexit_registered:
+        atexit.register(dump)
+        _atexit_registered = True
+
+
+def disable():
+    """关闭耗时统计"""
+    global ENABLED
+    ENABLED = False
+
+
+def tags(**kwargs):
+    """
+    在当前线程内为之后记录的耗时附加标签，如language、endpoint
+
+    Returns:
+        上下文管理器，关闭统计时为空操作
+    """
+    return _TagScope(kwargs) if ENABLED else _NULL_SCOPE
+
+
+def observe(phase, seconds, **kwargs):
+    """
+    记录一次阶段耗时，标签为当前线程的标签叠加kwargs
+
+    Args:
+        phase (str): 阶段名，见PHASES
+        seconds (float): 耗时（秒）
+    """
+    if not ENABLED:
+        return
+    merged = {**getattr(_local, 'tags', {}), **kwargs}
+    key = (phase,) + tuple(str(merged.get(name, '')) for name in TAG_NAMES)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+class timer:
+    """
+    统计代码块耗时的上下文管理器
+
+    Args:
+        phase (str): 阶段名
+        **kwargs: 附加标签
+    """
+
+    __slots__ = ('phase', 'kwargs', 'start')
+
+    def __init__(self, phase, **kwargs):
+        self.phase = phase
+        self.kwargs = kwargs
+
+    def __enter__(self):
+        self.start = time.perf_counter() if ENABLED else None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            observe(self.phase, time.perf_counter() - self.start, **self.kwargs)
+
+
+def reset():
+    """清空已记录的统计"""
+    with _lock:
+        _histograms.clear()
+
+
+def snapshot():
+    """
+    返回当前统计的JSON可序列化副本
+
+    Returns:
+        list: 每个(阶段, 标签)组合一条记录
+    """
+    with _lock:
+        items = list(_histograms.items())
+    result = []
+    for key, h in sorted(items):
+        result.append({
+            'phase': key[0],
+            'tags': dict(zip(TAG_NAMES, key[1:])),
+            'count': h.count,
+            'sum': h.sum,
+            'min': h.min if h.count else 0.0,
+            'max': h.max,
+            'buckets': {str(le): count for le, count in zip(BUCKETS + ('+Inf',), h.counts)},
+        })
+    return result
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus():
+    """
+    输出Prometheus文本格式
+
+    Returns:
+        str: 文本格式的指标
+    """
+    lines = [
+        '# HELP export_phase_seconds Time spent in each phase of an export request.',
+        '# TYPE export_phase_seconds histogram',
+    ]
+    for record in snapshot():
+        labels = ','.join(f'{name}="{_escape(value)}"' for name, value in
+                          [('phase', record['phase'])] + list(record['tags'].items()))
+        cumulative = 0
+        for le, count in record['buckets'].items():
+            cumulative += count
+            lines.append(f'export_phase_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'export_phase_seconds_sum{{{labels}}} {record["sum"]}')
+        lines.append(f'export_phase_seconds_count{{{labels}}} {record["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def dump(directory=METRICS_DIR):
+    """
+    将统计结果输出为metrics.json和metrics.prom
+
+    Args:
+        directory (str): 输出目录
+
+    Returns:
+        tuple: (JSON文件路径, Prometheus文本文件路径)，没有数据时返回None
+    """
+    records = snapshot()
+    if not records:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    json_path = os.path.join(directory, "metrics.json")
+    prom_path = os.path.join(directory, "metrics.prom")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    with open(prom_path, "w", encoding="utf-8") as f:
+        f.write(to_prometheus())
+    print(f"耗时统计已输出到: {directory}")
+    return json_path, prom_path
+
+
+if METRICS_ENABLED:
+    enable()
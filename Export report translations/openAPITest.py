@@ -1,16 +1,27 @@
+import queue
 import random
-import requests
-from faker import Faker
-from sqlalchemy import desc
-
-fake = Faker("zh_CN")
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from fake_pool import fake_pool
 
 BASE_URL = "https://saas.whatsgps.com/saas-pre"
 
+# 并发执行接口和请求矩阵的线程数
+MAX_WORKERS = 8
+
+METHODS = ("GET", "POST")
+TOKEN_MODES = ("HeaderToken", "BodyToken")
+
+_print_lock = threading.Lock()
+
 class Context:
 
     def __init__(self, username="duoruimi", password="duo123", lang="cn"):
+        self._lock = threading.RLock()
         self._token = None
+        self.fixture_pool = None
         self.username = username
         self.password = password
         self.lang = lang
@@ -24,26 +35,43 @@ class Context:
     @property
     def token(self):
         if self._token is None:
-            self.login()
+            # 并发请求只登录一次
+            with self._lock:
+                if self._token is None:
+                    self.login()
         return self._token
         
     def get_item(self, key):
-        if hasattr(self, key):
-            return getattr(self, key)
-        else:
-            raise Exception(f"Item {key} not found")
+        with self._lock:
+            if hasattr(self, key):
+                return getattr(self, key)
+            else:
+                raise Exception(f"Item {key} not found")
         
     def set_item(self, key, value):
-        setattr(self, key, value)
+        with self._lock:
+            setattr(self, key, value)
         
     def remove_item(self, key):
-        delattr(self, key)
+        with self._lock:
+            delattr(self, key)
+    
+    def fork(self):
+        """复制出一个独立的Context分支，共享token和已有数据，之后的写入互不影响"""
+        child = Context(self.username, self.password, self.lang)
+        with self._lock:
+            for key, value in vars(self).items():
+                if key != "_lock":
+                    setattr(child, key, value)
+        return child
         
     def login(self):
+        # requests在第一次发请求时才导入
+        import http_client
         try:
             headers = self.headers
             headers['clientType'] = 'pc'
-            response = requests.get(f"{BASE_URL}/user/login.do?name={self.username}&password={self.password}&lang={self.lang}", headers=headers)
+            response = http_client.get(f"{BASE_URL}/user/login.do?name={self.username}&password={self.password}&lang={self.lang}", headers=headers)
             if response.ok:
                 self._token = response.json()["data"]["token"]
             else:
@@ -54,45 +82,221 @@ class Context:
 def send_request(context, url, method="GET", data=None, headers=None):
     if headers is None:
         headers = context.headers
+    import http_client
     full_url = f"{BASE_URL}{url}"
     try:
-        if method.upper() == "GET":
-            response = requests.get(full_url, headers=headers, params=data)
-        elif method.upper() == "POST":
-            response = requests.post(full_url, headers=headers, data=data)
-        else:
-            raise Exception(f"Invalid method: {method}")
+        with metrics.tags(language=context.lang):
+            if method.upper() == "GET":
+                response = http_client.get(full_url, headers=headers, params=data)
+            elif method.upper() == "POST":
+                response = http_client.post(full_url, headers=headers, data=data)
+            else:
+                raise Exception(f"Invalid method: {method}")
         return response
     except Exception as e:
         raise e
     
     
-def run_single_test(context, api_class):
+def _send_case(api, method, token_mode):
+    headers = api.context.headers
+    data = api.body
+    if token_mode == "HeaderToken":
+        headers["token"] = api.context.token
+    else:
+        data["token"] = api.context.token
+
+    response = send_request(api.context, api.url, method, data, headers)
+    output_str = f"    {method} {token_mode}: {response.status_code}"
+    if (not response.ok) or (int(response.json().get("code")) != 200):
+        output_str = f"{output_str} -- {response.headers.get('X-Trace-Id', 'N/A')} -- " + (response.text.replace('\n', '').replace('\r', ''))
+    api.teardown(response)
+    return output_str
+
+
+def _run_api(context, api_class, executor=None):
+    # 执行一个接口的 GET/POST × HeaderToken/BodyToken 请求矩阵，指定线程池时4个请求并发执行
     api = api_class(context)
     api.setup()
-    print(f"Running API: {api_class.desc} - {api.url}")
-    for method in ["GET", "POST"]:
-        for token_mode in ["HeaderToken", "BodyToken"]:
-            headers = api.context.headers
-            data = api.body
-            if token_mode == "HeaderToken":
-                headers["token"] = api.context.token
-            else:
-                data["token"] = api.context.token
+    cases = [(method, token_mode) for method in METHODS for token_mode in TOKEN_MODES]
+    if executor is None:
+        lines = [_send_case(api, method, token_mode) for method, token_mode in cases]
+    else:
+        futures = [executor.submit(_send_case, api, method, token_mode) for method, token_mode in cases]
+        lines = [future.result() for future in futures]
+    # 整个接口的输出一次打印，并发时不会交错
+    with _print_lock:
+        print("\n".join([f"Running API: {api_class.desc} - {api.url}"] + lines))
+
+
+def run_single_test(context, api_class, executor=None):
+    if not api_class.fixtures:
+        _run_api(context, api_class, executor)
+        return
+    # 单独运行时为该接口临时准备夹具，运行后清理
+    pool = FixturePool(context)
+    pool.provision(api_class.fixtures)
+    try:
+        pool.assign(context, api_class.fixtures)
+        _run_api(context, api_class, executor)
+    finally:
+        pool.cleanup()
+
+
+def create_user(context):
+    headers = context.headers
+    headers["token"] = context.token
+    response = send_request(context, AddUser.url, "POST", user_body(context), headers)
+    if (not response.ok) or (int(response.json().get("code")) != 200):
+        raise Exception(f"Add user failed: {response.text}")
+    return response.json()["data"]["userId"]
+
+
+def delete_user(context, user_id):
+    headers = context.headers
+    headers["token"] = context.token
+    response = send_request(context, DeleteUser.url, "POST", {"id": user_id}, headers)
+    if (not response.ok) or (int(response.json().get("code")) != 200):
+        raise Exception(f"Delete user failed: {response.text}")
+
+
+# 夹具类型 -> (创建函数, 删除函数)
+FIXTURE_KINDS = {
+    "user": (create_user, delete_user),
+}
 
-            response = send_request(api.context, api.url, method, data, headers)
-            output_str = f"    {method} {token_mode}: {response.status_code}"
-            if (not response.ok) or (int(response.json().get("code")) != 200):
-                output_str = f"{output_str} -- {response.headers.get('X-Trace-Id', 'N/A')} -- " + (response.text.replace('\n', '').replace('\r', ''))
-            print(output_str)
-            api.teardown(response)      
 
-def run_all_test(context):
+class FixturePool:
+    """
+    测试夹具池：用例运行前按需要的数量并发批量创建测试实体，运行时分发给各用例，
+    运行后批量删除，用例自身不再为准备数据发送请求
+
+    Args:
+        context (Context): 创建和删除实体使用的context
+        max_workers (int): 创建和删除的并发数
+    """
+
+    def __init__(self, context, max_workers=MAX_WORKERS):
+        self.context = context
+        self.max_workers = max_workers
+        self._available = {kind: queue.Queue() for kind in FIXTURE_KINDS}
+        self._created = {kind: set() for kind in FIXTURE_KINDS}
+        self._lock = threading.Lock()
+
+    def _create(self, kind):
+        try:
+            entity_id = FIXTURE_KINDS[kind][0](self.context)
+        except Exception as e:
+            with _print_lock:
+                print(f"Create {kind} fixture failed: {e}")
+            return
+        with self._lock:
+            self._created[kind].add(entity_id)
+        self._available[kind].put(entity_id)
+
+    def provision(self, counts):
+        """
+        并发创建夹具
+
+        Args:
+            counts (dict): 夹具类型 -> 数量
+        """
+        kinds = [kind for kind, count in counts.items() for _ in range(count)]
+        if not kinds:
+            return
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self._create, kinds))
+        created = {kind: self._available[kind].qsize() for kind in counts}
+        print(f"Provisioned fixtures {created} in {time.perf_counter() - start:.1f}s")
+
+    def assign(self, context, fixtures):
+        """
+        从池中取出夹具写入context，如user夹具依次写入user_id_1、user_id_2...
+
+        Args:
+            context (Context): 用例的context
+            fixtures (dict): 夹具类型 -> 数量
+        """
+        for kind, count in fixtures.items():
+            try:
+                entity_ids = [self._available[kind].get_nowait() for _ in range(count)]
+            except queue.Empty:
+                raise Exception(f"Not enough {kind} fixtures")
+            for index, entity_id in enumerate(entity_ids, 1):
+                context.set_item(f"{kind}_id_{index}", entity_id)
+        context.fixture_pool = self
+
+    def discard(self, kind, entity_id):
+        """用例已删除的实体不再参与清理"""
+        with self._lock:
+            self._created[kind].discard(entity_id)
+
+    def cleanup(self):
+        """并发删除所有仍存在的夹具"""
+        with self._lock:
+            jobs = [(kind, entity_id) for kind, entity_ids in self._created.items() for entity_id in entity_ids]
+            for entity_ids in self._created.values():
+                entity_ids.clear()
+        if not jobs:
+            return
+
+        def delete(job):
+            kind, entity_id = job
+            try:
+                FIXTURE_KINDS[kind][1](self.context, entity_id)
+                return True
+            except Exception as e:
+                with _print_lock:
+                    print(f"Delete {kind} fixture {entity_id} failed: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(delete, jobs))
+        print(f"Cleaned up {results.count(True)} fixtures, {results.count(False)} failed")
+
+
+def _run_suite_api(context, api_class, executor, pool):
+    # 需要夹具的接口在独立的Context分支中运行，各自的user_id_N互不干扰
+    try:
+        if api_class.fixtures:
+            context = context.fork()
+            pool.assign(context, api_class.fixtures)
+        _run_api(context, api_class, executor)
+        return True
+    except Exception as e:
+        with _print_lock:
+            print(f"Failed API: {api_class.desc} -- {e}")
+        return False
+
+
+def run_all_test(context, max_workers=MAX_WORKERS):
     # 查找出当前模块下所有BaseApi的子类
-    for obj in globals().values():
-        if isinstance(obj, type) and issubclass(obj, BaseApi) and obj != BaseApi:
-            print("*" * 100)
-            run_single_test(context, obj)
+    api_classes = [obj for obj in globals().values()
+                   if isinstance(obj, type) and issubclass(obj, BaseApi) and obj != BaseApi]
+    # 测试数据在后台生成，与登录并行
+    fake_pool.prefill()
+    # 先登录，各分支共享token
+    context.token
+
+    start = time.perf_counter()
+    # 按各用例声明的夹具数量汇总，运行前一次性并发创建
+    counts = {}
+    for api_class in api_classes:
+        for kind, count in api_class.fixtures.items():
+            counts[kind] = counts.get(kind, 0) + count
+    pool = FixturePool(context, max_workers)
+    pool.provision(counts)
+    try:
+        # 接口和请求矩阵使用不同的线程池，接口等待请求时不会占满请求线程
+        with ThreadPoolExecutor(max_workers=max_workers) as request_executor, \
+                ThreadPoolExecutor(max_workers=max_workers) as api_executor:
+            futures = [api_executor.submit(_run_suite_api, context, api_class, request_executor, pool)
+                       for api_class in api_classes]
+            results = [future.result() for future in futures]
+    finally:
+        pool.cleanup()
+    print("*" * 100)
+    print(f"Finished {len(results)} APIs in {time.perf_counter() - start:.1f}s, {results.count(False)} failed")
 
         
 # 根据父id分页	user/getByParentIdPage.do
@@ -114,8 +318,22 @@ def run_all_test(context):
 
 
 class BaseApi:
+    # 需要的夹具类型 -> 数量，运行前从夹具池取出写入context（如user_id_1...）
+    fixtures = {}
+    # 压测模式下的默认权重，需要夹具的接口不参与压测，写接口设为0
+    weight = 1
+
     def __init__(self, context):
         self.context = context
+        self.index = 0
+        self._index_lock = threading.Lock()
+        self._local = threading.local()
+
+    def next_index(self):
+        # 请求矩阵并发执行时，index计数需要加锁
+        with self._index_lock:
+            self.index += 1
+            return self.index
         
     def setup(self):
         pass
@@ -150,38 +368,42 @@ class ExportByParentId(BaseApi):
 
 
 
+def user_body(context):
+    return {
+        "address": fake_pool.get("address"),
+        "email": fake_pool.get("email"),
+        "linkMan": fake_pool.get("name"),
+        "linkPhone": fake_pool.get("phone_number"),
+        "name": fake_pool.get("name"),
+        "password": "a123456",
+        "remark": "a123456",
+        "userName": f"{fake_pool.get('name')}{random.randint(100000, 999999)}",
+        "userType": 1,
+        "parentId": context.get_item("parendId"),
+    }
+
+
 class AddUser(BaseApi):
     desc = "添加用户"
     url = "/user/add.do"
-    
-    def __init__(self, context):
-        super().__init__(context)
-        self.index = 0
+    # 请求矩阵的4次调用各创建一个用户，写入user_id_1..4
+    # 压测时不批量创建用户
+    weight = 0
 
     @property
     def body(self):
-        return {
-            "address": fake.address(),
-            "email": fake.email(),
-            "linkMan": fake.name(),
-            "linkPhone": fake.phone_number(),
-            "name": fake.name(),
-            "password": "a123456",
-            "remark": "a123456",
-            "userName": f"{fake.name()}{random.randint(100000, 999999)}",
-            "userType": 1,
-            "parentId": self.context.get_item("parendId"),
-        }
+        return user_body(self.context)
         
     def teardown(self, response):
-        if response.ok:
-            self.index += 1
-            self.context.set_item(f"user_id_{self.index}", response.json()["data"]["userId"])
+        if response.ok and int(response.json().get("code")) == 200:
+            self.context.set_item(f"user_id_{self.next_index()}", response.json()["data"]["userId"])
 
 
 class UpdateUser(BaseApi):
     desc = "更新用户"
     url = "/user/update.do"
+    # 写接口，只通过--weight显式压测
+    weight = 0
     
     @property
     def body(self):
@@ -194,6 +416,8 @@ class UpdateUser(BaseApi):
 class UpdatePsw(BaseApi):
     desc = "用户更新密码"
     url = "/user/updatePsw.do"
+    # 写接口，只通过--weight显式压测
+    weight = 0
     
     @property
     def body(self):
@@ -206,10 +430,7 @@ class UpdatePsw(BaseApi):
 class ResetPsw(BaseApi):
     desc = "重置用户密码"
     url = "/user/resetPsw.do"
-    
-    def setup(self):
-        print("  Running setup")
-        run_single_test(self.context, AddUser)
+    fixtures = {"user": 1}
     
     @property
     def body(self):
@@ -222,25 +443,24 @@ class ResetPsw(BaseApi):
 class DeleteUser(BaseApi):
     desc= "删除用户"
     url = "/user/del.do"
-    
-    def __init__(self, context):
-        super().__init__(context)
-        self.index = 0
-        
-    def setup(self):
-        print("  Running setup")
-        run_single_test(self.context, AddUser)
+    # 请求矩阵的4次调用各删除一个用户
+    fixtures = {"user": 4}
 
     @property
     def body(self):
-        self.index += 1
+        # 同一个请求的body和teardown在同一线程中执行，用线程局部变量记录本次删除的序号
+        self._local.index = self.next_index()
         return {
-            "id": self.context.get_item(f"user_id_{self.index}"),
+            "id": self.context.get_item(f"user_id_{self._local.index}"),
         }
     
     def teardown(self, response):
-        if response.ok:
-            self.context.remove_item(f"user_id_{self.index}")
+        # HTTP 200但业务码不是200时用户并未删除，仍需留在夹具池中由cleanup删除
+        if response.ok and int(response.json().get("code")) == 200:
+            key = f"user_id_{self._local.index}"
+            if self.context.fixture_pool is not None:
+                self.context.fixture_pool.discard("user", self.context.get_item(key))
+            self.context.remove_item(key)
             
 class GetParentUserInfo(BaseApi):
     desc = "获取父级用户信息"
@@ -254,30 +474,19 @@ class GetParentUserInfo(BaseApi):
 class TranUser(BaseApi):
     desc = "转移用户"
     url = "/user/tranUser.do"
-    
-    def __init__(self, context):
-        super().__init__(context)
-        self.index = 0
-    
-    def setup(self):
-        print("  Running setup")
-        run_single_test(self.context, AddUser)
+    fixtures = {"user": 4}
     
     @property
     def body(self):
-        self.index += 1
         return {
             "targetUserId": self.context.get_item("tran_target_user_id"),
-            "parentId": self.context.get_item(f"user_id_{self.index}"),
+            "parentId": self.context.get_item(f"user_id_{self.next_index()}"),
         }
     
 class TranUserBatch(BaseApi):
     desc = "批量转移用户"
     url = "/user/tranUserBatch.do"
-    
-    def setup(self):
-        print("  Running setup")
-        run_single_test(self.context, AddUser)
+    fixtures = {"user": 3}
     
     @property
     def body(self):
@@ -300,6 +509,8 @@ class GetByUserIdExport(BaseApi):
 class TransferBatch(BaseApi):
     desc = "批量转移车辆"
     url = "/carManager/transferBatch.do"
+    # 写接口，只通过--weight显式压测
+    weight = 0
     
     @property
     def body(self):
@@ -311,6 +522,8 @@ class TransferBatch(BaseApi):
 class ResetCarPsw(BaseApi):
     desc = "重置车辆密码"
     url = "/car/resetPsw.do"
+    # 写接口，只通过--weight显式压测
+    weight = 0
     
     @property
     def body(self):
@@ -362,15 +575,19 @@ class GetCarGroupAndStatus(BaseApi):
         }
 
         
-if __name__ == "__main__":
+def build_context():
+    # 测试账号下已有的数据
     context = Context()
     context.parendId = 189046
     context.tran_target_user_id = 1935646366822825984
     context.car_id_1 = 2466003
     context.car_fence_id_1 = 251068
     context.car_group_id_1 = 0
+    return context
 
-    run_all_test(context)
+
+if __name__ == "__main__":
+    run_all_test(build_context())
     
     
     
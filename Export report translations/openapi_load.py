@@ -0,0 +1,278 @@
+import argparse
+import heapq
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import openAPITest
+from openAPITest import BaseApi, build_context, send_request
+from metrics import percentile
+
+
+def api_catalog():
+    """openAPITest中定义的所有接口类，按类名索引"""
+    return {obj.__name__: obj for obj in vars(openAPITest).values()
+            if isinstance(obj, type) and issubclass(obj, BaseApi) and obj != BaseApi}
+
+
+def default_weights():
+    """各接口的默认压测权重：取类的weight属性（写接口为0），需要夹具的接口为0"""
+    return {name: (0 if cls.fixtures else cls.weight)
+            for name, cls in api_catalog().items()}
+
+
+class LoadStats:
+    """
+    压测结果统计：每个接口的延迟、按code统计的错误和慢请求的X-Trace-Id样本
+
+    Args:
+        slow_threshold (float): 慢请求阈值（秒）
+        max_samples (int): 保留的慢请求样本数（耗时最长的若干个）
+    """
+
+    def __init__(self, slow_threshold=1.0, max_samples=20):
+        self.slow_threshold = slow_threshold
+        self.max_samples = max_samples
+        self.latencies = {}      # 接口名 -> [耗时]
+        self.errors = {}         # 接口名 -> {code: 次数}
+        self.slow = []           # 最小堆 [(耗时, 序号, 样本)]
+        self.dropped = 0         # 目标RPS下因并发已满未能发出的请求
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, name, latency, code, trace_id):
+        """记录一次请求，latency为None表示请求未发出，只计入错误不计入延迟"""
+        with self._lock:
+            self.latencies.setdefault(name, [])
+            if latency is not None:
+                self.latencies[name].append(latency)
+            if code != "200":
+                errors = self.errors.setdefault(name, {})
+                errors[code] = errors.get(code, 0) + 1
+            if latency is not None and latency >= self.slow_threshold:
+                self._seq += 1
+                sample = {"api": name, "latency_s": round(latency, 4), "code": code, "trace_id": trace_id}
+                if len(self.slow) < self.max_samples:
+                    heapq.heappush(self.slow, (latency, self._seq, sample))
+                else:
+                    heapq.heappushpop(self.slow, (latency, self._seq, sample))
+
+    def record_dropped(self):
+        """记录一个因并发已满未能发出的请求"""
+        with self._lock:
+            self.dropped += 1
+
+    def summary(self, wall):
+        """
+        汇总压测结果
+
+        Args:
+            wall (float): 压测总耗时（秒）
+
+        Returns:
+            dict: 总体与每个接口的请求数、吞吐、延迟分位数、错误率和慢请求样本
+        """
+        def describe(latencies, errors):
+            latencies = sorted(latencies)
+            error_count = sum(errors.values())
+            requests = len(latencies) + errors.get("body_error", 0)
+            return {
+                "requests": requests,
+                "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+                "error_rate": round(error_count / requests, 4) if requests else 0.0,
+                "errors_by_code": dict(errors),
+            }
+
+        with self._lock:
+            apis = {name: describe(latencies, self.errors.get(name, {}))
+                    for name, latencies in sorted(self.latencies.items())}
+            all_errors = {}
+            for errors in self.errors.values():
+                for code, count in errors.items():
+                    all_errors[code] = all_errors.get(code, 0) + count
+            total = describe([l for latencies in self.latencies.values() for l in latencies], all_errors)
+            slow = [sample for _, _, sample in sorted(self.slow, reverse=True)]
+        return {"wall_s": round(wall, 2), "dropped": self.dropped, "total": total, "apis": apis, "slow_samples": slow}
+
+
+class LoadRunner:
+    """
+    以openAPITest的接口类为工作负载的压测器
+
+    指定rps时按目标RPS发出请求（开环），concurrency为同时进行的请求数上限；
+    未指定rps时以concurrency个并发循环发出请求（闭环）；两种模式都在ramp_up秒内线性升到目标值
+
+    Args:
+        context (Context): 请求使用的context，所有请求共享登录token
+        weights (dict): 接口类名 -> 权重
+        rps (float): 目标RPS，None表示闭环模式
+        concurrency (int): 并发数
+        duration (float): 压测时长（秒），含ramp_up
+        ramp_up (float): 升到目标负载的时间（秒）
+        method (str): 请求方法
+        stats (LoadStats): 结果统计
+    """
+
+    def __init__(self, context, weights, rps=None, concurrency=10, duration=60, ramp_up=10,
+                 method="POST", stats=None):
+        catalog = api_catalog()
+        weights = {name: weight for name, weight in weights.items() if weight > 0}
+        unknown = set(weights) - set(catalog)
+        if unknown:
+            raise ValueError(f"Unknown API: {', '.join(sorted(unknown))}")
+        if not weights:
+            raise ValueError("No API with positive weight")
+        self.context = context
+        # 每个接口类只实例化一次，请求时只生成body
+        self.apis = [catalog[name](context) for name in weights]
+        self.weights = list(weights.values())
+        self.rps = rps
+        self.concurrency = concurrency
+        self.duration = duration
+        self.ramp_up = min(ramp_up, duration)
+        self.method = method
+        self.stats = stats or LoadStats()
+
+    def _fire(self):
+        api = random.choices(self.apis, weights=self.weights)[0]
+        name = type(api).__name__
+        headers = self.context.headers
+        headers["token"] = self.context.token
+        trace_id = "N/A"
+        try:
+            body = api.body
+        except Exception:
+            # context中缺少接口需要的数据，请求未发出
+            self.stats.record(name, None, "body_error", trace_id)
+            return
+        start = time.perf_counter()
+        try:
+            response = send_request(self.context, api.url, self.method, body, headers)
+            latency = time.perf_counter() - start
+            trace_id = response.headers.get("X-Trace-Id", "N/A")
+            if not response.ok:
+                code = f"http_{response.status_code}"
+            else:
+                try:
+                    code = str(response.json().get("code"))
+                except ValueError:
+                    code = "invalid_json"
+        except Exception as e:
+            latency = time.perf_counter() - start
+            code = type(e).__name__
+        self.stats.record(name, latency, code, trace_id)
+
+    def _schedule(self, n):
+        # 第n个请求的发出时间：ramp_up内RPS线性增长，累计请求数为 rps*t²/(2*ramp_up)
+        if n < self.rps * self.ramp_up / 2:
+            return math.sqrt(2 * self.ramp_up * n / self.rps)
+        return self.ramp_up / 2 + n / self.rps
+
+    def _closed_loop(self, start, end):
+        def worker(index):
+            # 第index个并发在ramp_up内按顺序依次加入
+            time.sleep(self.ramp_up * index / self.concurrency)
+            while time.perf_counter() < end:
+                self._fire()
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _open_loop(self, start, end):
+        in_flight = threading.Semaphore(self.concurrency)
+
+        def fire():
+            try:
+                self._fire()
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            sent = 0
+            next_at = start
+            while next_at < end:
+                now = time.perf_counter()
+                if next_at > now:
+                    time.sleep(next_at - now)
+                if in_flight.acquire(blocking=False):
+                    executor.submit(fire)
+                else:
+                    self.stats.record_dropped()
+                sent += 1
+                next_at = start + self._schedule(sent)
+
+    def run(self):
+        """
+        执行压测
+
+        Returns:
+            dict: LoadStats.summary的结果
+        """
+        # 先登录，避免所有并发同时等待登录
+        self.context.token
+        start = time.perf_counter()
+        end = start + self.duration
+        if self.rps:
+            self._open_loop(start, end)
+        else:
+            self._closed_loop(start, end)
+        return self.stats.summary(time.perf_counter() - start)
+
+
+def print_summary(summary):
+    header = f"{'API':<24}{'请求数':>8}{'RPS':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'错误率':>9}  错误code"
+    print(header)
+    rows = list(summary["apis"].items()) + [("TOTAL", summary["total"])]
+    for name, r in rows:
+        errors = ", ".join(f"{code}:{count}" for code, count in r["errors_by_code"].items())
+        print(f"{name:<24}{r['requests']:>8}{r['rps']:>9}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['error_rate']:>9.2%}  {errors}")
+    if summary["dropped"]:
+        print(f"\n并发已满未发出的请求: {summary['dropped']}")
+    if summary["slow_samples"]:
+        print("\n慢请求样本:")
+        for sample in summary["slow_samples"]:
+            print(f"  {sample['latency_s'] * 1000:>8.1f}ms  {sample['api']:<24}{sample['code']:<12}{sample['trace_id']}")
+
+
+def _parse_weight(value):
+    name, _, weight = value.partition("=")
+    return name, float(weight or 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以openAPITest的接口为工作负载压测saas-pre")
+    parser.add_argument("--rps", type=float, help="目标RPS，不指定时按--concurrency闭环压测")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发数（开环模式下为同时进行的请求数上限）")
+    parser.add_argument("--duration", type=float, default=60, help="压测时长（秒）")
+    parser.add_argument("--ramp-up", type=float, default=10, help="升到目标负载的时间（秒）")
+    parser.add_argument("--weight", type=_parse_weight, action="append", default=[],
+                        help="接口权重，如GetByParentId=3，可重复指定；权重为0表示不参与")
+    parser.add_argument("--only", action="store_true", help="只压测--weight指定的接口")
+    parser.add_argument("--method", default="POST", choices=("GET", "POST"), help="请求方法")
+    parser.add_argument("--slow-ms", type=float, default=1000, help="慢请求阈值（毫秒）")
+    parser.add_argument("--samples", type=int, default=20, help="保留的慢请求样本数")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    weights = {} if args.only else default_weights()
+    weights.update(dict(args.weight))
+    runner = LoadRunner(build_context(), weights, rps=args.rps, concurrency=args.concurrency,
+                        duration=args.duration, ramp_up=args.ramp_up, method=args.method,
+                        stats=LoadStats(args.slow_ms / 1000, args.samples))
+    mode = f"目标{args.rps}RPS" if args.rps else f"{args.concurrency}并发"
+    print(f"开始压测: {mode}，时长{args.duration}s，ramp-up {args.ramp_up}s")
+    summary = runner.run()
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,245 @@
+import random
+import threading
+import time
+import requests
+from urllib3.exceptions import NewConnectionError
+from adaptive_limiter import parse_retry_after
+from http_client import service_of
+from config import (RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_MAX_ELAPSED,
+                    RETRY_STATUS, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+# 服务端明确拒绝、请求未被处理的状态码，非幂等请求也可以安全重试
+_REJECTED_STATUS = (429, 503)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """服务熔断中，请求未发出"""
+
+
+class CircuitBreaker:
+    """
+    服务级熔断器：连续失败达到阈值后熔断，熔断期间直接失败；
+    超过恢复时间后放行一个探测请求，成功则恢复，失败则继续熔断
+
+    Args:
+        failure_threshold (int): 触发熔断的连续失败次数
+        reset_timeout (float): 熔断后放行探测请求前的等待时间（秒）
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """当前是否会拒绝请求（不改变状态，供调度器跳过熔断中的服务）"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() < self.opened_at + self.reset_timeout
+            return self.state == self.HALF_OPEN
+
+    def is_closed(self):
+        """是否处于正常状态；熔断或等待探测结果时为False"""
+        with self._lock:
+            return self.state == self.CLOSED
+
+    def allow(self):
+        """
+        判断是否允许发出请求，熔断恢复时间已到时只放行一个探测请求
+
+        Returns:
+            bool: 是否允许
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self.opened_at + self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_breaker(service):
+    """
+    获取服务前缀对应的熔断器，每个服务一个
+
+    Args:
+        service (str): 服务前缀，如alarm-service
+
+    Returns:
+        CircuitBreaker: 该服务的熔断器
+    """
+    breaker = _breakers.get(service)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.get(service)
+            if breaker is None:
+                breaker = _breakers[service] = CircuitBreaker()
+    return breaker
+
+
+class RetryPolicy:
+    """
+    带随机抖动的指数退避重试策略
+
+    幂等请求（GET导出、只读的POST导出）在连接错误、超时和RETRY_STATUS时重试；
+    非幂等请求（如创建导出任务）只在请求确定未被处理时重试：连接未建立，或服务端返回429/503
+
+    Args:
+        max_attempts (int): 最多尝试次数（含首次）
+        base_delay (float): 首次重试的退避上限（秒）
+        max_delay (float): 单次退避上限（秒）
+        max_elapsed (float): 单次调用含重试的总耗时上限（秒）
+        retry_status (tuple): 幂等请求可重试的状态码
+    """
+
+    def __init__(self, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, max_elapsed=RETRY_MAX_ELAPSED, retry_status=RETRY_STATUS):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.retry_status = retry_status
+
+    def retryable_status(self, status, idempotent):
+        return status in (self.retry_status if idempotent else _REJECTED_STATUS)
+
+    def retryable_error(self, error, idempotent):
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, requests.exceptions.ConnectTimeout) or _connection_refused(error):
+            return retryable_failure(False, idempotent)
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              requests.exceptions.ChunkedEncodingError)):
+            return retryable_failure(True, idempotent)
+        return False
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        第attempt次重试前的等待时间：在指数上限内完全随机（full jitter），服务端指定时不短于Retry-After
+
+        Returns:
+            float: 等待秒数
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+
+default_policy = RetryPolicy()
+
+
+def _connection_refused(error):
+    # 连接未建立（如拒绝连接、DNS失败），请求一定没有到达服务端
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def is_failure(status):
+    """状态码是否计为服务失败（熔断器计数）"""
+    return status == 429 or status >= 500
+
+
+def retryable_failure(request_sent, idempotent):
+    """
+    请求异常后是否可以重试，与HTTP库无关，阻塞版本和asyncio版本按各自的异常类型判断request_sent
+
+    Args:
+        request_sent (bool): 请求是否可能已到达服务端；连接未建立时为False
+        idempotent (bool): 请求是否可安全重复发送
+
+    Returns:
+        bool: 连接未建立时总可以重试；读取超时或连接中途断开时无法确定服务端是否已处理，只重试幂等请求
+    """
+    return not request_sent or idempotent
+
+
+def retry_delay(policy, attempt, deadline, retryable, retry_after=None):
+    """
+    第attempt次请求失败后的退避决策
+
+    Args:
+        policy (RetryPolicy): 重试策略
+        attempt (int): 已尝试的次数（含首次）
+        deadline (float): 本次调用的截止时间（time.monotonic）
+        retryable (bool): 该失败是否可以重试
+        retry_after (float): 服务端要求的等待时间（秒）
+
+    Returns:
+        float: 重试前等待的秒数；不可重试、次数用尽或等待后会超过截止时间时返回None
+    """
+    if not retryable or attempt >= policy.max_attempts:
+        return None
+    delay = policy.backoff(attempt - 1, retry_after)
+    return delay if time.monotonic() + delay <= deadline else None
+
+
+def call_with_retry(send, url, idempotent=True, policy=None):
+    """
+    通过所属服务的熔断器发送请求，失败时按重试策略退避重试
+
+    Args:
+        send (callable): 无参函数，发送一次请求并返回requests.Response
+        url (str): 请求地址，用于确定服务前缀
+        idempotent (bool): 请求是否可安全重复发送
+        policy (RetryPolicy): 重试策略，默认default_policy
+
+    Returns:
+        requests.Response: 最后一次请求的响应（可能仍为错误状态码）
+
+    Raises:
+        CircuitOpenError: 服务熔断中
+        requests.exceptions.RequestException: 不可重试或重试次数用尽的请求异常
+    """
+    policy = policy or default_policy
+    service = service_of(url)
+    breaker = get_breaker(service)
+    deadline = time.monotonic() + policy.max_elapsed
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{service}熔断中，跳过请求: {url}")
+        attempt += 1
+        try:
+            response = send()
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            delay = retry_delay(policy, attempt, deadline, policy.retryable_error(e, idempotent))
+            if delay is None:
+                raise
+            reason = str(e)
+        else:
+            if not is_failure(response.status_code):
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            delay = retry_delay(policy, attempt, deadline, policy.retryable_status(response.status_code, idempotent),
+                                parse_retry_after(response.headers.get('Retry-After')))
+            if delay is None:
+                # 不可重试、次数用尽或超出单次调用的总耗时上限，返回最后一次的错误响应
+                return response
+            reason = f"状态码{response.status_code}"
+            response.close()
+
+        print(f"请求失败({reason})，{delay:.1f}秒后第{attempt}次重试: {url}")
+        time.sleep(delay)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from config import DOWNLOAD_CHUNK_SIZE
+
+# 任务状态
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def params_hash(params):
+    """计算请求参数的稳定哈希（与键顺序无关）"""
+    data = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+def job_key(language, endpoint, params):
+    """
+    生成任务键：(语言, 接口, 参数哈希)
+
+    Args:
+        language (str): 语言代码
+        endpoint (str): 接口地址
+        params (dict): 请求参数
+
+    Returns:
+        str: 任务键
+    """
+    return f"{language}|{endpoint}|{params_hash(params)}"
+
+
+def file_checksum(path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    流式计算文件的sha256和大小
+
+    Returns:
+        tuple: (十六进制sha256, 字节数)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class RunJournal:
+    """
+    只追加的运行日志：每个任务的每次状态变化追加一行JSON，
+    续跑时以每个任务的最后一条记录为准，跳过已完成的任务，
+    重新执行失败或中断（停留在running）的任务
+
+    Args:
+        path (str): 日志文件路径
+        resume (bool): True时保留已有记录用于续跑，False时清空重新开始
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = self._load() if resume else {}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # 行缓冲追加写，每条记录只是一次write，不做fsync，可以在每个任务后调用
+        self._file = open(path, "a" if resume else "w", encoding="utf-8", buffering=1)
+
+    def _load(self):
+        records = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 进程中断时最后一行可能只写了一半
+                        continue
+                    records[record['key']] = record
+        except IOError:
+            pass
+        return records
+
+    def record(self, key, status, path=None, size=None, checksum=None, error=None):
+        """追加一条任务状态记录"""
+        record = {'key': key, 'status': status, 'time': time.time()}
+        if path is not None:
+            record.update(path=path, size=size, checksum=checksum)
+        if error is not None:
+            record['error'] = str(error)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._records[key] = record
+            self._file.write(line)
+
+    def start(self, key):
+        """记录任务开始"""
+        self.record(key, RUNNING)
+
+    def finish(self, key, path, error=None, checksum=None):
+        """
+        根据任务结果记录完成或失败，完成时附带文件大小和校验和
+
+        Args:
+            key (str): 任务键
+            path (str): 保存的文件路径，失败时为None
+            error: 失败原因
+            checksum (tuple): 调用方已计算的(sha256, 字节数)；为None时在当前线程读取文件计算
+        """
+        if path and os.path.exists(path):
+            checksum, size = checksum or file_checksum(path)
+            self.record(key, DONE, path, size, checksum)
+        else:
+            self.record(key, FAILED, error=error or "no output")
+
+    def is_done(self, key):
+        """任务最后一次记录是否为已完成且输出文件仍然存在"""
+        record = self._records.get(key)
+        return bool(record and record['status'] == DONE and os.path.exists(record.get('path', '')))
+
+    def status(self, key):
+        """返回任务最后一次记录的状态，未记录返回None"""
+        record = self._records.get(key)
+        return record['status'] if record else None
+
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,356 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+from artifact_writer import atomic_write
+from config import (LANGUAGE_LIST, TRANSLATION_DIR, SCREENSHOT_TILE_CACHE_PATH, SCREENSHOT_REPORT_PATH,
+                    SCREENSHOT_BASELINES, SCREENSHOT_TILE_SIZE, SCREENSHOT_DOWNSAMPLE,
+                    SCREENSHOT_TEXT_CONTRAST, SCREENSHOT_UNTRANSLATED_RATIO, SCREENSHOT_COMPARE_WORKERS)
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg')
+
+# 降采样后每个像素只保留高4位，抗锯齿和压缩带来的细微差异不影响分块是否相同
+_QUANT_SHIFT = 4
+
+# 文字分块的判定：横向和纵向都至少有若干行/列出现笔画边缘（排除边框、分隔线），
+# 深浅两色中较少的一种占比不低于下限（排除大块实心的图标、Logo），
+# 且左右至少有一个相邻分块也是文字（排除孤立的图标）
+_TEXT_MIN_EDGE_LINES = 3
+_TEXT_MIN_INK = 0.1
+
+# 签名算法版本，文字分块的判定方式变化时递增，缓存中旧版本的签名重新计算
+SIGNATURE_VERSION = 2
+
+
+def screenshot_dir(language):
+    """返回语言的截图目录，与auto_download_web.download_image一致"""
+    return os.path.join(TRANSLATION_DIR, f"web-{language}")
+
+
+def list_screenshots(language):
+    """
+    列出语言的截图文件
+
+    Returns:
+        list: 截图文件路径列表
+    """
+    directory = screenshot_dir(language)
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.lower().endswith(IMAGE_SUFFIXES)]
+
+
+def page_id(path, language):
+    """
+    截图的页面标识：文件名去掉扩展名和其中作为独立片段的语言代码（如login_en.png -> login），
+    各语言同一页面的截图标识相同
+
+    Args:
+        path (str): 截图路径
+        language (str): 截图所属的语言代码
+
+    Returns:
+        str: 页面标识
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stripped = re.sub(rf"(^|[-_.]){re.escape(language)}(?=$|[-_.])", '', stem, flags=re.IGNORECASE)
+    return stripped.strip('-_.') or stem
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def tile_signature(path, tile_size=SCREENSHOT_TILE_SIZE, downsample=SCREENSHOT_DOWNSAMPLE,
+                   text_contrast=SCREENSHOT_TEXT_CONTRAST):
+    """
+    计算截图的分块签名：灰度图降采样后切成固定大小的分块，整批计算每块的哈希和是否为文字区域
+
+    Args:
+        path (str): 截图路径
+        tile_size (int): 分块边长（原图像素）
+        downsample (int): 降采样倍数
+        text_contrast (int): 文字区域的最小灰度极差，相邻像素灰度差达到其一半视为笔画边缘
+
+    Returns:
+        dict: {'rows', 'cols', 'hashes': 每块哈希, 'text': 每块是否为文字区域(0/1)}，按行优先排列
+    """
+    with Image.open(path) as image:
+        gray = image.convert('L').reduce(downsample)
+    pixels = np.asarray(gray, dtype=np.uint8)
+    side = tile_size // downsample
+    rows, cols = pixels.shape[0] // side, pixels.shape[1] // side
+    # (rows*side, cols*side) -> (rows*cols, side*side)，每行是一个分块
+    tiles = (pixels[:rows * side, :cols * side]
+             .reshape(rows, side, cols, side)
+             .swapaxes(1, 2)
+             .reshape(rows * cols, side * side))
+    quantized = np.ascontiguousarray(tiles >> _QUANT_SHIFT)
+    hashes = [int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), 'little')
+              for row in quantized]
+    return {
+        'rows': rows,
+        'cols': cols,
+        'hashes': hashes,
+        'text': _text_tiles(tiles.reshape(rows * cols, side, side), rows, cols, text_contrast).tolist(),
+    }
+
+
+def _text_tiles(tiles, rows, cols, text_contrast):
+    # tiles: (分块数, 边长, 边长)，返回每块是否为文字区域(0/1)
+    tiles = tiles.astype(np.int16)
+    high, low = tiles.max(axis=(1, 2)), tiles.min(axis=(1, 2))
+    edge = text_contrast // 2
+    # 出现横向灰度跳变的行数、出现纵向灰度跳变的列数
+    edge_rows = (np.abs(np.diff(tiles, axis=2)) >= edge).any(axis=2).sum(axis=1)
+    edge_cols = (np.abs(np.diff(tiles, axis=1)) >= edge).any(axis=1).sum(axis=1)
+    dark = (tiles < ((high + low) / 2)[:, None, None]).mean(axis=(1, 2))
+    candidate = ((high - low >= text_contrast) & (edge_rows >= _TEXT_MIN_EDGE_LINES)
+                 & (edge_cols >= _TEXT_MIN_EDGE_LINES) & (np.minimum(dark, 1 - dark) >= _TEXT_MIN_INK))
+    grid = candidate.reshape(rows, cols)
+    neighbor = np.zeros_like(grid)
+    neighbor[:, 1:] |= grid[:, :-1]
+    neighbor[:, :-1] |= grid[:, 1:]
+    return (grid & neighbor).astype(np.uint8).ravel()
+
+
+def _signatures(paths):
+    # 进程池任务：计算一个语言中所有新截图的签名
+    result = {}
+    for path in paths:
+        try:
+            result[path] = tile_signature(path)
+        except (IOError, ValueError) as e:
+            print(f"读取截图失败: {path} {str(e)}")
+    return result
+
+
+class TileCache:
+    """
+    截图分块签名的持久化缓存，按文件大小和修改时间判断截图是否变化，重跑时只计算新截图
+
+    Args:
+        path (str): 缓存文件路径
+    """
+
+    def __init__(self, path=SCREENSHOT_TILE_CACHE_PATH):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (IOError, ValueError):
+            self.entries = {}
+        self._dirty = False
+
+    def _key(self, path):
+        return os.path.relpath(path, TRANSLATION_DIR)
+
+    def get(self, path):
+        """返回未变化截图的签名，新截图或已变化时返回None"""
+        entry = self.entries.get(self._key(path))
+        if (entry is not None and entry.get('version') == SIGNATURE_VERSION
+                and entry['fingerprint'] == _fingerprint(path)):
+            return entry['signature']
+        return None
+
+    def set(self, path, signature):
+        self.entries[self._key(path)] = {'fingerprint': _fingerprint(path), 'version': SIGNATURE_VERSION,
+                                         'signature': signature}
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = json.dumps(self.entries, ensure_ascii=False).encode("utf-8")
+        try:
+            atomic_write(self.path, [data])
+            self._dirty = False
+        except IOError as e:
+            print(f"写入截图缓存失败: {str(e)}")
+
+
+def load_signatures(languages, cache, max_workers=SCREENSHOT_COMPARE_WORKERS):
+    """
+    获取各语言所有截图的分块签名，缓存未命中的截图按语言分发到进程池计算
+
+    Args:
+        languages (list): 语言代码列表
+        cache (TileCache): 分块签名缓存
+        max_workers (int): 进程数
+
+    Returns:
+        dict: 语言代码 -> [(截图路径, 签名)]，签名计算失败的截图为None
+    """
+    screenshots = {language: list_screenshots(language) for language in languages}
+    missing = {language: [path for path in paths if cache.get(path) is None]
+               for language, paths in screenshots.items()}
+    missing = {language: paths for language, paths in missing.items() if paths}
+    if missing:
+        print(f"计算{sum(len(paths) for paths in missing.values())}张新截图的分块签名...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for computed in executor.map(_signatures, missing.values()):
+                for path, signature in computed.items():
+                    cache.set(path, signature)
+        cache.save()
+    return {language: [(path, cache.get(path)) for path in paths]
+            for language, paths in screenshots.items()}
+
+
+def compare_page(signature, baseline, tile_size=SCREENSHOT_TILE_SIZE):
+    """
+    比较一页截图与基准语言同一页截图的文字分块
+
+    Args:
+        signature (dict): 待检查截图的分块签名
+        baseline (dict): 基准截图的分块签名
+        tile_size (int): 分块边长（像素）
+
+    Returns:
+        dict: {'text_tiles': 文字分块数, 'identical': 与基准相同的文字分块数, 'ratio': 占比,
+               'regions': 相同文字分块的像素区域[x, y, 宽, 高]}
+    """
+    # 两张截图尺寸不同时只比较重叠区域
+    rows, cols = min(signature['rows'], baseline['rows']), min(signature['cols'], baseline['cols'])
+
+    def grid(values, sig):
+        return np.asarray(values, dtype=np.uint64).reshape(sig['rows'], sig['cols'])[:rows, :cols]
+
+    hashes, base_hashes = grid(signature['hashes'], signature), grid(baseline['hashes'], baseline)
+    text = grid(signature['text'], signature).astype(bool) & grid(baseline['text'], baseline).astype(bool)
+    identical = text & (hashes == base_hashes)
+    text_tiles, identical_tiles = int(text.sum()), int(identical.sum())
+    ys, xs = np.nonzero(identical)
+    return {
+        'text_tiles': text_tiles,
+        'identical': identical_tiles,
+        'ratio': identical_tiles / text_tiles if text_tiles else 0.0,
+        'regions': [[int(x) * tile_size, int(y) * tile_size, tile_size, tile_size] for y, x in zip(ys, xs)],
+    }
+
+
+def pair_pages(pages, base_pages, language, baseline):
+    """
+    按页面标识将一个语言的截图与基准语言的截图配对
+
+    Args:
+        pages (list): [(截图路径, 签名)]
+        base_pages (list): 基准语言的[(截图路径, 签名)]
+        language (str): 语言代码
+        baseline (str): 基准语言代码
+
+    Returns:
+        tuple: ([((截图路径, 签名), (基准截图路径, 基准签名))], 基准语言中没有对应页面的截图路径列表,
+                该语言中缺少的基准截图路径列表)
+    """
+    by_id = {page_id(path, baseline): (path, signature) for path, signature in base_pages}
+    pairs, unmatched, matched_ids = [], [], set()
+    for path, signature in pages:
+        key = page_id(path, language)
+        if key in by_id:
+            pairs.append(((path, signature), by_id[key]))
+            matched_ids.add(key)
+        else:
+            unmatched.append(path)
+    missing = [path for key, (path, _) in by_id.items() if key not in matched_ids]
+    return pairs, unmatched, missing
+
+
+def find_unmatched(signatures, baselines=SCREENSHOT_BASELINES):
+    """
+    找出与基准语言无法按页面标识配对的截图（截图失败或页面名不一致），这些页面不会参与比较
+
+    Args:
+        signatures (dict): load_signatures的返回值
+        baselines (tuple): 基准语言
+
+    Returns:
+        list: 每项包含语言、基准语言、unmatched（基准语言中没有对应页面的截图）和missing（该语言缺少的基准截图）
+    """
+    result = []
+    for language, pages in signatures.items():
+        for baseline in baselines:
+            if baseline == language or baseline not in signatures:
+                continue
+            _, unmatched, missing = pair_pages(pages, signatures[baseline], language, baseline)
+            if unmatched or missing:
+                result.append({'language': language, 'baseline': baseline,
+                               'unmatched': unmatched, 'missing': missing})
+    return result
+
+
+def find_untranslated(signatures, baselines=SCREENSHOT_BASELINES, threshold=SCREENSHOT_UNTRANSLATED_RATIO):
+    """
+    找出文字区域与基准语言像素级相同（很可能未翻译）的页面
+
+    Args:
+        signatures (dict): load_signatures的返回值
+        baselines (tuple): 基准语言，基准语言自身只与其他基准语言比较
+        threshold (float): 相同文字分块占比达到该值时标记
+
+    Returns:
+        list: 标记的页面，每项包含语言、截图、基准语言、基准截图和compare_page的结果
+    """
+    flagged = []
+    for language, pages in signatures.items():
+        for baseline in baselines:
+            if baseline == language or baseline not in signatures:
+                continue
+            # 按页面标识与基准语言配对，无法配对的页面见find_unmatched
+            pairs, _, _ = pair_pages(pages, signatures[baseline], language, baseline)
+            for (path, signature), (base_path, base_signature) in pairs:
+                if signature is None or base_signature is None:
+                    continue
+                result = compare_page(signature, base_signature)
+                if result['text_tiles'] and result['ratio'] >= threshold:
+                    flagged.append({'language': language, 'screenshot': path,
+                                    'baseline': baseline, 'baseline_screenshot': base_path, **result})
+    return flagged
+
+
+def run_compare(languages=LANGUAGE_LIST, report_path=SCREENSHOT_REPORT_PATH, max_workers=SCREENSHOT_COMPARE_WORKERS):
+    """
+    检查所有语言的截图并输出报告：untranslated为未翻译页面，unmatched为无法与基准语言配对的截图
+
+    Args:
+        languages (list): 语言代码列表
+        report_path (str): 报告文件路径
+        max_workers (int): 进程数
+
+    Returns:
+        list: 标记的页面，格式同find_untranslated
+    """
+    languages = list(dict.fromkeys(list(SCREENSHOT_BASELINES) + list(languages)))
+    cache = TileCache()
+    signatures = load_signatures(languages, cache, max_workers)
+    flagged = find_untranslated(signatures)
+    unmatched = find_unmatched(signatures)
+    data = json.dumps({'untranslated': flagged, 'unmatched': unmatched},
+                      indent=2, ensure_ascii=False).encode("utf-8")
+    try:
+        atomic_write(report_path, [data])
+    except IOError as e:
+        print(f"写入报告失败: {str(e)}")
+    for item in flagged:
+        print(f"{item['language']} {os.path.basename(item['screenshot'])} 与{item['baseline']}相同的文字区域占"
+              f"{item['ratio']:.0%}（{item['identical']}/{item['text_tiles']}块）")
+    for item in unmatched:
+        for path in item['unmatched']:
+            print(f"{item['language']} {os.path.basename(path)} 在{item['baseline']}中没有对应页面")
+        for path in item['missing']:
+            print(f"{item['language']} 缺少{item['baseline']}的页面 {os.path.basename(path)}")
+    print(f"共标记{len(flagged)}个页面，报告已保存到: {report_path}")
+    return flagged
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="对比各语言截图与基准语言，找出未翻译的页面")
+    parser.add_argument("--language", action="append", help="要检查的语言，可重复指定，默认全部")
+    parser.add_argument("--workers", type=int, default=SCREENSHOT_COMPARE_WORKERS, help="进程数")
+    args = parser.parse_args()
+    run_compare(args.language or LANGUAGE_LIST, max_workers=args.workers)
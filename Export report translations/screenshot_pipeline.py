@@ -0,0 +1,148 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from auto_download_web import get_image_url, download_image
+from config import LANGUAGE_LIST, SCREENSHOT_WINDOW, SCREENSHOT_DOWNLOAD_WORKERS
+
+
+class LanguageProgress:
+    """
+    单个语言的截图进度
+
+    Args:
+        language (str): 语言代码
+    """
+
+    def __init__(self, language):
+        self.language = language
+        self.total = None        # 截图数量，截图完成前为None
+        self.done = 0
+        self.failed = 0
+        self.started = None      # 截图线程开始处理该语言的时间，排队等待不计入耗时
+        self.elapsed = None      # 全部图片下载完成时的耗时
+
+    @property
+    def finished(self):
+        return self.total is not None and self.done + self.failed >= self.total
+
+    def __str__(self):
+        if self.total is None:
+            return f"{self.language} 截图中"
+        return f"{self.language} {self.done + self.failed}/{self.total}" + (f" 失败{self.failed}" if self.failed else "")
+
+
+def print_progress(progress):
+    """默认的进度回调：语言截图完成或图片全部下载完成时输出一行"""
+    if progress.total == 0:
+        print(f"{progress.language} 没有图片")
+    elif progress.finished:
+        print(f"{progress} 下载完成，耗时{progress.elapsed:.1f}s")
+    elif progress.done + progress.failed == 0:
+        print(f"{progress.language} 截图完成，共{progress.total}张，开始下载")
+
+
+class ScreenshotPipeline:
+    """
+    截图采集的生产者/消费者流水线：同时为多个语言提交截图任务（有界窗口），
+    每个语言的图片列表返回后立即交给独立的下载线程池，总耗时接近最慢的单个语言
+
+    Args:
+        window (int): 同时进行的截图任务数上限
+        download_workers (int): 下载线程数
+        get_urls (callable): (语言索引) -> 图片路径列表，默认get_image_url
+        download (callable): (图片路径, 语言代码) -> None，默认download_image
+        on_progress (callable): 进度回调，参数为LanguageProgress
+    """
+
+    def __init__(self, window=SCREENSHOT_WINDOW, download_workers=SCREENSHOT_DOWNLOAD_WORKERS,
+                 get_urls=get_image_url, download=download_image, on_progress=print_progress):
+        self.window = window
+        self.download_workers = download_workers
+        self.get_urls = get_urls
+        self.download = download
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+
+    def _report(self, progress):
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    def _capture(self, index, progress):
+        progress.started = time.perf_counter()
+        return self.get_urls(index)
+
+    def _download(self, url, progress):
+        try:
+            self.download(url, progress.language)
+            ok = True
+        except Exception as e:
+            print(f"{progress.language} 下载失败: {url} {str(e)}")
+            ok = False
+        with self._lock:
+            if ok:
+                progress.done += 1
+            else:
+                progress.failed += 1
+            if progress.finished:
+                progress.elapsed = time.perf_counter() - progress.started
+        self._report(progress)
+
+    def run(self, languages=LANGUAGE_LIST):
+        """
+        为所有语言截图并下载图片
+
+        Args:
+            languages (list): 语言代码列表，顺序需与截图服务的language_index一致
+
+        Returns:
+            dict: 语言代码 -> LanguageProgress
+        """
+        progress = {language: LanguageProgress(language) for language in languages}
+        with ThreadPoolExecutor(max_workers=self.download_workers) as downloader:
+            with ThreadPoolExecutor(max_workers=self.window) as capturer:
+                captures = {capturer.submit(self._capture, index, progress[language]): language
+                            for index, language in enumerate(languages)}
+                for future in as_completed(captures):
+                    item = progress[captures[future]]
+                    try:
+                        urls = future.result() or []
+                    except Exception as e:
+                        print(f"{item.language} 截图失败: {str(e)}")
+                        urls = []
+                    item.total = len(urls)
+                    if not urls:
+                        item.elapsed = time.perf_counter() - item.started
+                    self._report(item)
+                    for url in urls:
+                        downloader.submit(self._download, url, item)
+        return progress
+
+
+def run_pipeline(languages=LANGUAGE_LIST, **kwargs):
+    """
+    运行截图流水线并输出汇总
+
+    Args:
+        languages (list): 语言代码列表
+        **kwargs: 透传给ScreenshotPipeline的参数
+
+    Returns:
+        dict: 语言代码 -> LanguageProgress
+    """
+    start = time.perf_counter()
+    progress = ScreenshotPipeline(**kwargs).run(languages)
+    failed = [p for p in progress.values() if p.failed or not p.total]
+    print(f"\n全部完成，耗时{time.perf_counter() - start:.1f}s，"
+          f"共{sum(p.done for p in progress.values())}张图片，{len(failed)}个语言有失败或没有图片")
+    for p in failed:
+        print(f"  {p}")
+    return progress
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="并发采集各语言的页面截图")
+    parser.add_argument("--window", type=int, default=SCREENSHOT_WINDOW, help="同时进行的截图任务数")
+    parser.add_argument("--download-workers", type=int, default=SCREENSHOT_DOWNLOAD_WORKERS, help="下载线程数")
+    args = parser.parse_args()
+    run_pipeline(window=args.window, download_workers=args.download_workers)
@@ -0,0 +1,250 @@
+import argparse
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from get_sta_overview_export import get_sta_overview_export, export_path, url_list
+from http_client import service_of
+from adaptive_limiter import get_limiter
+from xlsx_reader import iter_sheets, Sheet, InvalidWorkbookError
+from xlsx_writer import write_workbook
+from config import (LANGUAGE_LIST, SHARD_UNIT, SHARD_MIN_SPAN_DAYS, SHARD_MAX_WORKERS, SHARD_HEADER_ROWS,
+                    SHARD_ENDPOINTS)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 分片粒度 -> 分片长度
+SHARD_UNITS = {'day': timedelta(days=1), 'week': timedelta(days=7)}
+
+# 表头中的日期时间（如标题行中的查询时间范围），各分片不同，比较表头时忽略
+_DATE_TIME = re.compile(r'\d{4}[-/.]\d{1,2}[-/.]\d{1,2}(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?')
+
+
+def split_range(start_time, end_time, unit=SHARD_UNIT):
+    """
+    将时间范围按天或按周拆分为连续的分片
+
+    以59秒结尾的结束时间（如"2025-05-31 15:59:59"）视为闭区间，各分片的结束时间为下一分片开始前一秒，
+    否则相邻分片共用边界时间
+
+    Args:
+        start_time (str): 开始时间，格式同url_list中的startTime
+        end_time (str): 结束时间
+        unit (str): 分片粒度，day或week
+
+    Returns:
+        list: [(分片开始时间, 分片结束时间)]
+    """
+    start, end = datetime.strptime(start_time, TIME_FORMAT), datetime.strptime(end_time, TIME_FORMAT)
+    step = SHARD_UNITS[unit]
+    inclusive = end.second == 59
+    shards = []
+    cursor = start
+    while cursor < end:
+        boundary = min(cursor + step, end)
+        shard_end = boundary - timedelta(seconds=1) if inclusive and boundary < end else boundary
+        shards.append((cursor.strftime(TIME_FORMAT), shard_end.strftime(TIME_FORMAT)))
+        cursor = boundary
+    return shards or [(start_time, end_time)]
+
+
+def shard_params(url, params, unit=SHARD_UNIT, min_span_days=SHARD_MIN_SPAN_DAYS, endpoints=SHARD_ENDPOINTS):
+    """
+    按startTime/endTime拆分请求参数，只拆分endpoints中的明细接口
+
+    Args:
+        url (str): 接口地址
+        params (dict): 请求参数
+        unit (str): 分片粒度，day或week
+        min_span_days (float): 时间范围超过该天数才拆分
+        endpoints (tuple): 允许分片的接口名
+
+    Returns:
+        list: 各分片的请求参数；不在endpoints中、没有时间范围或范围不够长时只有原参数一项
+    """
+    if url.split('/')[-1] not in endpoints:
+        return [params]
+    try:
+        start = datetime.strptime(params["startTime"], TIME_FORMAT)
+        end = datetime.strptime(params["endTime"], TIME_FORMAT)
+    except (KeyError, TypeError, ValueError):
+        return [params]
+    if end - start <= timedelta(days=min_span_days):
+        return [params]
+    return [dict(params, startTime=shard_start, endTime=shard_end)
+            for shard_start, shard_end in split_range(params["startTime"], params["endTime"], unit)]
+
+
+def _normalize(row):
+    # 去掉行尾的空单元格，比较表头时不受列数差异影响；文本中的日期时间统一替换，标题行中的查询时间不同也视为相同
+    row = [_DATE_TIME.sub('#', value) if isinstance(value, str) else value for value in row]
+    while row and row[-1] in (None, ''):
+        row.pop()
+    return row
+
+
+def _skip_header(rows, header):
+    # 只跳过开头与第一个分片同位置表头行相同（忽略日期时间）的行，遇到第一个不同的行即停止，不会误删数据行
+    skipping = True
+    for index, row in enumerate(rows):
+        if skipping and index < len(header) and _normalize(row) == header[index]:
+            continue
+        skipping = False
+        yield row
+
+
+def _merged_sheets(readers, header_rows):
+    # 各分片的工作表按序号对齐，第一个分片保留全部行，其余分片去掉与之相同的表头后依次拼接
+    for first in readers[0]:
+        others = []
+        for reader in readers[1:]:
+            sheet = next(reader, None)
+            if sheet is not None:
+                others.append(sheet)
+
+        def rows(first=first, others=others):
+            # 第一个分片的前header_rows行作为表头候选
+            header = []
+            for row in first.rows:
+                if len(header) < header_rows:
+                    header.append(_normalize(row))
+                yield row
+            for sheet in others:
+                yield from _skip_header(sheet.rows, header)
+
+        yield Sheet(first.name, rows(), first.right_to_left)
+
+
+def merge_workbooks(paths, file_name, header_rows=SHARD_HEADER_ROWS):
+    """
+    将按时间顺序排列的分片工作簿流式合并为一个文件，表头只保留一次
+
+    以第一个分片的工作表为准，其他分片中多出的工作表忽略；其他分片开头与第一个分片
+    前header_rows行逐行相同的行视为重复表头去掉，从第一个不同的行起全部保留。
+    比较时忽略文本中的日期时间，标题行中带有各分片查询时间范围的报表也只保留一次表头
+
+    Args:
+        paths (list): 分片工作簿路径，按时间顺序
+        file_name (str): 合并后的文件路径
+        header_rows (int): 每个工作表最多的表头行数
+
+    Returns:
+        int: 合并后的总行数
+
+    Raises:
+        InvalidWorkbookError: 分片不是有效的xlsx工作簿
+    """
+    readers = [iter_sheets(path) for path in paths]
+    try:
+        return write_workbook(file_name, _merged_sheets(readers, header_rows))
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def export_sharded(accept_language='', url='', params=None, method="post", save_path=None, unit=SHARD_UNIT,
+                   min_span_days=SHARD_MIN_SPAN_DAYS, max_workers=SHARD_MAX_WORKERS, header_rows=SHARD_HEADER_ROWS,
+                   limiter_for=get_limiter, export_func=get_sta_overview_export):
+    """
+    分片导出：时间范围较长的明细导出按天或按周拆分后并发导出各分片，再合并为一个文件；
+    不在SHARD_ENDPOINTS中的接口（汇总、统计报表）、范围不够长或没有时间参数的导出直接调用export_func
+
+    第一个分片使用调用方（如ExportEngine）已占用的并发名额，其余并发分片在每次导出前
+    需要从服务的自适应限流器取得名额，取不到时由已有的线程依次导出，不会超出服务的并发上限
+
+    Args:
+        accept_language (str): 接受的语言代码
+        url (str): API的完整URL地址
+        params (dict): 请求参数字典
+        method (str): 请求方法
+        save_path (str): 保存路径，默认为export_path(accept_language, url)
+        unit (str): 分片粒度，day或week
+        min_span_days (float): 时间范围超过该天数才分片
+        max_workers (int): 同时进行的分片数上限
+        header_rows (int): 合并时每个工作表的表头行数
+        limiter_for (callable): 服务前缀 -> AIMDLimiter
+        export_func (callable): 导出单个文件的函数，签名同get_sta_overview_export
+
+    Returns:
+        str: 保存的文件路径，如果发生错误则返回None
+    """
+    shards = shard_params(url, params, unit, min_span_days)
+    if len(shards) == 1:
+        return export_func(accept_language, url, params, method, save_path=save_path)
+
+    file_name = save_path or export_path(accept_language, url)
+    shard_dir = os.path.join(os.path.dirname(file_name), ".shards")
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    shard_files = [os.path.join(shard_dir, f"{stem}.{index}.xlsx") for index in range(len(shards))]
+    limiter = limiter_for(service_of(url))
+    pending = deque(range(len(shards)))
+    results = [None] * len(shards)
+
+    def worker(extra):
+        while True:
+            if extra and not limiter.try_acquire():
+                return
+            try:
+                try:
+                    index = pending.popleft()
+                except IndexError:
+                    return
+                results[index] = export_func(accept_language, url, shards[index], method, save_path=shard_files[index])
+            finally:
+                if extra:
+                    limiter.release()
+
+    print(f"{accept_language} {url.split('/')[-1]} 拆分为{len(shards)}个分片导出")
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(shards))) as executor:
+            futures = [executor.submit(worker, index > 0) for index in range(min(max_workers, len(shards)))]
+            for future in futures:
+                future.result()
+
+        failed = [shards[index] for index, path in enumerate(results) if path is None]
+        if failed:
+            for shard in failed:
+                print(f"分片导出失败: {accept_language} {url} {shard['startTime']} ~ {shard['endTime']}")
+            return None
+
+        rows = merge_workbooks(results, file_name, header_rows)
+        print(f"已合并{len(shards)}个分片（{rows}行）到: {file_name}")
+        return file_name
+    except InvalidWorkbookError as e:
+        print(f"合并分片失败: {str(e)}")
+        return None
+    except IOError as e:
+        print(f"文件操作错误: {str(e)}")
+        return None
+    finally:
+        for path in shard_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        try:
+            os.rmdir(shard_dir)
+        except OSError:
+            # 其他导出的分片仍在目录中
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按时间分片导出时间范围较长的接口并合并")
+    parser.add_argument("--unit", default=SHARD_UNIT, choices=sorted(SHARD_UNITS), help="分片粒度")
+    parser.add_argument("--min-span-days", type=float, default=SHARD_MIN_SPAN_DAYS, help="时间范围超过该天数才分片")
+    parser.add_argument("--workers", type=int, default=SHARD_MAX_WORKERS, help="同时进行的分片数上限")
+    parser.add_argument("--language", default=LANGUAGE_LIST[0], help="导出语言")
+    args = parser.parse_args()
+
+    for request_data in url_list:
+        url, params = request_data[0], request_data[1]
+        method = request_data[2] if len(request_data) > 2 else "post"
+        if len(shard_params(url, params, args.unit, args.min_span_days)) == 1:
+            continue
+        start = time.perf_counter()
+        result = export_sharded(args.language, url, params, method, unit=args.unit,
+                                min_span_days=args.min_span_days, max_workers=args.workers)
+        print(f"{url.split('/')[-1]} {'成功' if result else '失败'} ({time.perf_counter() - start:.1f}s)")
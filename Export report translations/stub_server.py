@@ -0,0 +1,208 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class StubConfig:
+    """
+    桩服务的行为配置
+
+    Args:
+        latency (float): 普通接口的基础延迟（秒）
+        jitter (float): 在基础延迟上叠加的随机延迟上限（秒）
+        export_latency (float): 导出接口生成报表的额外延迟（秒）
+        payload_size (int): 导出文件/下载文件的字节数
+        error_rate (float): 导出接口返回500的概率
+        task_delay (float): 导出任务从创建到完成的耗时（秒）
+        screenshot_latency (float): 截图服务每种语言的处理耗时（秒）
+        screenshot_count (int): 每种语言返回的截图数量
+        screenshot_size (int): 每张截图的字节数
+    """
+
+    def __init__(self, latency=0.005, jitter=0.005, export_latency=0.05, payload_size=256 * 1024,
+                 error_rate=0.0, task_delay=1.0, screenshot_latency=0.5, screenshot_count=10,
+                 screenshot_size=64 * 1024):
+        self.latency = latency
+        self.jitter = jitter
+        self.export_latency = export_latency
+        self.payload_size = payload_size
+        self.error_rate = error_rate
+        self.task_delay = task_delay
+        self.screenshot_latency = screenshot_latency
+        self.screenshot_count = screenshot_count
+        self.screenshot_size = screenshot_size
+
+
+class _StubState:
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.task_ids = itertools.count(1)
+        self.tasks = []          # [(任务ID, 完成时间)]，按创建顺序
+        self.counts = {}         # 接口 -> 请求次数
+        # 预生成报表内容，以"PK"开头模拟xlsx的zip容器
+        self.payload = b"PK" + bytes(config.payload_size - 2)
+        self.picture = b"\x89PNG" + bytes(config.screenshot_size - 4)
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # 支持keep-alive，与真实服务一致
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _sleep(self, extra=0.0):
+        config = self.state.config
+        time.sleep(config.latency + random.random() * config.jitter + extra)
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, obj, status=200):
+        self._send(status, json.dumps(obj).encode("utf-8"), 'application/json;charset=UTF-8')
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._read_body()
+        self._dispatch()
+
+    def _dispatch(self):
+        parts = urlsplit(self.path)
+        path, query = parts.path, parse_qs(parts.query)
+        state, config = self.state, self.state.config
+
+        if path.endswith('/user-service/user/login'):
+            state.count('login')
+            self._sleep()
+            self._send_json({'code': 200, 'data': {'token': 'stub-token'}})
+        elif path.endswith('/device-service/task/save'):
+            state.count('task_save')
+            self._sleep()
+            with state.lock:
+                task_id = next(state.task_ids)
+                state.tasks.append((task_id, time.monotonic() + config.task_delay))
+            self._send_json({'code': 200, 'data': task_id})
+        elif path.endswith('/device-service/task/list'):
+            state.count('task_list')
+            self._sleep()
+            page_index = int(query.get('pageIndex', ['1'])[0])
+            page_size = int(query.get('pageSize', ['20'])[0])
+            now = time.monotonic()
+            with state.lock:
+                newest_first = state.tasks[::-1][(page_index - 1) * page_size:page_index * page_size]
+            host = self.headers.get('Host')
+            data = [{'id': task_id,
+                     'downloadUrl': f"http://{host}/files/report_{task_id}.xlsx" if now >= done_at else ''}
+                    for task_id, done_at in newest_first]
+            self._send_json({'code': 200, 'data': data})
+        elif path.startswith('/files/'):
+            state.count('file')
+            self._sleep()
+            self._send(200, state.payload, XLSX_CONTENT_TYPE)
+        elif path.endswith('/autotest_translate'):
+            state.count('screenshot')
+            self._sleep(config.screenshot_latency)
+            pics = [f"/pics/{random.getrandbits(32):08x}_{i}.png" for i in range(config.screenshot_count)]
+            self._send_json({'code': 200, 'data': {'pics': pics}})
+        elif path.endswith('/get_pic'):
+            state.count('picture')
+            self._sleep()
+            self._send(200, state.picture, 'image/png')
+        elif 'xport' in path:
+            # url_list中的导出接口：*Export、exportLog、exportList
+            state.count('export')
+            self._sleep(config.export_latency)
+            if random.random() < config.error_rate:
+                self._send_json({'code': 500, 'msg': 'stub error'}, status=500)
+            else:
+                self._send(200, state.payload, XLSX_CONTENT_TYPE)
+        else:
+            self._send_json({'code': 404, 'msg': 'not found'}, status=404)
+
+
+class StubServer:
+    """
+    本地模拟SaaS导出接口和截图服务的桩服务，在后台线程中运行
+
+    Args:
+        config (StubConfig): 行为配置
+        host (str): 监听地址
+        port (int): 监听端口，0表示自动分配
+    """
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.state = _StubState(config or StubConfig())
+        handler = type('StubHandler', (_Handler,), {'state': self.state})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self):
+        """与config.BASE_URL结构相同的接口基础地址"""
+        return f"{self.url}/saas-pre/web/api"
+
+    @property
+    def counts(self):
+        """各类接口收到的请求次数"""
+        with self.state.lock:
+            return dict(self.state.counts)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动本地SaaS导出接口桩服务")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--export-latency", type=float, default=0.05)
+    parser.add_argument("--payload-size", type=int, default=256 * 1024)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--task-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    stub = StubServer(StubConfig(latency=args.latency, export_latency=args.export_latency,
+                                 payload_size=args.payload_size, error_rate=args.error_rate,
+                                 task_delay=args.task_delay), port=args.port)
+    print(f"桩服务已启动: EXPORT_BASE_URL={stub.base_url} SCREENSHOT_SERVICE_URL={stub.url}")
+    stub.httpd.serve_forever()
@@ -0,0 +1,193 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from config import (TASK_POLL_INTERVAL, TASK_POLL_MAX_INTERVAL, TASK_TIMEOUT,
+                    TASK_EXPECTED_DURATION)
+
+
+class TaskTimeoutError(Exception):
+    """等待导出任务超过截止时间"""
+
+
+class _Waiter:
+    __slots__ = ('task_id', 'future', 'registered_at', 'deadline')
+
+    def __init__(self, task_id, timeout):
+        self.task_id = task_id
+        self.future = Future()
+        self.registered_at = time.monotonic()
+        self.deadline = self.registered_at + timeout
+
+
+class TaskWatcher:
+    """
+    共享的任务列表观察者：后台线程为所有等待中的导出任务统一轮询一次任务列表，
+    按任务ID完成对应的Future，并根据任务实际完成耗时自适应调整轮询间隔
+
+    新登记的任务在min_interval后即参与一次轮询（同一间隔内登记的任务合并为一次），
+    之后按预期完成耗时和空轮询次数退避
+
+    Args:
+        fetch (callable): 无参函数，返回 {任务ID(str): 下载URL} 映射，未完成的任务URL为空
+        min_interval (float): 最小轮询间隔（秒）
+        max_interval (float): 最大轮询间隔（秒）
+        default_timeout (float): 默认等待截止时间（秒）
+        expected_duration (float): 任务完成耗时的初始估计（秒）
+        limiter (AIMDLimiter): 任务列表所属服务的限流器，轮询时占用一个并发额度并遵守Retry-After
+    """
+
+    def __init__(self, fetch, min_interval=TASK_POLL_INTERVAL,
+                 max_interval=TASK_POLL_MAX_INTERVAL,
+                 default_timeout=TASK_TIMEOUT,
+                 expected_duration=TASK_EXPECTED_DURATION,
+                 limiter=None):
+        self.fetch = fetch
+        self.limiter = limiter
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_timeout = default_timeout
+        self.expected_duration = expected_duration  # 任务完成耗时的指数移动平均
+        self._waiters = {}        # 任务ID -> [_Waiter]，同一任务可以有多个等待者
+        self._idle_polls = 0
+        self._last_poll = 0.0     # 上次开始拉取任务列表的时间
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def watch(self, task_id, timeout=None):
+        """
+        登记一个等待中的任务
+
+        Args:
+            task_id: /device-service/task/save返回的任务ID
+            timeout (float): 等待截止时间（秒），默认使用default_timeout
+
+        Returns:
+            Future: 任务完成时结果为下载URL，超时则抛出TaskTimeoutError
+        """
+        return self._register(task_id, timeout).future
+
+    def _register(self, task_id, timeout):
+        waiter = _Waiter(str(task_id), timeout or self.default_timeout)
+        with self._cond:
+            self._waiters.setdefault(waiter.task_id, []).append(waiter)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="task-watcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return waiter
+
+    def wait(self, task_id, timeout=None):
+        """
+        阻塞等待任务完成，返回下载URL
+
+        截止时间由后台线程判定；后台线程异常退出时最多再多等一个最大轮询间隔，不会永久阻塞
+
+        Raises:
+            TaskTimeoutError: 超过截止时间或观察者已停止
+        """
+        timeout = timeout or self.default_timeout
+        waiter = self._register(task_id, timeout)
+        try:
+            return waiter.future.result(timeout + self.max_interval)
+        except FutureTimeoutError:
+            with self._cond:
+                self._discard(waiter)
+            raise TaskTimeoutError(f"任务{task_id}等待超时") from None
+
+    def _discard(self, waiter):
+        # 调用方持有self._cond
+        waiters = self._waiters.get(waiter.task_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._waiters[waiter.task_id]
+
+    def stop(self):
+        """停止后台轮询线程，所有等待中的任务以TaskTimeoutError结束"""
+        with self._cond:
+            self._stopped = True
+            waiters, self._waiters = self._waiters, {}
+            self._cond.notify()
+        for task_waiters in waiters.values():
+            for waiter in task_waiters:
+                waiter.future.set_exception(TaskTimeoutError(f"任务观察者已停止，任务{waiter.task_id}未完成"))
+
+    def _all_waiters(self):
+        return [waiter for task_waiters in self._waiters.values() for waiter in task_waiters]
+
+    def _next_delay(self):
+        # 距离下一次轮询的时间：基础间隔取预期完成耗时的四分之一，连续空轮询时指数退避
+        delay = self.expected_duration / 4 * (1.5 ** self._idle_polls)
+        delay = max(self.min_interval, min(self.max_interval, delay))
+        now = time.monotonic()
+        waiters = self._all_waiters()
+        earliest = min(w.registered_at for w in waiters)
+        # 间隔从上次轮询算起；观察者空闲一段时间后从最早的任务登记时算起
+        last = max(self._last_poll, earliest)
+        # 最早的任务预计还远未完成时，不必提前轮询
+        until_expected = earliest + self.expected_duration / 2 - last
+        poll_at = last + max(delay, min(until_expected, self.max_interval))
+        # 登记后还没有被轮询过的任务只等待最小间隔，短任务不必等到下一个退避周期
+        fresh = [w.registered_at for w in waiters if w.registered_at >= self._last_poll]
+        if fresh:
+            poll_at = min(poll_at, min(fresh) + self.min_interval)
+        if self.limiter is not None:
+            # 服务端要求等待时推迟轮询
+            poll_at = max(poll_at, now + self.limiter.blocked_for())
+        nearest_deadline = min(w.deadline for w in waiters)
+        return max(0, min(poll_at, nearest_deadline) - now)
+
+    def _expire(self):
+        now = time.monotonic()
+        for waiter in self._all_waiters():
+            if now >= waiter.deadline:
+                self._discard(waiter)
+                waiter.future.set_exception(TaskTimeoutError(f"任务{waiter.task_id}等待超时"))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._waiters and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # 新登记的任务唤醒线程后重新计算轮询时间，同一最小间隔内登记的任务合并为一次轮询
+                delay = self._next_delay()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                self._expire()
+                if not self._waiters:
+                    continue
+                self._last_poll = time.monotonic()
+
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                tasks = self.fetch() or {}
+            except Exception as e:
+                print(f"获取任务列表失败: {str(e)}")
+                tasks = {}
+            finally:
+                if self.limiter is not None:
+                    self.limiter.release()
+            self._resolve(tasks)
+
+    def _resolve(self, tasks):
+        now = time.monotonic()
+        completed = 0
+        with self._cond:
+            # 按等待者逐个查找，开销与等待中的任务数成正比而与任务列表长度无关
+            for task_id, task_waiters in list(self._waiters.items()):
+                url = tasks.get(task_id)
+                if not url:
+                    continue
+                del self._waiters[task_id]
+                for waiter in task_waiters:
+                    waiter.future.set_result(url)
+                completed += 1
+                duration = now - min(waiter.registered_at for waiter in task_waiters)
+                self.expected_duration = 0.8 * self.expected_duration + 0.2 * duration
+            self._idle_polls = 0 if completed else self._idle_polls + 1
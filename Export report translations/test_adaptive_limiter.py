@@ -0,0 +1,49 @@
+import asyncio
+import threading
+from adaptive_limiter import AIMDLimiter
+
+
+def test_acquire_async_waits_for_release():
+    limiter = AIMDLimiter(1, initial=1)
+    order = []
+
+    async def worker(name, hold):
+        await limiter.acquire_async()
+        order.append(name)
+        await asyncio.sleep(hold)
+        limiter.release()
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(worker('a', 0.05), worker('b', 0), worker('c', 0)), 1)
+
+    asyncio.run(main())
+    assert order == ['a', 'b', 'c']
+    assert limiter.in_flight == 0
+
+
+def test_acquire_async_woken_by_release_from_thread():
+    limiter = AIMDLimiter(1, initial=1)
+    limiter.acquire()
+
+    async def main():
+        threading.Timer(0.05, limiter.release).start()
+        await asyncio.wait_for(limiter.acquire_async(), 1)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
+
+
+def test_cancelled_waiter_passes_wakeup_on():
+    limiter = AIMDLimiter(1, initial=1)
+
+    async def main():
+        await limiter.acquire_async()
+        first = asyncio.ensure_future(limiter.acquire_async())
+        second = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        limiter.release()
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
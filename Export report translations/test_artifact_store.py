@@ -0,0 +1,30 @@
+import os
+from artifact_store import ArtifactStore
+from artifact_writer import atomic_write
+
+
+def test_linked_exports_stay_writable_and_replaceable(tmp_path):
+    store = ArtifactStore(str(tmp_path / ".store"))
+    first, second = str(tmp_path / "en" / "a.xlsx"), str(tmp_path / "ja" / "a.xlsx")
+    atomic_write(first, [b"same"], store)
+    atomic_write(second, [b"same"], store)
+    assert os.path.samefile(first, second)
+    assert os.access(first, os.W_OK)
+
+    # 下一次导出内容变化时直接替换链接的文件
+    atomic_write(first, [b"changed"], store)
+    with open(first, "rb") as f:
+        assert f.read() == b"changed"
+    with open(second, "rb") as f:
+        assert f.read() == b"same"
+
+
+def test_prune_removes_unreferenced_blobs(tmp_path):
+    store = ArtifactStore(str(tmp_path / ".store"))
+    path = str(tmp_path / "en" / "a.xlsx")
+    atomic_write(path, [b"old"], store)
+    atomic_write(path, [b"new"], store)
+    assert store.prune() == 1
+    assert store.prune() == 0
+    with open(path, "rb") as f:
+        assert f.read() == b"new"
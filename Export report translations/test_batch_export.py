@@ -0,0 +1,37 @@
+import pytest
+import batch_export
+from batch_export import entity_key, build_batch_jobs, find_reports, run_batch
+from xlsx_reader import Sheet, read_sheets
+from xlsx_writer import write_workbook
+
+NO_ENTITY_REPORTS = ["statisticExport", "inOutFenceDetailExport", "fenceAlarmDetailExport", "punchDetailExport",
+                     "punchStaExport", "getListExport", "exportLog"]
+
+
+def test_entity_key():
+    assert entity_key({"carId": "1", "entId": "2"}) == "carId"
+    assert entity_key({"entId": "2"}) == "entId"
+    with pytest.raises(ValueError):
+        entity_key({"startTime": "", "endTime": ""})
+
+
+@pytest.mark.parametrize("name", NO_ENTITY_REPORTS)
+def test_reports_without_entity_need_explicit_key(name):
+    reports = find_reports([name])
+    with pytest.raises(ValueError, match=name):
+        build_batch_jobs(["1"], ["zh-CN"], reports)
+    jobs, _ = build_batch_jobs(["1", "2"], ["zh-CN"], reports, key="entId")
+    assert [job.params["entId"] for job in jobs] == ["1", "2"]
+
+
+def test_merge_keeps_first_data_row_of_each_entity(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_export, "TRANSLATION_DIR", str(tmp_path))
+
+    def export(accept_language, url, params, method, save_path=None):
+        write_workbook(save_path, [Sheet("明细", [["车辆", "里程"], [params["carId"], 1], [params["carId"], 2]], False)])
+        return save_path
+
+    reports = find_reports(["mileageStaByDayExport"])
+    results, merged = run_batch(["粤A0", "粤A1"], ["zh-CN"], reports, merge=True, export_func=export)
+    assert all(result.path for result in results)
+    assert read_sheets(merged[0])[0].rows == [["车辆", "里程"], ["粤A0", 1], ["粤A0", 2], ["粤A1", 1], ["粤A1", 2]]
@@ -0,0 +1,57 @@
+import pytest
+from PIL import Image, ImageDraw
+from screenshot_compare import page_id, tile_signature, find_untranslated, find_unmatched
+
+
+def _image(path, draw):
+    image = Image.new('L', (512, 256), 255)
+    draw(ImageDraw.Draw(image))
+    image.save(path)
+    return str(path)
+
+
+def _text(draw, text="Vehicle status report offline alarm mileage"):
+    for line in range(8):
+        draw.text((10, 10 + line * 24), text, fill=0)
+
+
+def _chrome(draw):
+    # 边框、分隔线、实心图标和Logo，没有文字
+    draw.rectangle((20, 20, 490, 230), outline=0, width=2)
+    draw.line((20, 120, 490, 120), fill=0)
+    for index in range(7):
+        draw.ellipse((30 + index * 64, 40, 54 + index * 64, 64), fill=0)
+    draw.rectangle((40, 140, 200, 220), fill=30)
+
+
+@pytest.mark.parametrize("path, language, expected", [
+    ("web-en/login_en.png", "en", "login"),
+    ("web-zh-CN/zh-CN-login.png", "zh-CN", "login"),
+    ("web-en/screen.png", "en", "screen"),
+    ("web-en/3.png", "en", "3"),
+])
+def test_page_id(path, language, expected):
+    assert page_id(path, language) == expected
+
+
+def test_borders_and_icons_are_not_text(tmp_path):
+    assert sum(tile_signature(_image(tmp_path / "chrome.png", _chrome))['text']) == 0
+    assert sum(tile_signature(_image(tmp_path / "text.png", _text))['text']) > 0
+
+
+def test_pages_are_paired_by_page_id(tmp_path):
+    def page(name, draw):
+        path = _image(tmp_path / name, draw)
+        return path, tile_signature(path)
+
+    signatures = {
+        'zh-CN': [page("alarm_zh-CN.png", _text), page("login_zh-CN.png", lambda draw: _text(draw, "abc def ghi"))],
+        # 缺少alarm页面，按位置配对会把login与alarm比较
+        'fr': [page("login_fr.png", lambda draw: _text(draw, "abc def ghi")), page("zzz_fr.png", _text)],
+    }
+    flagged = find_untranslated(signatures, baselines=('zh-CN',))
+    assert [(item['screenshot'], item['baseline_screenshot']) for item in flagged] == [
+        (signatures['fr'][0][0], signatures['zh-CN'][1][0])]
+    assert find_unmatched(signatures, baselines=('zh-CN',)) == [
+        {'language': 'fr', 'baseline': 'zh-CN', 'unmatched': [signatures['fr'][1][0]],
+         'missing': [signatures['zh-CN'][0][0]]}]
@@ -0,0 +1,74 @@
+from get_task_list import TaskListReader
+
+
+class FakeTaskList:
+    """按ID从新到旧分页返回任务，记录每次请求的页码"""
+
+    def __init__(self):
+        self.tasks = []
+        self.requested = []
+
+    def add(self, task_id, url=''):
+        self.tasks.insert(0, {'id': task_id, 'downloadUrl': url})
+
+    def complete(self, task_id, url):
+        for task in self.tasks:
+            if task['id'] == task_id:
+                task['downloadUrl'] = url
+
+    def page(self, accept_language, page_index, page_size):
+        self.requested.append(page_index)
+        return self.tasks[(page_index - 1) * page_size:page_index * page_size]
+
+
+def test_stuck_task_stops_paging_after_max_age():
+    server = FakeTaskList()
+    for task_id in range(1, 11):
+        server.add(task_id, f'url{task_id}')
+    server.add(11)
+    reader = TaskListReader(page_size=2, max_pages=10, fetch_page=server.page, pending_max_age=0.05)
+    reader.refresh()
+    for task_id in range(12, 22):
+        server.add(task_id, f'url{task_id}')
+
+    server.requested.clear()
+    reader.refresh()
+    assert server.requested == [1, 2, 3, 4, 5, 6]
+
+    reader.pending['11'] -= 1
+    reader.refresh()
+    server.requested.clear()
+    reader.refresh()
+    assert server.requested == [1]
+    assert '11' not in reader.tasks
+
+
+def test_watermark_does_not_skip_unfetched_pages():
+    server = FakeTaskList()
+    server.add(1, 'url1')
+    reader = TaskListReader(page_size=2, max_pages=2, fetch_page=server.page)
+    reader.refresh()
+    for task_id in range(2, 8):
+        server.add(task_id, f'url{task_id}')
+
+    reader.refresh()
+    assert reader.watermark[0] == '1'
+    assert '3' not in reader.tasks
+
+    server.add(8, 'url8')
+    reader.max_pages = 10
+    assert set(reader.refresh()) == {'2', '3', '8'}
+    assert reader.watermark[0] == '8'
+
+
+def test_pending_task_completion_is_found_below_watermark():
+    server = FakeTaskList()
+    server.add(1)
+    reader = TaskListReader(page_size=2, fetch_page=server.page)
+    assert reader.refresh() == {'1': ''}
+    for task_id in range(2, 6):
+        server.add(task_id, f'url{task_id}')
+    server.complete(1, 'url1')
+
+    assert reader.refresh()['1'] == 'url1'
+    assert reader.pending == {}
@@ -0,0 +1,55 @@
+import time
+import pytest
+from task_watcher import TaskWatcher, TaskTimeoutError
+
+
+class FakeTasks:
+    """任务在登记done_after秒后完成，记录拉取次数"""
+
+    def __init__(self, done_after):
+        self.done_after = done_after
+        self.started = time.monotonic()
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        if time.monotonic() - self.started >= self.done_after:
+            return {'1': 'http://host/files/1.xlsx'}
+        return {}
+
+
+def test_same_task_resolves_every_waiter():
+    tasks = FakeTasks(0)
+    watcher = TaskWatcher(tasks.fetch, min_interval=0.05)
+    try:
+        futures = [watcher.watch('1', 5), watcher.watch(1, 5)]
+        assert [future.result(2) for future in futures] == ['http://host/files/1.xlsx'] * 2
+    finally:
+        watcher.stop()
+
+
+def test_short_task_is_polled_after_min_interval():
+    tasks = FakeTasks(0.1)
+    watcher = TaskWatcher(tasks.fetch, min_interval=0.2, max_interval=10, expected_duration=5)
+    try:
+        start = time.monotonic()
+        assert watcher.wait('1', 5) == 'http://host/files/1.xlsx'
+        assert time.monotonic() - start < 1
+        assert tasks.fetches == 1
+    finally:
+        watcher.stop()
+
+
+def test_wait_timeout_keeps_other_waiters():
+    tasks = FakeTasks(60)
+    watcher = TaskWatcher(tasks.fetch, min_interval=0.05, max_interval=0.1)
+    try:
+        other = watcher.watch('1', 30)
+        with pytest.raises(TaskTimeoutError):
+            watcher.wait('1', 0.1)
+        assert not other.done()
+        assert len(watcher._waiters['1']) == 1
+    finally:
+        watcher.stop()
+    with pytest.raises(TaskTimeoutError):
+        other.result(1)
@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import pytest
+import translation_index
+from translation_index import TranslationIndex, WORKBOOK
+
+
+def _store(index, path, cells):
+    with open(path, "w") as f:
+        f.write(path)
+    index._store(path, WORKBOOK, 'zh-CN', 'getStaOilExport', path, os.stat(path), cells)
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_search_with_and_without_trigram(tmp_path, monkeypatch, fts):
+    if not fts:
+        # 模拟SQLite 3.34以下没有trigram分词器
+        monkeypatch.setattr(translation_index, "_FTS_SCHEMA",
+                            translation_index._FTS_SCHEMA.replace("'trigram'", "'trigram_missing'"))
+    elif sqlite3.sqlite_version_info < (3, 34, 0):
+        pytest.skip("SQLite不支持trigram分词")
+    with TranslationIndex(str(tmp_path / "index.db")) as index:
+        assert index.fts is fts
+        with index.conn:
+            _store(index, str(tmp_path / "a.xlsx"), [(0, '明细', 'A1', '超速报警次数'), (0, '明细', 'B1', '油量')])
+        assert [row['location'] for row in index.search('超速报警')] == ['A1']
+        assert [row['location'] for row in index.search('油量')] == ['B1']
+
+
+def test_rollback_drops_cached_string_ids(tmp_path):
+    with TranslationIndex(str(tmp_path / "index.db")) as index:
+        with pytest.raises(RuntimeError):
+            with index._transaction():
+                index._intern('超速')
+                raise RuntimeError
+        assert index._string_ids == {}
+        with index._transaction():
+            _store(index, str(tmp_path / "a.xlsx"), [(0, '明细', 'A1', '超速')])
+        assert [row['text'] for row in index.search('超速', exact=True)] == ['超速']
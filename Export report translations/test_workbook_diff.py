@@ -0,0 +1,77 @@
+import pytest
+from workbook_diff import (_classify, diff_workbook, UNTRANSLATED, MISSING, MISSING_WORKBOOK, MISSING_SHEET,
+                           RTL_TEXT, RTL_SHEET)
+
+
+@pytest.mark.parametrize("language, text, source, en, expected", [
+    # 与zh-CN相同的中文
+    ('fr', '报警时间', '报警时间', 'Alarm time', (UNTRANSLATED, 'zh-CN')),
+    ('de', '报警时间', '报警时间', '', (UNTRANSLATED, 'zh-CN')),
+    # 繁体中文、日语与简体中文共用的汉字不是未翻译，含简体字时才是
+    ('zh-TW', '油量', '油量', 'Fuel', None),
+    ('zh-TW', '车辆', '车辆', 'Vehicle', (UNTRANSLATED, 'zh-CN')),
+    ('zh-TW', '車輛', '车辆', 'Vehicle', None),
+    ('ja', '時間', '時間', 'Time', None),
+    ('ja', '合计', '合计', 'Total', (UNTRANSLATED, 'zh-CN')),
+    # 与en相同的英文
+    ('fr', 'Alarm time', '报警时间', 'Alarm time', (UNTRANSLATED, 'en')),
+    ('en', 'Alarm time', '报警时间', 'Alarm time', None),
+    ('fr', 'Heure', '报警时间', 'Alarm time', None),
+    # zh和en都相同的文本（编号、单位）不需要翻译
+    ('fr', 'IMEI', 'IMEI', 'IMEI', None),
+    ('ar', 'km/h', 'km/h', 'km/h', None),
+    # 缺失
+    ('fr', '', '报警时间', 'Alarm time', (MISSING, 'zh-CN')),
+    ('fr', '', '', '', None),
+    # 从右到左语言
+    ('ar', 'Heure', '报警时间', 'Alarm time', (RTL_TEXT, None)),
+    ('ar', 'وقت الإنذار', '报警时间', 'Alarm time', None),
+    ('he', 'שעה 12', '报警时间', 'Alarm time', None),
+    ('fr', 'Heure', '报警时间', 'Alarm time', None),
+])
+def test_classify(language, text, source, en, expected):
+    assert _classify(language, text, source, en) == expected
+
+
+def _extract(*sheets):
+    return {'sheets': [{'name': name, 'headers': headers, 'labels': labels, 'right_to_left': rtl}
+                       for name, headers, labels, rtl in sheets]}
+
+
+SOURCE = _extract(('明细', [['报警时间', '状态']], {'1': ['在线', '离线']}, False),
+                  ('汇总', [['合计']], {}, False))
+EN = _extract(('Detail', [['Alarm time', 'Status']], {'1': ['Online', 'Offline']}, False),
+              ('Summary', [['Total']], {}, False))
+
+
+def _issues(language, extract):
+    return sorted((issue['type'], issue['sheet'], issue['location'], issue['text'])
+                  for issue in diff_workbook(language, 'getStaOverviewExport', extract, SOURCE, EN))
+
+
+@pytest.mark.parametrize("language, extract, expected", [
+    ('fr', _extract(('Détail', [['Heure', 'État']], {'1': ['En ligne', 'Hors ligne']}, False),
+                    ('Résumé', [['Somme']], {}, False)), []),
+    # 工作表名、表头和枚举值中残留的源语言文本
+    ('fr', _extract(('明细', [['Heure', 'Status']], {'1': ['En ligne', '离线']}, False),
+                    ('Résumé', [['Somme']], {}, False)),
+     [(UNTRANSLATED, '明细', '工作表名', '明细'), (UNTRANSLATED, '明细', '枚举列C2', '离线'),
+      (UNTRANSLATED, '明细', '表头R1C2', 'Status')]),
+    # zh和en中都出现的枚举值不报告
+    ('fr', _extract(('Détail', [['Heure', 'État']], {'1': ['GPS']}, False),
+                    ('Résumé', [['Somme']], {}, False)), []),
+    # 缺少工作表和表头单元格
+    ('fr', _extract(('Détail', [['Heure']], {}, False)),
+     [(MISSING, 'Détail', '表头R1C2', ''), (MISSING_SHEET, '汇总', None, None)]),
+    # 从右到左语言的工作表方向和文本
+    ('ar', _extract(('تفاصيل', [['وقت الإنذار', 'Status']], {}, True),
+                    ('ملخص', [['مجموع']], {}, False)),
+     [(RTL_SHEET, 'ملخص', None, None), (UNTRANSLATED, 'تفاصيل', '表头R1C2', 'Status')]),
+    ('fr', None, [(MISSING_WORKBOOK, None, None, None)]),
+])
+def test_diff_workbook(language, extract, expected):
+    assert _issues(language, extract) == sorted(expected)
+
+
+def test_diff_workbook_without_source_reports_nothing():
+    assert diff_workbook('fr', 'getStaOverviewExport', None, None, EN) == []
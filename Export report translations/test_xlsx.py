@@ -0,0 +1,141 @@
+import os
+import zipfile
+import pytest
+from xlsx_reader import Sheet, InvalidWorkbookError, read_sheets, iter_sheets
+from xlsx_writer import write_workbook
+from shard_export import merge_workbooks, export_sharded, shard_params
+
+
+def _write(path, *sheets):
+    write_workbook(str(path), [Sheet(name, rows, rtl) for name, rows, rtl in sheets])
+    return str(path)
+
+
+def _rows(path):
+    return [sheet.rows for sheet in read_sheets(path)]
+
+
+def test_round_trip(tmp_path):
+    rows = [['标题'], ['名称', '数值', '布尔', None, '备注'], ['x<&>"\'', 1.5, True, None, 'z'], [None, 3, False]]
+    path = _write(tmp_path / "a.xlsx", ("明细", rows, True), ("汇总", [['合计', 7]], False))
+
+    sheets = read_sheets(path)
+    assert [(sheet.name, sheet.rows, sheet.right_to_left) for sheet in sheets] == [
+        ("明细", rows, True), ("汇总", [['合计', 7]], False)]
+    assert read_sheets(path, max_rows=2)[0].rows == rows[:2]
+    assert [(sheet.name, list(sheet.rows), sheet.right_to_left) for sheet in iter_sheets(path)] == [
+        ("明细", rows, True), ("汇总", [['合计', 7]], False)]
+
+
+def test_iter_sheets_rows_must_be_read_in_order(tmp_path):
+    path = _write(tmp_path / "a.xlsx", ("明细", [['a'], ['b']], False), ("汇总", [['c']], False))
+
+    sheets = list(iter_sheets(path))
+    with pytest.raises(RuntimeError):
+        list(sheets[0].rows)
+
+
+def test_round_trip_shared_strings(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "明细"
+    for row in (['车辆', '状态'], ['粤A0', '离线'], ['粤A1', '离线']):
+        sheet.append(row)
+    source = str(tmp_path / "source.xlsx")
+    workbook.save(source)
+
+    copy = str(tmp_path / "copy.xlsx")
+    write_workbook(copy, iter_sheets(source))
+    assert _rows(copy) == _rows(source) == [[['车辆', '状态'], ['粤A0', '离线'], ['粤A1', '离线']]]
+
+
+def test_merge_keeps_data_when_only_one_header_row(tmp_path):
+    paths = [_write(tmp_path / f"{day}.xlsx", ("明细", [['时间', '事件'], [f'day{day}', 'a'], [f'day{day}', 'b']], False))
+             for day in range(3)]
+    merged = str(tmp_path / "merged.xlsx")
+
+    assert merge_workbooks(paths, merged, header_rows=2) == 7
+    assert _rows(merged) == [[['时间', '事件'], ['day0', 'a'], ['day0', 'b'], ['day1', 'a'], ['day1', 'b'],
+                              ['day2', 'a'], ['day2', 'b']]]
+
+
+def test_merge_drops_repeated_headers(tmp_path):
+    header = [['油量统计'], ['时间', '油量']]
+    paths = [_write(tmp_path / f"{day}.xlsx", ("明细", header + [[f'day{day}', day]], True),
+                    ("汇总", [['合计'], [f'sum{day}']], False))
+             for day in range(3)]
+    merged = str(tmp_path / "merged.xlsx")
+
+    merge_workbooks(paths, merged, header_rows=2)
+    sheets = read_sheets(merged)
+    assert sheets[0].rows == header + [['day0', 0], ['day1', 1], ['day2', 2]]
+    assert sheets[0].right_to_left
+    assert sheets[1].rows == [['合计'], ['sum0'], ['sum1'], ['sum2']]
+
+
+def test_merge_drops_headers_with_per_shard_date_range(tmp_path):
+    ranges = ['2025-05-01 00:00:00 ~ 2025-05-07 23:59:59', '2025-05-08 00:00:00 ~ 2025-05-14 23:59:59']
+    paths = [_write(tmp_path / f"{index}.xlsx",
+                    ("明细", [[f'报警详单（{time_range}）'], ['时间', '事件'], [f'2025-05-0{index + 1}', 'a']], False))
+             for index, time_range in enumerate(ranges)]
+    merged = str(tmp_path / "merged.xlsx")
+
+    merge_workbooks(paths, merged, header_rows=2)
+    assert _rows(merged) == [[[f'报警详单（{ranges[0]}）'], ['时间', '事件'], ['2025-05-01', 'a'], ['2025-05-02', 'a']]]
+
+
+def test_only_detail_endpoints_are_sharded():
+    params = {"startTime": "2025-04-30 16:00:00", "endTime": "2025-05-31 15:59:59"}
+    assert len(shard_params('http://host/alarm-service/alarmSta/queryDetailExport', params)) == 5
+    assert shard_params('http://host/location-service/position/getStaOilExport', params) == [params]
+
+
+def _corrupt(path):
+    # 保留前几行后截断工作表XML，打开文件时正常，读到后面的行才出错
+    with zipfile.ZipFile(path) as archive:
+        parts = {name: archive.read(name) for name in archive.namelist()}
+    sheet = parts["xl/worksheets/sheet1.xml"]
+    parts["xl/worksheets/sheet1.xml"] = sheet[:sheet.index(b'<row r="3"')] + b'<row r="3"><c'
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in parts.items():
+            archive.writestr(name, data)
+
+
+def test_merge_raises_invalid_workbook_for_corrupt_rows(tmp_path):
+    paths = [_write(tmp_path / f"{day}.xlsx", ("明细", [['时间'], [f'day{day}'], [f'day{day}b']], False))
+             for day in range(2)]
+    _corrupt(paths[1])
+    merged = str(tmp_path / "merged.xlsx")
+
+    with pytest.raises(InvalidWorkbookError):
+        merge_workbooks(paths, merged)
+    assert not os.path.exists(merged)
+
+
+def test_export_sharded_returns_none_for_corrupt_shard(tmp_path):
+    class Limiter:
+        def try_acquire(self):
+            return True
+
+        def release(self):
+            pass
+
+    def export(accept_language, url, params, method, save_path=None):
+        _write(save_path, ("明细", [['时间'], [params['startTime']], [params['endTime']]], False))
+        if params['startTime'].startswith('2025-05-07'):
+            _corrupt(save_path)
+        return save_path
+
+    params = {"startTime": "2025-04-30 16:00:00", "endTime": "2025-05-31 15:59:59"}
+    save_path = str(tmp_path / "queryDetailExport_download.xlsx")
+    assert export_sharded('zh-CN', 'http://host/alarm-service/alarmSta/queryDetailExport', params, 'GET',
+                          save_path=save_path, unit='week', limiter_for=lambda service: Limiter(),
+                          export_func=export) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_written_file_uses_umask_permissions(tmp_path):
+    from artifact_writer import FILE_MODE
+    path = _write(tmp_path / "a.xlsx", ("明细", [['a']], False))
+    assert os.stat(path).st_mode & 0o777 == FILE_MODE
@@ -0,0 +1,175 @@
+import threading
+import time
+from login import login
+from config import BASE_URL, LOGIN_CONFIG, TOKEN_TTL, TOKEN_REFRESH_MARGIN, AUTH_FAILURE_CODES
+
+
+class TokenManager:
+    """
+    基于login.login的token缓存管理器，按(用户名, BASE_URL)缓存token，线程安全
+
+    Args:
+        ttl (int): token有效期（秒）
+        refresh_margin (int): 到期前提前刷新的时间余量（秒）
+    """
+
+    def __init__(self, ttl=TOKEN_TTL, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._tokens = {}       # (username, base_url) -> (token, 过期时间)
+        self._key_locks = {}    # 每个账号一把锁，保证同一账号同时只登录一次
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key):
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _cached(self, key):
+        entry = self._tokens.get(key)
+        if entry and time.monotonic() < entry[1] - self.refresh_margin:
+            return entry[0]
+        return None
+
+    def get_token(self, username=LOGIN_CONFIG['username'],
+                  password=LOGIN_CONFIG['password'],
+                  accept_language='cn',
+                  base_url=BASE_URL,
+                  force=False):
+        """
+        获取token，缓存命中且未临近过期时直接返回，否则重新登录
+
+        Args:
+            username (str): 用户名
+            password (str): 密码
+            accept_language (str): 登录时使用的语言
+            base_url (str): API的基础URL地址
+            force (bool): 是否忽略缓存强制重新登录
+
+        Returns:
+            str: token字符串，登录失败返回None
+        """
+        key = (username, base_url)
+        if not force:
+            token = self._cached(key)
+            if token:
+                return token
+
+        with self._key_lock(key):
+            # 等锁期间可能已被其他线程刷新
+            if not force:
+                token = self._cached(key)
+                if token:
+                    return token
+            token = login(username, password, accept_language=accept_language, base_url=base_url)
+            if token:
+                self._tokens[key] = (token, time.monotonic() + self.ttl)
+            else:
+                self._tokens.pop(key, None)
+            return token
+
+    def invalidate(self, username=LOGIN_CONFIG['username'], base_url=BASE_URL, token=None):
+        """
+        作废缓存的token
+
+        Args:
+            username (str): 用户名
+            base_url (str): API的基础URL地址
+            token (str): 仅当缓存的token等于该值时才作废，避免覆盖其他线程刚刷新的token
+        """
+        key = (username, base_url)
+        with self._key_lock(key):
+            entry = self._tokens.get(key)
+            if entry and (token is None or entry[0] == token):
+                del self._tokens[key]
+
+    def call(self, send, username=LOGIN_CONFIG['username'],
+             password=LOGIN_CONFIG['password'],
+             accept_language='cn',
+             base_url=BASE_URL):
+        """
+        携带token发送请求，服务端返回认证失败时重新登录并重试一次
+
+        Args:
+            send (callable): 接收token并返回response的函数
+            其余参数同get_token
+
+        Returns:
+            Response: 请求的响应对象
+        """
+        token = self.get_token(username, password, accept_language, base_url)
+        response = send(token)
+        if is_auth_failure(response):
+            self.invalidate(username, base_url, token)
+            token = self.get_token(username, password, accept_language, base_url)
+            response = send(token)
+        return response
+
+
+def is_auth_failure(response):
+    """
+    判断响应是否为认证失败（HTTP状态码或JSON业务码）
+
+    Args:
+        response: requests的响应对象
+
+    Returns:
+        bool: 认证失败返回True
+    """
+    if not needs_auth_body(response.status_code, response.headers):
+        return is_auth_failure_code(response.status_code)
+    try:
+        result = response.json()
+    except ValueError:
+        return False
+    return is_auth_failure_code(response.status_code, result)
+
+
+def needs_auth_body(status, headers):
+    """
+    是否需要解析响应体中的业务码才能判断认证失败；状态码已表明认证失败或响应不是JSON时不解析，
+    避免对导出的文件内容做无谓的解析
+
+    Args:
+        status (int): HTTP状态码
+        headers: 响应头
+
+    Returns:
+        bool: 需要解析JSON响应体时返回True
+    """
+    return status not in AUTH_FAILURE_CODES and 'json' in headers.get('Content-Type', '')
+
+
+def is_auth_failure_code(status, result=None):
+    """
+    按HTTP状态码和已解析的JSON响应体中的业务码判断是否认证失败，阻塞版本和asyncio版本共用
+
+    Args:
+        status (int): HTTP状态码
+        result (dict): JSON响应体，非JSON响应传None
+
+    Returns:
+        bool: 认证失败返回True
+    """
+    if status in AUTH_FAILURE_CODES:
+        return True
+    try:
+        code = result.get('code')
+        return code is not None and int(code) in AUTH_FAILURE_CODES
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+# 进程内共享的默认实例
+token_manager = TokenManager()
+
+
+def get_token(*args, **kwargs):
+    """获取默认TokenManager缓存的token，参数同TokenManager.get_token"""
+    return token_manager.get_token(*args, **kwargs)
+
+
+def call_with_token(send, *args, **kwargs):
+    """使用默认TokenManager发送请求，参数同TokenManager.call"""
+    return token_manager.call(send, *args, **kwargs)
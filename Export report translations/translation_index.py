@@ -0,0 +1,407 @@
+import argparse
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from run_journal import file_checksum
+from xlsx_reader import read_sheets, column_letter
+from config import (LANGUAGE_LIST, TRANSLATION_DIR, TRANSLATION_INDEX_PATH, TRANSLATION_INDEX_ROWS,
+                    TRANSLATION_INDEX_WORKERS)
+
+# 产物类型
+WORKBOOK = 'workbook'
+SCREENSHOT = 'screenshot'
+
+SCREENSHOT_ENDPOINT = 'web'
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg')
+
+# trigram分词的FTS5最短只能匹配3个字符，更短的词（如"超速"）对去重后的字符串表用LIKE扫描
+_FTS_MIN_CHARS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    language TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_endpoint ON artifacts(kind, endpoint, language);
+CREATE TABLE IF NOT EXISTS cells (
+    artifact_id INTEGER NOT NULL REFERENCES artifacts(id) ON DELETE CASCADE,
+    sheet_index INTEGER NOT NULL,
+    sheet TEXT NOT NULL,
+    location TEXT NOT NULL,
+    string_id INTEGER NOT NULL REFERENCES strings(id),
+    PRIMARY KEY (artifact_id, sheet_index, location)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cells_string ON cells(string_id);
+"""
+
+# trigram分词器需要SQLite 3.34及以上，不可用时不建全文索引，查找全部走LIKE
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS strings_fts USING fts5(
+    text, content='strings', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS strings_ai AFTER INSERT ON strings BEGIN
+    INSERT INTO strings_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS strings_ad AFTER DELETE ON strings BEGIN
+    INSERT INTO strings_fts(strings_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def workbook_cells(path, max_rows=TRANSLATION_INDEX_ROWS):
+    """
+    提取工作簿中的文本单元格，数字和日期不需要翻译不提取
+
+    Args:
+        path (str): 工作簿路径
+        max_rows (int): 每个工作表读取的行数
+
+    Returns:
+        list: [(工作表序号, 工作表名, 位置, 文本)]，工作表名本身的位置为"工作表名"
+    """
+    cells = []
+    for sheet_index, sheet in enumerate(read_sheets(path, max_rows=max_rows)):
+        cells.append((sheet_index, sheet.name, '工作表名', sheet.name))
+        for row_index, row in enumerate(sheet.rows, 1):
+            for col, value in enumerate(row):
+                if isinstance(value, str) and value.strip():
+                    cells.append((sheet_index, sheet.name, f"{column_letter(col)}{row_index}", value.strip()))
+    return cells
+
+
+def _extract(path):
+    # 进程池任务
+    try:
+        return path, workbook_cells(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def scan_artifacts(languages=LANGUAGE_LIST):
+    """
+    列出TRANSLATION_DIR中各语言的导出工作簿和截图
+
+    Returns:
+        list: [(路径, 类型, 语言, 接口名)]，截图的接口名为"web"
+    """
+    artifacts = []
+    for language in languages:
+        export_dir = os.path.join(TRANSLATION_DIR, f"导出端-{language}")
+        if os.path.isdir(export_dir):
+            for name in sorted(os.listdir(export_dir)):
+                if name.endswith('.xlsx') and not name.startswith('~$'):
+                    endpoint = name[:-len('.xlsx')]
+                    if endpoint.endswith('_download'):
+                        endpoint = endpoint[:-len('_download')]
+                    artifacts.append((os.path.join(export_dir, name), WORKBOOK, language, endpoint))
+        web_dir = os.path.join(TRANSLATION_DIR, f"web-{language}")
+        if os.path.isdir(web_dir):
+            for name in sorted(os.listdir(web_dir)):
+                if name.lower().endswith(IMAGE_SUFFIXES):
+                    artifacts.append((os.path.join(web_dir, name), SCREENSHOT, language, SCREENSHOT_ENDPOINT))
+    return artifacts
+
+
+class TranslationIndex:
+    """
+    各语言导出工作簿和截图文本的持久化索引（SQLite + FTS5）
+
+    单元格按(语言, 接口, 工作表, 位置)索引，文本去重存储，23种语言中重复的标签只存一份；
+    按产物增量更新：文件大小和修改时间未变的跳过，内容哈希未变的只更新文件信息；
+    SQLite不支持FTS5 trigram分词（3.34以下）时查找退化为对字符串表的LIKE扫描
+
+    Args:
+        path (str): 索引数据库路径
+    """
+
+    def __init__(self, path=TRANSLATION_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(_SCHEMA)
+        self.fts = self._create_fts()
+        self._string_ids = {}
+
+    def _create_fts(self):
+        # 建立全文索引并返回是否可用
+        triggers = self.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ('strings_ai', 'strings_ad')"
+        ).fetchone()[0]
+        try:
+            self.conn.executescript(_FTS_SCHEMA)
+            # 由新版本SQLite建立的索引在旧版本上也能通过IF NOT EXISTS，需要实际查询一次
+            self.conn.execute("SELECT rowid FROM strings_fts WHERE strings_fts MATCH '\"abc\"' LIMIT 1").fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"SQLite {sqlite3.sqlite_version}不支持FTS5 trigram分词，查找使用LIKE: {str(e)}")
+            # 触发器引用的全文索引不可用时写入字符串会失败
+            self.conn.executescript("DROP TRIGGER IF EXISTS strings_ai; DROP TRIGGER IF EXISTS strings_ad;")
+            return False
+        if triggers < 2:
+            # 之前在不支持trigram的SQLite上写入的字符串不在全文索引中
+            with self.conn:
+                self.conn.execute("INSERT INTO strings_fts(strings_fts) VALUES ('rebuild')")
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        # 事务回滚后，本次事务中插入的字符串id已不存在，清空id缓存
+        try:
+            with self.conn:
+                yield
+        except BaseException:
+            self._string_ids.clear()
+            raise
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _intern(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            row = self.conn.execute("SELECT id FROM strings WHERE text = ?", (text,)).fetchone()
+            if row is None:
+                string_id = self.conn.execute("INSERT INTO strings(text) VALUES (?)", (text,)).lastrowid
+            else:
+                string_id = row[0]
+            self._string_ids[text] = string_id
+        return string_id
+
+    def _store(self, path, kind, language, endpoint, digest, stat, cells):
+        # 同一路径的旧单元格随旧记录级联删除
+        self.conn.execute("DELETE FROM artifacts WHERE path = ?", (path,))
+        artifact_id = self.conn.execute(
+            "INSERT INTO artifacts(path, kind, language, endpoint, sha256, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, kind, language, endpoint, digest, stat.st_size, stat.st_mtime_ns)).lastrowid
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO cells(artifact_id, sheet_index, sheet, location, string_id) VALUES (?, ?, ?, ?, ?)",
+            [(artifact_id, sheet_index, sheet, location, self._intern(text))
+             for sheet_index, sheet, location, text in cells])
+
+    def update(self, languages=LANGUAGE_LIST, max_workers=TRANSLATION_INDEX_WORKERS):
+        """
+        增量更新索引：新增和内容变化的工作簿在进程池中解析，已删除的产物从索引中移除
+
+        Args:
+            languages (list): 语言代码列表
+            max_workers (int): 解析进程数
+
+        Returns:
+            dict: {'indexed': 重新索引的产物数, 'unchanged': 未变化数, 'removed': 移除数, 'failed': 解析失败数}
+        """
+        known = {path: (sha256, size, mtime_ns) for path, sha256, size, mtime_ns in
+                 self.conn.execute("SELECT path, sha256, size, mtime_ns FROM artifacts")}
+        found = scan_artifacts(languages)
+        result = {'indexed': 0, 'unchanged': 0, 'removed': 0, 'failed': 0}
+        pending = {}        # 路径 -> (类型, 语言, 接口名, 哈希, stat)
+        with self._transaction():
+            for path, kind, language, endpoint in found:
+                stat = os.stat(path)
+                entry = known.get(path)
+                if entry is not None and entry[1:] == (stat.st_size, stat.st_mtime_ns):
+                    result['unchanged'] += 1
+                    continue
+                digest, _ = file_checksum(path)
+                if entry is not None and entry[0] == digest:
+                    self.conn.execute("UPDATE artifacts SET size = ?, mtime_ns = ? WHERE path = ?",
+                                      (stat.st_size, stat.st_mtime_ns, path))
+                    result['unchanged'] += 1
+                    continue
+                if kind == SCREENSHOT:
+                    # 截图中没有可提取的文本，只索引页面名
+                    page = os.path.splitext(os.path.basename(path))[0]
+                    self._store(path, kind, language, endpoint, digest, stat, [(0, '', '页面名', page)])
+                    result['indexed'] += 1
+                else:
+                    pending[path] = (kind, language, endpoint, digest, stat)
+
+            # 只清理本次扫描的语言中已删除的产物
+            scanned = set(languages)
+            found_paths = {artifact[0] for artifact in found}
+            removed = [(path,) for path, language in self.conn.execute("SELECT path, language FROM artifacts")
+                       if language in scanned and path not in found_paths]
+            self.conn.executemany("DELETE FROM artifacts WHERE path = ?", removed)
+            result['removed'] = len(removed)
+
+        if pending:
+            print(f"解析{len(pending)}个新增或变化的工作簿...")
+            # 内容相同的工作簿（各语言相同或重复导出）只解析一次
+            by_digest = {}
+            for path, (_, _, _, digest, _) in pending.items():
+                by_digest.setdefault(digest, path)
+            extracted = {}
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for path, cells, error in executor.map(_extract, by_digest.values(), chunksize=4):
+                    if error is not None:
+                        print(f"解析工作簿失败: {path} {error}")
+                    extracted[pending[path][3]] = cells
+            with self._transaction():
+                for path, (kind, language, endpoint, digest, stat) in pending.items():
+                    cells = extracted.get(digest)
+                    if cells is None:
+                        result['failed'] += 1
+                        continue
+                    self._store(path, kind, language, endpoint, digest, stat, cells)
+                    result['indexed'] += 1
+
+        if result['indexed'] or result['removed']:
+            with self.conn:
+                # 删除不再被引用的字符串
+                self.conn.execute("DELETE FROM strings WHERE id NOT IN (SELECT string_id FROM cells)")
+            self._string_ids.clear()
+        return result
+
+    def _matching_strings(self, term, exact):
+        # 返回匹配term的字符串id的SQL子查询和参数
+        if exact:
+            return "SELECT id FROM strings WHERE text = ?", (term,)
+        if self.fts and len(term) >= _FTS_MIN_CHARS:
+            phrase = '"' + term.replace('"', '""') + '"'
+            return "SELECT rowid FROM strings_fts WHERE strings_fts MATCH ?", (phrase,)
+        pattern = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return "SELECT id FROM strings WHERE text LIKE ? ESCAPE '\\'", (f"%{pattern}%",)
+
+    def search(self, term, language=None, endpoint=None, kind=None, exact=False, limit=200):
+        """
+        查找包含term的单元格
+
+        Args:
+            term (str): 要查找的文本
+            language (str): 只查找该语言，None表示全部
+            endpoint (str): 只查找该接口，None表示全部
+            kind (str): 只查找该类型的产物（WORKBOOK/SCREENSHOT），None表示全部
+            exact (bool): True时要求整个单元格与term相同
+            limit (int): 最多返回的条数
+
+        Returns:
+            list: [{'language', 'endpoint', 'kind', 'sheet_index', 'sheet', 'location', 'text', 'path'}]
+        """
+        subquery, params = self._matching_strings(term, exact)
+        sql = f"""
+            SELECT a.language, a.endpoint, a.kind, c.sheet_index, c.sheet, c.location, s.text, a.path
+            FROM cells c
+            JOIN strings s ON s.id = c.string_id
+            JOIN artifacts a ON a.id = c.artifact_id
+            WHERE c.string_id IN ({subquery})"""
+        params = list(params)
+        for column, value in (('a.language', language), ('a.endpoint', endpoint), ('a.kind', kind)):
+            if value is not None:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        sql += " ORDER BY a.endpoint, a.language, c.sheet_index, c.location LIMIT ?"
+        params.append(limit)
+        columns = ('language', 'endpoint', 'kind', 'sheet_index', 'sheet', 'location', 'text', 'path')
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params)]
+
+    def translations(self, term, source='zh-CN', languages=None, exact=False, limit=200):
+        """
+        查找源语言中包含term的单元格，以及各语言同一接口、工作表和位置的文本
+
+        Args:
+            term (str): 源语言中要查找的文本，如"超速"
+            source (str): 源语言
+            languages (list): 只返回这些语言，None表示全部
+            exact (bool): True时要求整个单元格与term相同
+            limit (int): 最多返回的源语言单元格数
+
+        Returns:
+            list: [{'endpoint', 'sheet', 'locations': [位置], 'text', 'translations': {语言: 文本}}]
+        """
+        subquery, params = self._matching_strings(term, exact)
+        sql = f"""
+            WITH matched AS (
+                SELECT a.kind, a.endpoint, c.sheet_index, c.sheet, c.location, s.text
+                FROM cells c
+                JOIN strings s ON s.id = c.string_id
+                JOIN artifacts a ON a.id = c.artifact_id
+                WHERE a.language = ? AND c.string_id IN ({subquery})
+                ORDER BY a.endpoint, c.sheet_index, c.location
+                LIMIT ?
+            )
+            SELECT m.endpoint, m.sheet_index, m.sheet, m.location, m.text, a.language, s.text
+            FROM matched m
+            JOIN artifacts a ON a.kind = m.kind AND a.endpoint = m.endpoint
+            JOIN cells c ON c.artifact_id = a.id AND c.sheet_index = m.sheet_index AND c.location = m.location
+            JOIN strings s ON s.id = c.string_id"""
+        params = [source, *params, limit]
+        if languages is not None:
+            sql += f" WHERE a.language IN ({', '.join('?' * len(languages))})"
+            params.extend(languages)
+        cells = {}
+        for endpoint, sheet_index, sheet, location, text, language, translated in self.conn.execute(sql, params):
+            item = cells.setdefault((endpoint, sheet_index, location), {
+                'endpoint': endpoint, 'sheet': sheet, 'text': text, 'translations': {}})
+            item['translations'][language] = translated
+        # 枚举值在数据行中重复出现，同一工作表中原文和各语言译文都相同的单元格合并为一条
+        results = {}
+        for (endpoint, sheet_index, location), item in sorted(cells.items()):
+            key = (endpoint, sheet_index, item['text'], tuple(sorted(item['translations'].items())))
+            results.setdefault(key, dict(item, locations=[]))['locations'].append(location)
+        return list(results.values())
+
+    def stats(self):
+        """返回索引中的产物数、单元格数和去重后的字符串数"""
+        return {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('artifacts', 'cells', 'strings')}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="建立和查询各语言导出文件的翻译索引")
+    parser.add_argument("--index", default=TRANSLATION_INDEX_PATH, help="索引数据库路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = subparsers.add_parser("update", help="增量更新索引")
+    update_parser.add_argument("--language", action="append", help="要索引的语言，可重复指定，默认全部")
+    update_parser.add_argument("--workers", type=int, default=TRANSLATION_INDEX_WORKERS, help="解析进程数")
+
+    search_parser = subparsers.add_parser("search", help="查找包含指定文本的单元格")
+    search_parser.add_argument("term", help="要查找的文本")
+    search_parser.add_argument("--language", help="只查找该语言")
+    search_parser.add_argument("--endpoint", help="只查找该接口")
+    search_parser.add_argument("--exact", action="store_true", help="整个单元格与文本相同")
+    search_parser.add_argument("--limit", type=int, default=200, help="最多返回的条数")
+
+    translate_parser = subparsers.add_parser("translate", help="查找源语言文本在各语言中的翻译")
+    translate_parser.add_argument("term", help="源语言中要查找的文本")
+    translate_parser.add_argument("--source", default="zh-CN", help="源语言")
+    translate_parser.add_argument("--language", action="append", help="只显示这些语言，可重复指定")
+    translate_parser.add_argument("--exact", action="store_true", help="整个单元格与文本相同")
+    translate_parser.add_argument("--limit", type=int, default=200, help="最多返回的源语言单元格数")
+    args = parser.parse_args()
+
+    with TranslationIndex(args.index) as index:
+        if args.command == "update":
+            result = index.update(args.language or LANGUAGE_LIST, max_workers=args.workers)
+            print(f"重新索引{result['indexed']}个，未变化{result['unchanged']}个，"
+                  f"移除{result['removed']}个，解析失败{result['failed']}个")
+            stats = index.stats()
+            print(f"索引中共{stats['artifacts']}个文件、{stats['cells']}个单元格、{stats['strings']}个不同文本")
+        elif args.command == "search":
+            for item in index.search(args.term, args.language, args.endpoint, exact=args.exact, limit=args.limit):
+                print(f"{item['language']:<8}{item['endpoint']:<36}{item['sheet']}!{item['location']:<10}{item['text']}")
+        else:
+            for item in index.translations(args.term, args.source, args.language, exact=args.exact, limit=args.limit):
+                locations = ', '.join(item['locations'][:5]) + (' ...' if len(item['locations']) > 5 else '')
+                print(f"{item['endpoint']} {item['sheet']}!{locations}: {item['text']}")
+                for language, text in sorted(item['translations'].items()):
+                    print(f"    {language:<8}{text}")
@@ -0,0 +1,327 @@
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from artifact_writer import atomic_write
+from run_journal import file_checksum
+from xlsx_reader import read_sheets
+from get_sta_overview_export import url_list
+from config import (LANGUAGE_LIST, TRANSLATION_DIR, WORKBOOK_CACHE_PATH, WORKBOOK_REPORT_PATH, WORKBOOK_BASELINES,
+                    WORKBOOK_HEADER_ROWS, WORKBOOK_SCAN_ROWS, WORKBOOK_ENUM_MAX, WORKBOOK_DIFF_WORKERS,
+                    RTL_LANGUAGES)
+
+_CJK = re.compile(r'[\u3400-\u9fff]')
+_LATIN = re.compile(r'[A-Za-z]')
+_RTL = re.compile(r'[\u0590-\u08ff\ufb1d-\ufdff\ufe70-\ufefc]')
+
+# 与zh-CN共用汉字的语言 -> 该语言的字符集；与zh-CN相同的文本只有含该字符集中没有的字（简体字）时才视为未翻译，
+# 如zh-TW的"油量"是正确翻译，"车辆"（应为"車輛"）未翻译
+_HAN_CHARSETS = {'zh-TW': 'big5', 'zh-HK': 'big5hkscs', 'ja': 'cp932'}
+
+# 问题类型
+UNTRANSLATED = 'untranslated'        # 与源语言文本相同
+MISSING = 'missing'                  # 基准有文本而该语言为空
+MISSING_WORKBOOK = 'missing_workbook'
+MISSING_SHEET = 'missing_sheet'
+RTL_TEXT = 'rtl_text'                # 从右到左语言中不含RTL文字的文本
+RTL_SHEET = 'rtl_sheet'              # 从右到左语言的工作表未设置从右到左显示
+
+# 提取结果格式的版本，格式变化后缓存自动失效
+EXTRACT_VERSION = 2
+# 缓存的提取结果依赖的格式版本和提取参数，任一变化后缓存自动失效
+EXTRACT_OPTIONS = [EXTRACT_VERSION, WORKBOOK_HEADER_ROWS, WORKBOOK_SCAN_ROWS, WORKBOOK_ENUM_MAX]
+
+
+def endpoints(requests_list=url_list):
+    """url_list中的接口名（去重，保持顺序），与导出文件名{接口名}_download.xlsx对应"""
+    return list(dict.fromkeys(request_data[0].split('/')[-1] for request_data in requests_list))
+
+
+def workbook_path(language, endpoint):
+    """返回导出文件路径，与get_sta_overview_export保存的路径一致"""
+    return os.path.join(TRANSLATION_DIR, f"导出端-{language}", f"{endpoint}_download.xlsx")
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def extract_workbook(path, header_rows=WORKBOOK_HEADER_ROWS, scan_rows=WORKBOOK_SCAN_ROWS,
+                     enum_max=WORKBOOK_ENUM_MAX):
+    """
+    提取工作簿中需要翻译的文本：工作表名、表头行和枚举列的取值；
+    只流式读取每个工作表的前header_rows + scan_rows行
+
+    Args:
+        path (str): 工作簿路径
+        header_rows (int): 表头行数（前几行非空行）
+        scan_rows (int): 最多扫描的数据行数
+        enum_max (int): 枚举列最多的不同取值数
+
+    Returns:
+        dict: {'sheets': [{'name', 'headers': [[单元格文本]], 'labels': {列号: [取值]}, 'right_to_left'}]}
+    """
+    sheets = []
+    for sheet in read_sheets(path, max_rows=header_rows + scan_rows):
+        headers = []
+        columns = {}     # 列号 -> [不同取值集合, 文本单元格数]
+        for row in sheet.rows:
+            if len(headers) < header_rows:
+                values = [_text(value) for value in row]
+                if any(values):
+                    headers.append(values)
+                continue
+            for col, value in enumerate(row):
+                # 只统计文本，数字和日期不需要翻译
+                if isinstance(value, str) and value.strip():
+                    column = columns.setdefault(col, [set(), 0])
+                    column[0].add(value.strip())
+                    column[1] += 1
+        labels = {str(col): sorted(values) for col, (values, count) in columns.items()
+                  if len(values) <= enum_max and count > len(values)}
+        sheets.append({'name': sheet.name, 'headers': headers, 'labels': labels,
+                       'right_to_left': sheet.right_to_left})
+    return {'sheets': sheets}
+
+
+def _extract(path):
+    # 进程池任务
+    try:
+        return path, extract_workbook(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+class WorkbookCache:
+    """
+    工作簿提取结果的持久化缓存，按文件内容的sha256和EXTRACT_OPTIONS判断是否需要重新解析
+
+    Args:
+        path (str): 缓存文件路径
+    """
+
+    def __init__(self, path=WORKBOOK_CACHE_PATH):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (IOError, ValueError):
+            self.entries = {}
+        self._dirty = False
+
+    def _key(self, path):
+        return os.path.relpath(path, TRANSLATION_DIR)
+
+    def get(self, path, digest):
+        entry = self.entries.get(self._key(path))
+        if entry is not None and entry['sha256'] == digest and entry.get('options') == EXTRACT_OPTIONS:
+            return entry['extract']
+        return None
+
+    def set(self, path, digest, extract):
+        self.entries[self._key(path)] = {'sha256': digest, 'options': EXTRACT_OPTIONS, 'extract': extract}
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = json.dumps(self.entries, ensure_ascii=False).encode("utf-8")
+        try:
+            atomic_write(self.path, [data])
+            self._dirty = False
+        except IOError as e:
+            print(f"写入工作簿缓存失败: {str(e)}")
+
+
+def load_extracts(languages, endpoint_names, cache, max_workers=WORKBOOK_DIFF_WORKERS):
+    """
+    获取所有工作簿的提取结果，内容变化或新增的工作簿在进程池中解析
+
+    Returns:
+        dict: (语言, 接口名) -> 提取结果，文件不存在或解析失败的为None
+    """
+    extracts, pending = {}, {}
+    for language in languages:
+        for endpoint in endpoint_names:
+            path = workbook_path(language, endpoint)
+            extracts[(language, endpoint)] = None
+            if not os.path.exists(path):
+                continue
+            digest, _ = file_checksum(path)
+            cached = cache.get(path, digest)
+            if cached is not None:
+                extracts[(language, endpoint)] = cached
+            else:
+                pending[path] = (language, endpoint, digest)
+
+    if pending:
+        print(f"解析{len(pending)}个新增或变化的工作簿...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for path, extract, error in executor.map(_extract, pending, chunksize=4):
+                language, endpoint, digest = pending[path]
+                if error is not None:
+                    print(f"解析工作簿失败: {path} {error}")
+                    continue
+                cache.set(path, digest, extract)
+                extracts[(language, endpoint)] = extract
+        cache.save()
+    return extracts
+
+
+def _positional_texts(extract):
+    # 位置对应的文本：工作表名和表头单元格
+    texts = {}
+    for index, sheet in enumerate(extract['sheets']):
+        texts[(index, '工作表名')] = sheet['name']
+        for r, row in enumerate(sheet['headers'], 1):
+            for c, value in enumerate(row, 1):
+                texts[(index, f"表头R{r}C{c}")] = value
+    return texts
+
+
+def _untranslated_han(language, text):
+    # 与zh-CN相同且含汉字的文本是否未翻译
+    charset = _HAN_CHARSETS.get(language)
+    if charset is None:
+        return not language.startswith('zh')
+    try:
+        text.encode(charset)
+    except UnicodeEncodeError:
+        return True
+    return False
+
+
+def _classify(language, text, source, en):
+    """
+    判断一个文本的问题类型
+
+    Args:
+        language (str): 该文本所属语言
+        text (str): 该语言的文本
+        source (str): zh-CN同位置文本
+        en (str): en同位置文本
+
+    Returns:
+        tuple: (问题类型, 对应的基准语言)，没有问题时返回None
+    """
+    if not text:
+        return (MISSING, 'zh-CN') if source else None
+    if text == source == en:
+        # 各语言都相同的文本（编号、单位、IMEI等）不需要翻译
+        return None
+    if text == source and _CJK.search(text) and _untranslated_han(language, text):
+        return UNTRANSLATED, 'zh-CN'
+    if language != 'en' and en and text == en and en != source and _LATIN.search(text):
+        return UNTRANSLATED, 'en'
+    if language in RTL_LANGUAGES and (_LATIN.search(text) or _CJK.search(text)) and not _RTL.search(text):
+        return RTL_TEXT, None
+    return None
+
+
+def diff_workbook(language, endpoint, extract, source, en):
+    """
+    对比一个工作簿与zh-CN、en版本
+
+    Returns:
+        list: 问题列表
+    """
+    issues = []
+
+    def issue(kind, sheet, location, text, baseline=None, expected=None):
+        issues.append({'language': language, 'endpoint': endpoint, 'type': kind, 'sheet': sheet,
+                       'location': location, 'text': text, 'baseline': baseline, 'source_text': expected})
+
+    if source is None:
+        return issues
+    if extract is None:
+        issue(MISSING_WORKBOOK, None, None, None, 'zh-CN')
+        return issues
+
+    en = en or {'sheets': []}
+    if language in RTL_LANGUAGES:
+        for sheet in extract['sheets']:
+            if not sheet['right_to_left']:
+                issue(RTL_SHEET, sheet['name'], None, None)
+    for index in range(len(extract['sheets']), len(source['sheets'])):
+        issue(MISSING_SHEET, source['sheets'][index]['name'], None, None, 'zh-CN')
+
+    texts, source_texts, en_texts = _positional_texts(extract), _positional_texts(source), _positional_texts(en)
+    for key, source_text in source_texts.items():
+        index, location = key
+        if index >= len(extract['sheets']):
+            continue
+        text = texts.get(key, '')
+        result = _classify(language, text, source_text, en_texts.get(key, ''))
+        if result:
+            issue(result[0], extract['sheets'][index]['name'], location, text, result[1], source_text)
+
+    # 枚举值按集合比较：仍出现在源语言取值中的视为未翻译
+    for index, sheet in enumerate(extract['sheets'][:len(source['sheets'])]):
+        source_labels = source['sheets'][index]['labels']
+        en_labels = en['sheets'][index]['labels'] if index < len(en['sheets']) else {}
+        for col, labels in sheet['labels'].items():
+            zh_values, en_values = set(source_labels.get(col, [])), set(en_labels.get(col, []))
+            for label in labels:
+                if label in zh_values and label in en_values:
+                    continue
+                if label in zh_values:
+                    result = _classify(language, label, label, '')
+                elif label in en_values:
+                    result = _classify(language, label, '', label)
+                else:
+                    result = _classify(language, label, None, None)
+                if result:
+                    issue(result[0], sheet['name'], f"枚举列C{int(col) + 1}", label, result[1])
+    return issues
+
+
+def find_untranslated(languages=LANGUAGE_LIST, requests_list=url_list, max_workers=WORKBOOK_DIFF_WORKERS):
+    """
+    检查所有语言的导出工作簿
+
+    Args:
+        languages (list): 语言代码列表
+        requests_list (list): 接口列表，格式同url_list
+        max_workers (int): 解析进程数
+
+    Returns:
+        list: 问题列表
+    """
+    languages = list(dict.fromkeys(list(WORKBOOK_BASELINES) + list(languages)))
+    endpoint_names = endpoints(requests_list)
+    extracts = load_extracts(languages, endpoint_names, WorkbookCache(), max_workers)
+    issues = []
+    for endpoint in endpoint_names:
+        source, en = extracts[('zh-CN', endpoint)], extracts[('en', endpoint)]
+        for language in languages:
+            if language == 'zh-CN':
+                continue
+            issues.extend(diff_workbook(language, endpoint, extracts[(language, endpoint)], source, en))
+    return issues
+
+
+def print_summary(issues):
+    counts = {}
+    for item in issues:
+        key = (item['language'], item['type'])
+        counts[key] = counts.get(key, 0) + 1
+    for (language, kind), count in sorted(counts.items()):
+        print(f"  {language:<8}{kind:<18}{count}")
+    print(f"共发现{len(issues)}个问题")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比各语言的导出工作簿，找出未翻译、缺失翻译和RTL问题")
+    parser.add_argument("--language", action="append", help="要检查的语言，可重复指定，默认全部")
+    parser.add_argument("--workers", type=int, default=WORKBOOK_DIFF_WORKERS, help="解析进程数")
+    parser.add_argument("--output", default=WORKBOOK_REPORT_PATH, help="报告文件路径")
+    args = parser.parse_args()
+
+    issues = find_untranslated(args.language or LANGUAGE_LIST, max_workers=args.workers)
+    print_summary(issues)
+    try:
+        atomic_write(args.output, [json.dumps(issues, indent=2, ensure_ascii=False).encode("utf-8")])
+        print(f"报告已保存到: {args.output}")
+    except IOError as e:
+        print(f"写入报告失败: {str(e)}")
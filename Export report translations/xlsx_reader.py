@@ -0,0 +1,263 @@
+import posixpath
+import zipfile
+import zlib
+from collections import namedtuple
+from functools import lru_cache
+from itertools import chain, islice
+from xml.etree.ElementTree import iterparse, ParseError
+
+# 工作表：名称、前若干行的单元格值、是否从右到左显示
+Sheet = namedtuple('Sheet', ['name', 'rows', 'right_to_left'])
+
+# 读取损坏或截断的文件时可能出现的异常，统一转为InvalidWorkbookError
+_READ_ERRORS = (zipfile.BadZipFile, KeyError, ParseError, zlib.error, EOFError)
+
+_REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+
+class InvalidWorkbookError(ValueError):
+    """文件不是有效的xlsx工作簿"""
+
+
+@lru_cache(maxsize=None)
+def _local(tag):
+    # 只比较本地名，兼容transitional和strict两种命名空间；标签种类很少，结果缓存
+    return tag.rsplit('}', 1)[-1]
+
+
+def _column_index(ref):
+    # "BC12" -> 54（从0开始）
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+
+def column_letter(index):
+    """列号（从0开始）转为列字母，如0 -> A，26 -> AA"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _resolve_target(target):
+    # 关系中的Target相对于xl/目录，也可能是以/开头的包内绝对路径
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join('xl', target))
+
+
+def _read_relationships(archive):
+    targets, shared_strings = {}, None
+    try:
+        with archive.open('xl/_rels/workbook.xml.rels') as f:
+            for _, elem in iterparse(f):
+                if _local(elem.tag) == 'Relationship':
+                    target = _resolve_target(elem.get('Target', ''))
+                    targets[elem.get('Id')] = target
+                    if elem.get('Type', '').endswith('/sharedStrings'):
+                        shared_strings = target
+    except KeyError:
+        pass
+    return targets, shared_strings or 'xl/sharedStrings.xml'
+
+
+def _read_sheet_list(archive, targets):
+    sheets = []
+    with archive.open('xl/workbook.xml') as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == 'sheet':
+                target = targets.get(elem.get(_REL_ID)) or f"xl/worksheets/sheet{len(sheets) + 1}.xml"
+                sheets.append((elem.get('name', ''), target))
+    return sheets
+
+
+class _SharedIndex(int):
+    """尚未解析的共享字符串序号"""
+
+
+def _cell_value(cell):
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter() if _local(t.tag) == 't')
+    value = None
+    for child in cell:
+        if _local(child.tag) == 'v':
+            value = child.text
+            break
+    if value is None:
+        return None
+    if cell_type == 's':
+        return _SharedIndex(int(value))
+    if cell_type == 'b':
+        return value == '1'
+    if cell_type in ('str', 'e'):
+        return value
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def _iter_sheet_rows(archive, target, state):
+    # 逐行产出单元格值，sheetView中的从右到左设置在第一行之前写入state
+    state['right_to_left'] = False
+    with archive.open(target) as f:
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = _local(elem.tag)
+            if event == 'start':
+                if tag == 'sheetView' and elem.get('rightToLeft') in ('1', 'true'):
+                    state['right_to_left'] = True
+                continue
+            if tag != 'row':
+                continue
+            row = []
+            for cell in elem:
+                if _local(cell.tag) != 'c':
+                    continue
+                column = _column_index(cell.get('r', '')) if cell.get('r') else len(row)
+                if column > len(row):
+                    row.extend([None] * (column - len(row)))
+                row.append(_cell_value(cell))
+            # 处理完的行立即释放，内存只与读取的行数有关
+            elem.clear()
+            yield row
+    state['finished'] = True
+
+
+def _read_sheet_rows(archive, target, max_rows):
+    state = {}
+    rows_iter = _iter_sheet_rows(archive, target, state)
+    try:
+        # 读到max_rows行后提前结束，之后的行不再解压和解析
+        rows = list(islice(rows_iter, max_rows))
+    finally:
+        rows_iter.close()
+    return rows, state['right_to_left']
+
+
+def _read_shared_strings(archive, path, needed):
+    # 流式读取共享字符串，只保留用到的序号，读到最大序号后立即停止；needed为None时读取全部
+    strings = {}
+    if needed is not None and not needed:
+        return strings
+    last = max(needed) if needed is not None else None
+    index = 0
+    try:
+        with archive.open(path) as f:
+            for _, elem in iterparse(f):
+                if _local(elem.tag) != 'si':
+                    continue
+                if needed is None or index in needed:
+                    parts = []
+                    for child in elem:
+                        name = _local(child.tag)
+                        if name == 't':
+                            parts.append(child.text or '')
+                        elif name == 'r':
+                            # 富文本：拼接各段文字，不含注音(rPh)
+                            parts.extend(t.text or '' for t in child if _local(t.tag) == 't')
+                    strings[index] = ''.join(parts)
+                elem.clear()
+                if last is not None and index >= last:
+                    break
+                index += 1
+    except KeyError:
+        pass
+    return strings
+
+
+def read_sheets(path, max_rows=None):
+    """
+    流式读取xlsx工作簿每个工作表的前max_rows行，不加载整个工作簿
+
+    只解压和解析需要的部分：工作表XML读到第max_rows行即停止，
+    共享字符串只保留这些行用到的条目并在读到最大序号后停止，
+    耗时和内存与文件总行数无关。数值单元格返回int/float（日期为Excel序列号），
+    文本返回str，空单元格为None
+
+    Args:
+        path (str): xlsx文件路径
+        max_rows (int): 每个工作表最多读取的行数，None表示全部
+
+    Returns:
+        list: Sheet列表，按工作簿中的顺序
+
+    Raises:
+        InvalidWorkbookError: 文件不是有效的xlsx工作簿
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            targets, shared_strings_path = _read_relationships(archive)
+            sheets = []
+            for name, target in _read_sheet_list(archive, targets):
+                rows, right_to_left = _read_sheet_rows(archive, target, max_rows)
+                sheets.append(Sheet(name, rows, right_to_left))
+
+            needed = {value for sheet in sheets for row in sheet.rows for value in row
+                      if isinstance(value, _SharedIndex)}
+            strings = _read_shared_strings(archive, shared_strings_path, needed)
+    except _READ_ERRORS as e:
+        raise InvalidWorkbookError(f"无效的xlsx文件: {path} {str(e)}")
+
+    for sheet in sheets:
+        for row in sheet.rows:
+            for col, value in enumerate(row):
+                if isinstance(value, _SharedIndex):
+                    row[col] = strings.get(value, '')
+    return sheets
+
+
+def _resolve_row(row, strings):
+    return [strings.get(value, '') if isinstance(value, _SharedIndex) else value for value in row]
+
+
+def _guarded_rows(path, rows, strings, state):
+    # 行是在调用方读取时才解析的，此时的解析错误也要转为InvalidWorkbookError
+    try:
+        for row in rows:
+            yield _resolve_row(row, strings)
+    except _READ_ERRORS as e:
+        raise InvalidWorkbookError(f"无效的xlsx文件: {path} {str(e)}")
+    if not state.get('finished'):
+        # 已经取了下一个工作表，剩余的行无法再读取，不能当作读完
+        raise RuntimeError(f"工作表的行需要在取下一个工作表之前读完: {path}")
+
+
+def iter_sheets(path):
+    """
+    流式读取xlsx工作簿的所有行，用于合并大文件：内存中只保留共享字符串表和当前行
+
+    每个工作表的rows是逐行产出的迭代器，需要在取下一个工作表之前读完
+
+    Args:
+        path (str): xlsx文件路径
+
+    Yields:
+        Sheet: rows为行迭代器的工作表，按工作簿中的顺序
+
+    Raises:
+        InvalidWorkbookError: 文件不是有效的xlsx工作簿
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            targets, shared_strings_path = _read_relationships(archive)
+            strings = _read_shared_strings(archive, shared_strings_path, None)
+            for name, target in _read_sheet_list(archive, targets):
+                state = {}
+                rows_iter = _iter_sheet_rows(archive, target, state)
+                try:
+                    # 先取第一行，sheetView在sheetData之前，此时已知是否从右到左
+                    first = next(rows_iter, None)
+                    rows = chain([] if first is None else [first], rows_iter)
+                    yield Sheet(name, _guarded_rows(path, rows, strings, state), state['right_to_left'])
+                finally:
+                    rows_iter.close()
+    except _READ_ERRORS as e:
+        raise InvalidWorkbookError(f"无效的xlsx文件: {path} {str(e)}")
@@ -0,0 +1,126 @@
+import zipfile
+from xml.sax.saxutils import escape
+from xlsx_reader import column_letter
+from artifact_writer import open_temp, commit_temp, discard_temp
+
+# 每次写入压缩流的行数，批量编码减少写调用次数
+_FLUSH_ROWS = 500
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>')
+_SHEET_CONTENT_TYPE = ('<Override PartName="/xl/worksheets/sheet{index}.xml" '
+                       'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>')
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>')
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>')
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>')
+_SHEET_REL = ('<Relationship Id="rId{index}" '
+              'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+              'Target="worksheets/sheet{index}.xml"/>')
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"{rtl}/></sheetViews><sheetData>')
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xml_text(value):
+    # XML 1.0不允许的控制字符直接去掉
+    text = ''.join(char for char in value if char >= ' ' or char in '\t\n\r')
+    return escape(text, {'"': '&quot;'})
+
+
+def _row_xml(row_number, row, columns):
+    cells = []
+    for col, value in enumerate(row):
+        if value is None or value == '':
+            continue
+        while len(columns) <= col:
+            columns.append(column_letter(len(columns)))
+        ref = f"{columns[col]}{row_number}"
+        if isinstance(value, bool):
+            cells.append(f'<c r="{ref}" t="b"><v>{int(value)}</v></c>')
+        elif isinstance(value, (int, float)):
+            cells.append(f'<c r="{ref}"><v>{value!r}</v></c>')
+        else:
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{_xml_text(str(value))}</t></is></c>')
+    return f'<row r="{row_number}">{"".join(cells)}</row>'
+
+
+def _sheet_name(name, used):
+    # 工作表名最长31个字符、不能含[]:*?/\且不能重复
+    name = ''.join('_' if char in '[]:*?/\\' else char for char in (name or 'Sheet'))[:31] or 'Sheet'
+    candidate, suffix = name, 1
+    while candidate.lower() in used:
+        suffix += 1
+        candidate = f"{name[:31 - len(str(suffix)) - 1]}_{suffix}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_workbook(file_name, sheets):
+    """
+    流式写入xlsx工作簿：逐行写入压缩流，内存中不保留整个表格；
+    先写到目标目录下的临时文件，完成后原子替换为目标文件
+
+    文本以内联字符串写入，不带单元格样式，数值（含Excel日期序列号）按原值写入
+
+    Args:
+        file_name (str): 目标文件路径
+        sheets (iterable): Sheet序列（name、rows、right_to_left），rows可以是行迭代器
+
+    Returns:
+        int: 写入的数据行总数
+    """
+    f, tmp_name = open_temp(file_name)
+    total = 0
+    try:
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as archive:
+            names, used = [], set()
+            for index, sheet in enumerate(sheets, 1):
+                names.append(_sheet_name(sheet.name, used))
+                rtl = ' rightToLeft="1"' if sheet.right_to_left else ''
+                columns = []
+                with archive.open(f"xl/worksheets/sheet{index}.xml", "w", force_zip64=True) as part:
+                    part.write(_SHEET_HEAD.format(rtl=rtl).encode("utf-8"))
+                    buffer = []
+                    for row_number, row in enumerate(sheet.rows, 1):
+                        buffer.append(_row_xml(row_number, row, columns))
+                        if len(buffer) >= _FLUSH_ROWS:
+                            part.write(''.join(buffer).encode("utf-8"))
+                            buffer = []
+                        total += 1
+                    buffer.append(_SHEET_TAIL)
+                    part.write(''.join(buffer).encode("utf-8"))
+            if not names:
+                raise ValueError("工作簿至少需要一个工作表")
+
+            archive.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+                sheets=''.join(_SHEET_CONTENT_TYPE.format(index=index) for index in range(1, len(names) + 1))))
+            archive.writestr("_rels/.rels", _ROOT_RELS)
+            archive.writestr("xl/workbook.xml", _WORKBOOK.format(sheets=''.join(
+                f'<sheet name="{_xml_text(name)}" sheetId="{index}" r:id="rId{index}"/>'
+                for index, name in enumerate(names, 1))))
+            archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.format(
+                rels=''.join(_SHEET_REL.format(index=index) for index in range(1, len(names) + 1))))
+        commit_temp(f, tmp_name, file_name)
+    except BaseException:
+        discard_temp(f, tmp_name)
+        raise
+    return total